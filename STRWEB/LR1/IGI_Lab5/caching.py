@@ -0,0 +1,252 @@
+"""
+Двухуровневый кэш с тегами.
+
+TieredCache — бэкенд django.core.cache: L1 — ограниченный LRU-словарь в памяти
+процесса, L2 — общий для всех процессов кэш (по умолчанию файловый, можно
+указать memcached или redis). Чтение идет сначала в L1, затем в L2; запись —
+в оба. Значение живет в L1 не дольше L1_TIMEOUT секунд: так ограничено время,
+за которое процесс замечает изменение, сделанное в другом процессе. Значения
+из L1 отдаются без копирования, изменять их нельзя.
+
+Теги. Тег — метка модели (tag_for); его версия хранится в кэше, а ключи
+значений, зависящих от тега, содержат эту версию. Сигналы моделей меняют
+версию (invalidate_tags), и старые значения перестают находиться — удалять их
+не нужно, их вытеснит LRU или истечение срока.
+
+get_or_set вычисляет значение только один раз при одновременных промахах
+(single-flight): потоки процесса ждут на общей блокировке, процессы — на
+ключе-блокировке в L2 (add атомарен в memcached и redis; у файлового кэша
+остается небольшое окно гонки, в худшем случае значение посчитают дважды).
+
+Счетчики для /metrics: cache_requests_total по уровням и результату,
+cache_tag_requests_total по тегам для значений с тегами.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import cache
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.db import connection
+from django.utils.module_loading import import_string
+
+from IGI_Lab5 import metrics
+
+MISSING = object()
+TAG_PREFIX = 'cache:tag'
+LOCK_PREFIX = 'cache:lock'
+# Сколько секунд ждать значение, которое вычисляет другой процесс
+LOCK_TIMEOUT = 10
+
+
+class LocalLRU:
+    """Словарь с ограничением размера (вытесняются давно не читанные) и сроком жизни записей"""
+
+    def __init__(self, max_entries, timeout):
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return MISSING
+            expires, value = item
+            if expires <= time.monotonic():
+                del self._data[key]
+                return MISSING
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout=None):
+        lifetime = self.timeout if timeout is None else min(timeout, self.timeout)
+        if lifetime <= 0:
+            self.delete(key)
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + lifetime, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class TieredCache(BaseCache):
+    """
+    OPTIONS: L1_MAX_ENTRIES, L1_TIMEOUT (секунды) и L2 — настройки кэша второго
+    уровня в формате CACHES.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.l1 = LocalLRU(options.get('L1_MAX_ENTRIES', 1000), options.get('L1_TIMEOUT', 5))
+        l2 = dict(options['L2'])
+        self.l2 = import_string(l2.pop('BACKEND'))(l2.pop('LOCATION', ''), l2)
+
+    def _l1_timeout(self, timeout):
+        timeout = self.get_backend_timeout(timeout)
+        return None if timeout is None else max(timeout - time.time(), 0)
+
+    def get(self, key, default=None, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        value = self.l1.get(local_key)
+        if value is not MISSING:
+            metrics.inc('cache_requests_total', (('tier', 'l1'), ('result', 'hit')))
+            return value
+        metrics.inc('cache_requests_total', (('tier', 'l1'), ('result', 'miss')))
+
+        value = self.l2.get(key, MISSING, version=version)
+        metrics.inc('cache_requests_total', (('tier', 'l2'), ('result', 'miss' if value is MISSING else 'hit')))
+        if value is MISSING:
+            return default
+        # Оставшийся срок в L2 неизвестен, поэтому в L1 значение живет L1_TIMEOUT
+        self.l1.set(local_key, value)
+        return value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.l2.set(key, value, timeout, version=version)
+        self.l1.set(self.make_and_validate_key(key, version=version), value, self._l1_timeout(timeout))
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        if not self.l2.add(key, value, timeout, version=version):
+            return False
+        self.l1.set(self.make_and_validate_key(key, version=version), value, self._l1_timeout(timeout))
+        return True
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        self.l1.delete(self.make_and_validate_key(key, version=version))
+        return self.l2.touch(key, timeout, version=version)
+
+    def delete(self, key, version=None):
+        self.l1.delete(self.make_and_validate_key(key, version=version))
+        return self.l2.delete(key, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        self.l1.delete(self.make_and_validate_key(key, version=version))
+        return self.l2.incr(key, delta, version=version)
+
+    def has_key(self, key, version=None):
+        return self.l1.get(self.make_and_validate_key(key, version=version)) is not MISSING or self.l2.has_key(
+            key, version=version
+        )
+
+    def clear(self):
+        self.l1.clear()
+        self.l2.clear()
+
+    def close(self, **kwargs):
+        self.l2.close(**kwargs)
+
+
+def tag_for(model):
+    return model._meta.label_lower
+
+
+def tag_versions(tags):
+    """Текущие версии тегов (в порядке сортировки тегов); недостающие создаются"""
+    keys = {f'{TAG_PREFIX}:{tag}': tag for tag in tags}
+    versions = cache.get_many(keys)
+    missing = {key: _new_version() for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        versions.update(missing)
+    return [versions[key] for key in sorted(keys)]
+
+
+def _new_version(previous=0):
+    # Версия растет: время в миллисекундах, но не меньше предыдущей версии + 1.
+    # Поэтому версия, созданная заново после вытеснения ключа, не совпадет со старой
+    return max(int(time.time() * 1000), previous + 1)
+
+
+def invalidate_tags(*tags):
+    keys = [f'{TAG_PREFIX}:{tag}' for tag in tags]
+    versions = cache.get_many(keys)
+    cache.set_many({key: _new_version(versions.get(key, 0)) for key in keys}, timeout=None)
+
+
+def tagged_key(key, tags):
+    if not tags:
+        return key
+    versions = ':'.join(map(str, tag_versions(tags)))
+    return f'{key}:{hashlib.md5(versions.encode()).hexdigest()}'
+
+
+def count_tags(tags, hit):
+    for tag in tags:
+        metrics.inc('cache_tag_requests_total', (('tag', tag), ('result', 'hit' if hit else 'miss')))
+
+
+def tagged_get(key, tags):
+    """(ключ с версиями тегов, значение или MISSING); обращение учитывается в счетчиках тегов"""
+    full_key = tagged_key(key, tags)
+    value = cache.get(full_key, MISSING)
+    count_tags(tags, value is not MISSING)
+    return full_key, value
+
+
+class _Flight:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.waiters = 0
+
+
+_flights = {}
+_flights_lock = threading.Lock()
+
+
+def get_or_set(key, compute, timeout=DEFAULT_TIMEOUT, tags=(), store_in_transaction=True):
+    """
+    Значение из кэша или результат compute(), сохраненный в кэш. Одновременно
+    compute() для одного ключа выполняется один раз. store_in_transaction=False —
+    не сохранять значение, прочитанное из БД внутри транзакции (его могут откатить).
+    """
+    full_key, value = tagged_get(key, tags)
+    if value is not MISSING:
+        return value
+
+    with _flights_lock:
+        flight = _flights.setdefault(full_key, _Flight())
+        flight.waiters += 1
+    try:
+        with flight.lock:
+            value = cache.get(full_key, MISSING)
+            if value is MISSING:
+                value = _compute_once(full_key, compute, timeout, store_in_transaction)
+    finally:
+        with _flights_lock:
+            flight.waiters -= 1
+            if not flight.waiters:
+                del _flights[full_key]
+    return value
+
+
+def _compute_once(full_key, compute, timeout, store_in_transaction):
+    lock_key = f'{LOCK_PREFIX}:{full_key}'
+    if not cache.add(lock_key, 1, LOCK_TIMEOUT):
+        # Значение вычисляет другой процесс: ждем его, но не дольше срока блокировки
+        deadline = time.monotonic() + LOCK_TIMEOUT
+        while time.monotonic() < deadline:
+            time.sleep(0.05)
+            value = cache.get(full_key, MISSING)
+            if value is not MISSING:
+                return value
+        return compute()
+    try:
+        value = compute()
+        if store_in_transaction or not connection.in_atomic_block:
+            cache.set(full_key, value, timeout)
+        return value
+    finally:
+        cache.delete(lock_key)
@@ -0,0 +1,162 @@
+"""
+Неблокирующее логирование.
+
+QueueLogHandler только кладет запись в очередь, а запись в файл и консоль
+выполняет QueueListener в отдельном потоке, поэтому поток запроса не ждет
+дискового ввода-вывода. Поток запускается при первой записи в каждом
+процессе, поэтому логирование работает и в воркерах, созданных через fork.
+Каждый процесс пишет в свой файл (app.<pid>.jsonl для app.jsonl) в формате
+JSON lines с ротацией по размеру: общий файл процессы ротировали бы
+одновременно и теряли записи. Если очередь переполнена, запись отбрасывается
+и учитывается в счетчике dropped — ожидания в потоке запроса не бывает никогда.
+
+SamplingFilter пропускает только каждую N-ю INFO-запись указанных логгеров
+(например, просмотры страниц); предупреждения и ошибки проходят всегда.
+"""
+import atexit
+import itertools
+import json
+import logging
+import os
+import queue
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+# Стандартные атрибуты LogRecord; остальные (переданные через extra) попадают в JSON
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime', 'sample_every'}
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна запись — одна строка JSON"""
+
+    def format(self, record):
+        data = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'module': record.module,
+            'message': record.getMessage(),
+        }
+        if getattr(record, 'sample_every', 1) > 1:
+            data['sample_every'] = record.sample_every
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith('_'):
+                data[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data['exception'] = record.exc_text
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Пропускает каждую N-ю запись уровня INFO и ниже для логгеров из rates
+    ({имя логгера: N}); правило ищется по самому длинному совпадающему префиксу имени.
+    """
+
+    def __init__(self, rates=None):
+        super().__init__()
+        self.rates = dict(rates or {})
+        self._counters = {name: itertools.count() for name in self.rates}
+
+    def _rule(self, name):
+        while name:
+            if name in self.rates:
+                return name
+            name = name.rpartition('.')[0]
+        return None
+
+    def filter(self, record):
+        if record.levelno > logging.INFO:
+            return True
+        rule = self._rule(record.name)
+        if rule is None or self.rates[rule] <= 1:
+            return True
+        # next() у itertools.count атомарен под GIL
+        if next(self._counters[rule]) % self.rates[rule]:
+            return False
+        record.sample_every = self.rates[rule]
+        return True
+
+
+class _Listener(QueueListener):
+    def enqueue_sentinel(self):
+        # При остановке очередь может быть заполнена: ждем, пока поток освободит место
+        self.queue.put(self._sentinel)
+
+
+class QueueLogHandler(QueueHandler):
+    """
+    Обработчик для settings.LOGGING: сам создает файловый (JSON, ротация) и
+    консольный обработчики и передает им записи через очередь и фоновый поток.
+    filename — шаблон имени: в имя файла добавляется pid процесса (атрибут path).
+    """
+
+    def __init__(self, filename, max_bytes=10 * 1024 * 1024, backup_count=5, console=True, queue_size=10000):
+        super().__init__(None)
+        self.filename = filename
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.console = console
+        self.queue_size = queue_size
+        self.dropped = 0
+        self.listener = None
+        self.path = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(filename)), exist_ok=True)
+        atexit.register(self.close)
+
+    def _start(self):
+        """
+        Очередь и фоновый поток создаются при первой записи в каждом процессе:
+        LOGGING настраивается до fork, а поток родителя в воркерах не существует.
+        """
+        root, extension = os.path.splitext(self.filename)
+        self.path = f'{root}.{os.getpid()}{extension}'
+        file_handler = RotatingFileHandler(
+            self.path, maxBytes=self.max_bytes, backupCount=self.backup_count, encoding='utf-8'
+        )
+        file_handler.setFormatter(JsonFormatter())
+        handlers = [file_handler]
+        if self.console:
+            console_handler = logging.StreamHandler()
+            console_handler.setFormatter(logging.Formatter('{levelname} {message}', style='{'))
+            handlers.append(console_handler)
+        self.queue = queue.Queue(maxsize=self.queue_size)
+        self.listener = _Listener(self.queue, *handlers, respect_handler_level=True)
+        self.listener.start()
+        self._pid = os.getpid()
+
+    def enqueue(self, record):
+        if self._pid != os.getpid():
+            with self._start_lock:
+                if self._pid != os.getpid():
+                    self._start()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def prepare(self, record):
+        # Сообщение подставляется здесь: аргументы могут измениться после возврата из вызова логгера.
+        # Трассировка превращается в текст, потому что объект исключения нельзя передавать между потоками надежно
+        record = logging.makeLogRecord(vars(record))
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def close(self):
+        listener, self.listener = self.listener, None
+        # Поток, запущенный в родительском процессе, останавливает только родитель
+        if listener is not None and self._pid == os.getpid():
+            # stop() дожидается, пока поток запишет все, что уже в очереди
+            listener.stop()
+            for handler in listener.handlers:
+                handler.close()
+        super().close()
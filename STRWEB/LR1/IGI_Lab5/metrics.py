@@ -0,0 +1,273 @@
+"""
+Метрики производительности запросов в формате Prometheus.
+
+MetricsMiddleware записывает для каждого имени URL время ответа (гистограмма),
+количество и время запросов к БД, размер ответа и коды статуса. Попадания и
+промахи кэша по уровням и тегам считает IGI_Lab5.caching. Запросы к БД из
+других потоков (части асинхронной главной страницы) учитываются через count_queries.
+
+Каждый поток пишет только в свой словарь (shard), поэтому на пути запроса нет
+блокировок; при выдаче /metrics словари всех потоков суммируются, а словари
+завершившихся потоков переносятся в общий итог и удаляются. Если задан
+METRICS_MULTIPROC_DIR, каждый процесс (например, воркер gunicorn) периодически
+сохраняет свои значения в файл <pid>.json в этом каталоге, а /metrics в любом
+воркере суммирует файлы всех процессов.
+"""
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+from django.http import HttpResponse, HttpResponseForbidden
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float('inf'))
+
+FAMILIES = {
+    'http_requests_total': ('counter', 'Количество обработанных запросов'),
+    'http_request_duration_seconds': ('histogram', 'Время обработки запроса'),
+    'http_response_size_bytes': ('summary', 'Размер тела ответа'),
+    'db_queries_total': ('counter', 'Количество запросов к БД'),
+    'db_query_duration_seconds_total': ('counter', 'Суммарное время запросов к БД'),
+    'cache_requests_total': ('counter', 'Обращения к кэшу по уровню (l1, l2) и результату'),
+    'cache_tag_requests_total': ('counter', 'Обращения к значениям с тегами по тегу и результату'),
+}
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# id потока -> (поток, его значения); значения завершившихся потоков переносятся в _retired
+_shards = {}
+_retired = defaultdict(float)
+_shards_lock = threading.Lock()
+_local = threading.local()
+_last_flush = 0.0
+
+
+def _fold_finished():
+    """Переносит значения завершившихся потоков в общий итог (вызывается под _shards_lock)"""
+    for ident, (thread, values) in list(_shards.items()):
+        if not thread.is_alive():
+            for key, value in values.items():
+                _retired[key] += value
+            del _shards[ident]
+
+
+def _shard():
+    values = getattr(_local, 'values', None)
+    if values is None:
+        # Блокировка берется один раз на поток — при его первой записи
+        values = _local.values = defaultdict(float)
+        with _shards_lock:
+            _fold_finished()
+            _shards[threading.get_ident()] = (threading.current_thread(), values)
+    return values
+
+
+def inc(name, labels=(), value=1.0):
+    _shard()[(name, labels)] += value
+
+
+def observe(name, labels, value):
+    """Добавляет наблюдение в гистограмму (счетчики корзин хранятся без накопления)"""
+    values = _shard()
+    values[(name + '_bucket', labels + (('le', bisect_left(LATENCY_BUCKETS, value)),))] += 1
+    values[(name + '_sum', labels)] += value
+    values[(name + '_count', labels)] += 1
+
+
+def process_snapshot():
+    """Сумма значений всех потоков процесса"""
+    with _shards_lock:
+        _fold_finished()
+        total = defaultdict(float, _retired)
+        shards = [values for thread, values in _shards.values()]
+    for values in shards:
+        # Копирование словаря выполняется целиком под GIL и не видит его промежуточного состояния
+        for key, value in dict(values).items():
+            total[key] += value
+    return total
+
+
+def reset():
+    with _shards_lock:
+        _retired.clear()
+        for thread, values in _shards.values():
+            values.clear()
+
+
+def _multiproc_dir():
+    return getattr(settings, 'METRICS_MULTIPROC_DIR', None)
+
+
+def _encode(snapshot):
+    return [[name, [list(label) for label in labels], value] for (name, labels), value in snapshot.items()]
+
+
+def _decode(items):
+    return {(name, tuple(tuple(label) for label in labels)): value for name, labels, value in items}
+
+
+def flush(force=False):
+    """Сохраняет значения процесса в каталог METRICS_MULTIPROC_DIR (не чаще раза в интервал)"""
+    global _last_flush
+    directory = _multiproc_dir()
+    if not directory:
+        return
+    now = time.monotonic()
+    if not force and now - _last_flush < getattr(settings, 'METRICS_FLUSH_INTERVAL', 1.0):
+        return
+    _last_flush = now
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f'{os.getpid()}.json')
+    temporary = f'{path}.{threading.get_ident()}.tmp'
+    with open(temporary, 'w') as file:
+        json.dump(_encode(process_snapshot()), file)
+    os.replace(temporary, path)
+
+
+def collect():
+    """Значения для выдачи: текущего процесса или сумма по всем процессам"""
+    directory = _multiproc_dir()
+    if not directory:
+        return process_snapshot()
+    flush(force=True)
+    total = defaultdict(float)
+    for filename in os.listdir(directory):
+        if not filename.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(directory, filename)) as file:
+                snapshot = _decode(json.load(file))
+        except (OSError, ValueError):
+            continue
+        for key, value in snapshot.items():
+            total[key] += value
+    return total
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (
+        (key, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')) for key, value in labels
+    )
+    return '{' + ','.join(f'{key}="{value}"' for key, value in escaped) + '}'
+
+
+def _format_value(value):
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+def render(snapshot):
+    """Текстовый формат Prometheus"""
+    series = defaultdict(dict)
+    for (name, labels), value in snapshot.items():
+        series[name][labels] = value
+
+    lines = []
+    for family, (kind, help_text) in FAMILIES.items():
+        lines.append(f'# HELP {family} {help_text}')
+        lines.append(f'# TYPE {family} {kind}')
+        if kind == 'histogram':
+            lines.extend(_render_histogram(family, series))
+            continue
+        names = [family + '_sum', family + '_count'] if kind == 'summary' else [family]
+        for name in names:
+            for labels, value in sorted(series.get(name, {}).items()):
+                lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+def _render_histogram(family, series):
+    buckets = defaultdict(lambda: [0.0] * len(LATENCY_BUCKETS))
+    for labels, value in series.get(family + '_bucket', {}).items():
+        *base, (_, index) = labels
+        buckets[tuple(base)][int(index)] += value
+
+    lines = []
+    for labels in sorted(buckets):
+        cumulative = 0.0
+        for bound, count in zip(LATENCY_BUCKETS, buckets[labels]):
+            cumulative += count
+            le = '+Inf' if bound == float('inf') else repr(bound)
+            lines.append(f'{family}_bucket{_format_labels(labels + (("le", le),))} {_format_value(cumulative)}')
+        lines.append(f'{family}_sum{_format_labels(labels)} {series[family + "_sum"][labels]!r}')
+        lines.append(f'{family}_count{_format_labels(labels)} {_format_value(series[family + "_count"][labels])}')
+    return lines
+
+
+class QueryTimer:
+    """
+    Обертка выполнения SQL: считает запросы и их время в рамках одного HTTP-запроса
+    (в том числе из нескольких потоков сразу).
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self._lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.count += 1
+                self.duration += elapsed
+
+
+def _wrap_connections(stack, timer):
+    # Соединения свои у каждого потока: обертка ставится на соединения текущего потока
+    for connection in connections.all():
+        stack.enter_context(connection.execute_wrapper(timer))
+
+
+@contextmanager
+def count_queries(request):
+    """Учитывает запросы к БД текущего потока в метриках HTTP-запроса request"""
+    timer = getattr(request, '_query_timer', None)
+    with ExitStack() as stack:
+        if timer is not None:
+            _wrap_connections(stack, timer)
+        yield
+
+
+class MetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timer = request._query_timer = QueryTimer()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            _wrap_connections(stack, timer)
+            response = self.get_response(request)
+        duration = time.perf_counter() - started
+
+        match = request.resolver_match
+        view = match.view_name if match else 'unmatched'
+        if view == 'metrics':
+            return response
+        labels = (('view', view), ('method', request.method))
+        inc('http_requests_total', labels + (('status', str(response.status_code)),))
+        observe('http_request_duration_seconds', labels, duration)
+        if not response.streaming:
+            inc('http_response_size_bytes_sum', (('view', view),), len(response.content))
+            inc('http_response_size_bytes_count', (('view', view),))
+        inc('db_queries_total', (('view', view),), timer.count)
+        inc('db_query_duration_seconds_total', (('view', view),), timer.duration)
+        flush()
+        return response
+
+
+def metrics_view(request):
+    allowed = getattr(settings, 'METRICS_ALLOWED_IPS', ('127.0.0.1', '::1'))
+    if request.META.get('REMOTE_ADDR') not in allowed:
+        return HttpResponseForbidden()
+    return HttpResponse(render(collect()), content_type=CONTENT_TYPE)
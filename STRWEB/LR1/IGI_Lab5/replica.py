@@ -0,0 +1,103 @@
+"""
+Чтение тяжелых страниц из реплики БД.
+
+Включается переменной окружения DATABASE_REPLICA (путь к файлу SQLite-реплики):
+тогда в DATABASES появляется псевдоним replica. Реплика обновляется командой
+refresh_replica через backup API SQLite; для настоящего сервера БД вместо нее
+указывается реплика сервера.
+
+Читают из реплики только представления, отмеченные декоратором replica_reads
+(отчеты, списки, каталог), и только модели приложений вне PRIMARY_ONLY_APPS:
+сессии и пользователи всегда читаются из основной БД. Запись всегда идет в
+основную БД. После POST (и других изменяющих запросов) браузер получает cookie
+на REPLICA_STICKY_SECONDS секунд, и пока она есть, все чтения идут в основную
+БД — пользователь видит свои изменения, даже если реплика еще не обновилась.
+
+Реплика может отставать, поэтому прочитанное из нее не сохраняется в общий
+кэш: значения для кэша вычисляются в блоке primary_reads, а ответ, отрисованный
+по данным реплики, не попадает в кэш страниц (read_from_replica).
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+
+REPLICA_ALIAS = 'replica'
+STICKY_COOKIE = 'db_primary'
+# Приложения, которые читаются только из основной БД
+PRIMARY_ONLY_APPS = {'sessions', 'auth', 'users', 'contenttypes', 'admin'}
+
+_use_replica = ContextVar('use_replica', default=False)
+
+
+def replica_enabled():
+    return REPLICA_ALIAS in settings.DATABASES
+
+
+@contextmanager
+def primary_reads():
+    """Чтения внутри блока идут в основную БД, даже в представлении с replica_reads"""
+    token = _use_replica.set(False)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+def read_from_replica(response):
+    return getattr(response, '_read_from_replica', False)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if _use_replica.get() and model._meta.app_label not in PRIMARY_ONLY_APPS and replica_enabled():
+            return REPLICA_ALIAS
+        return None
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплика — копия основной БД, объекты из обеих связаны как из одной
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != REPLICA_ALIAS
+
+
+def replica_reads(view):
+    """Декоратор представления: запросы на чтение идут в реплику (для CBV — через method_decorator)"""
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not replica_enabled() or STICKY_COOKIE in request.COOKIES:
+            return view(request, *args, **kwargs)
+        token = _use_replica.set(True)
+        try:
+            response = view(request, *args, **kwargs)
+            response._read_from_replica = True
+            # TemplateResponse отрисовывается после выхода из представления — запросы шаблона тоже в реплику
+            if hasattr(response, 'render') and not response.is_rendered:
+                response.render()
+            return response
+        finally:
+            _use_replica.reset(token)
+
+    return wrapper
+
+
+class ReplicaStickinessMiddleware:
+    """После изменяющего запроса чтения этого браузера на время идут в основную БД"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if request.method not in ('GET', 'HEAD', 'OPTIONS', 'TRACE') and replica_enabled():
+            response.set_cookie(
+                STICKY_COOKIE, '1', max_age=getattr(settings, 'REPLICA_STICKY_SECONDS', 30),
+                httponly=True, samesite='Lax',
+            )
+        return response
@@ -70,6 +70,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'IGI_Lab5.replica.ReplicaStickinessMiddleware',
+    'IGI_Lab5.metrics.MetricsMiddleware',
 ]
 
 X_FRAME_OPTIONS = 'SAMEORIGIN'
@@ -100,13 +102,51 @@ WSGI_APPLICATION = 'IGI_Lab5.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Выполняются для каждого нового соединения. WAL позволяет читать во время записи,
+# synchronous=NORMAL в режиме WAL не теряет целостность при сбое (только последние транзакции),
+# busy_timeout — сколько ждать (мс) освобождения блокировки вместо ошибки "database is locked"
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'cache_size': -65536,  # в КиБ (64 МиБ на соединение)
+    'mmap_size': 268435456,
+    'temp_store': 'MEMORY',
+}
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            'init_command': ';'.join(f'PRAGMA {name}={value}' for name, value in SQLITE_PRAGMAS.items()),
+            # Транзакция сразу берет блокировку записи: при отложенной (DEFERRED) попытка повысить
+            # чтение до записи при занятой БД завершается ошибкой без ожидания busy_timeout
+            'transaction_mode': 'IMMEDIATE',
+        },
+        # Соединения живут между запросами: PRAGMA не выполняются заново и кэш страниц
+        # (cache_size) не теряется. Сломанные соединения закрываются проверкой перед запросом
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# Реплика для чтения отчетов и списков (IGI_Lab5.replica), включается переменной окружения.
+# Файл реплики создается и обновляется командой refresh_replica
+DATABASE_REPLICA = os.environ.get('DATABASE_REPLICA')
+if DATABASE_REPLICA:
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': DATABASE_REPLICA,
+        'OPTIONS': {
+            'init_command': DATABASES['default']['OPTIONS']['init_command'] + ';PRAGMA query_only=1',
+        },
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_ROUTERS = ['IGI_Lab5.replica.ReplicaRouter']
+# Сколько секунд после изменяющего запроса браузер читает из основной БД (не меньше интервала обновления реплики)
+REPLICA_STICKY_SECONDS = 30
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -159,61 +199,118 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = 'users.User'
 
+# External widgets on the home page (content.snippets)
+# URL можно переопределить переменными окружения, например, чтобы подставить локальную заглушку
+CONTENT_SNIPPET_SOURCES = {
+    'cat_fact': os.environ.get('CAT_FACT_URL', 'https://catfact.ninja/fact'),
+    'joke': os.environ.get('JOKE_URL', 'https://official-joke-api.appspot.com/random_joke'),
+}
+CONTENT_SNIPPET_POOL = {
+    'SIZE': 5,
+    'TTL': 600,
+    'TIMEOUT': 5,
+    'FAILURE_THRESHOLD': 3,
+    'RESET_TIMEOUT': 60,
+}
+
+# Таймаут (в секундах) для каждой части асинхронной главной страницы
+HOME_COMPONENT_TIMEOUT = 2
+# Количество потоков пула, в котором выполняются части асинхронной главной страницы
+HOME_COMPONENT_WORKERS = 8
+
+# Cache
+# Двухуровневый кэш (IGI_Lab5.caching): L1 в памяти процесса, L2 общий для процессов.
+# Вместо файлового L2 можно указать memcached или redis, например
+# {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://127.0.0.1:6379'}
+CACHES = {
+    'default': {
+        'BACKEND': 'IGI_Lab5.caching.TieredCache',
+        'OPTIONS': {
+            'L1_MAX_ENTRIES': 1000,
+            # Не дольше этого (в секундах) процесс может видеть значение, уже измененное другим процессом
+            'L1_TIMEOUT': 5,
+            'L2': {
+                'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                'LOCATION': os.environ.get('CACHE_DIR', BASE_DIR / '.cache'),
+                'OPTIONS': {'MAX_ENTRIES': 10000},
+            },
+        },
+    }
+}
+# Кэш очищается перед запуском тестов: файлы L2 сохраняются между запусками
+TEST_RUNNER = 'IGI_Lab5.testing.TestRunner'
+
+# Время жизни кэша страниц для анонимных посетителей (0 — кэш отключен)
+PAGE_CACHE_TIMEOUT = 600
+
+# Statistics
+# Время жизни кэша JSON API статистики (в секундах) для каждого периода
+STATS_API_CACHE_TIMEOUT = 300
+# Количество процессов пула отрисовки графиков дашборда (0 — рисовать в текущем процессе)
+STATS_RENDERER_WORKERS = 2
+
+# Metrics
+# Каталог для суммирования метрик нескольких процессов (gunicorn); без него — метрики процесса
+METRICS_MULTIPROC_DIR = os.environ.get('METRICS_MULTIPROC_DIR')
+# Как часто (в секундах) процесс сохраняет свои метрики в METRICS_MULTIPROC_DIR
+METRICS_FLUSH_INTERVAL = 1.0
+# С каких адресов доступен /metrics
+METRICS_ALLOWED_IPS = ['127.0.0.1', '::1']
+
 # Logging configuration
+# Записи передаются в фоновый поток через очередь (IGI_Lab5.log), файл — JSON lines с ротацией
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
-    'formatters': {
-        'verbose': {
-            'format': '{levelname} {asctime} {module} {message}',
-            'style': '{',
-        },
-        'simple': {
-            'format': '{levelname} {message}',
-            'style': '{',
+    'filters': {
+        # Просмотры страниц пишутся выборочно: каждая N-я запись
+        'sampling': {
+            '()': 'IGI_Lab5.log.SamplingFilter',
+            'rates': {
+                'content.pages': 10,
+                'rentals.pages': 10,
+            },
         },
     },
     'handlers': {
-        'file': {
-            'level': 'INFO',
-            'class': 'logging.FileHandler',
-            'filename': BASE_DIR / 'logs/debug.log',
-            'formatter': 'verbose',
-        },
-        'console': {
+        'queue': {
             'level': 'INFO',
-            'class': 'logging.StreamHandler',
-            'formatter': 'simple',
+            'class': 'IGI_Lab5.log.QueueLogHandler',
+            # Каждый процесс пишет в свой файл logs/app.<pid>.jsonl и сам его ротирует
+            'filename': BASE_DIR / 'logs/app.jsonl',
+            'max_bytes': 10 * 1024 * 1024,
+            'backup_count': 5,
+            'filters': ['sampling'],
         },
     },
     'loggers': {
         'django': {
-            'handlers': ['file', 'console'],
+            'handlers': ['queue'],
             'level': 'INFO',
             'propagate': True,
         },
         'content': {
-            'handlers': ['file', 'console'],
+            'handlers': ['queue'],
             'level': 'INFO',
             'propagate': True,
         },
         'authentication': {
-            'handlers': ['file', 'console'],
+            'handlers': ['queue'],
             'level': 'INFO',
             'propagate': True,
         },
         'vehicles': {
-            'handlers': ['file', 'console'],
+            'handlers': ['queue'],
             'level': 'INFO',
             'propagate': True,
         },
         'rentals': {
-            'handlers': ['file', 'console'],
+            'handlers': ['queue'],
             'level': 'INFO',
             'propagate': True,
         },
         'finance': {
-            'handlers': ['file', 'console'],
+            'handlers': ['queue'],
             'level': 'INFO',
             'propagate': True,
         },
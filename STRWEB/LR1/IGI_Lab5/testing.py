@@ -0,0 +1,190 @@
+"""
+Поддержка тестов: запуск тестов и проверка числа запросов к БД в тестах представлений.
+
+QueryBudgetMixin.assertQueryBudget выполняет запрос, добавляет данные и
+выполняет его снова: число SQL-запросов не должно превышать бюджет и не должно
+расти вместе с числом строк (так ловится N+1). Для запросов, где работа на
+каждую строку неизбежна, assertPerItemQueryBudget задает явный бюджет на строку.
+При нарушении в сообщение попадают все запросы второго прогона и строки кода
+проекта, из которых они выполнены.
+
+TestRunner перед тестами очищает кэши: файлы общего кэша (L2) сохраняются между
+запусками, и значения из них ссылались бы на строки чужой БД.
+"""
+import sys
+from datetime import timedelta
+from decimal import Decimal
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.db import connection
+from django.template.base import TokenType
+from django.test.runner import DiscoverRunner
+from django.utils import timezone
+
+from content.models import Article, Contact, GlossaryEntry, Review, Vacancy
+from rentals.models import Cart, CartItem, PenaltyType, PromoCode, Rental, RentalPenalty
+from vehicles.models import BodyType, CarModel, CarPark, Vehicle
+
+User = get_user_model()
+
+STACK_DEPTH = 4
+# Файлы, кадры из которых не помогают найти источник запроса
+_SKIPPED_FILES = ('manage.py', 'tests.py', 'metrics.py', 'testing.py')
+
+
+class TestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        for alias in settings.CACHES:
+            caches[alias].clear()
+
+
+def _query_origin():
+    """
+    Откуда выполнен запрос: последние кадры кода проекта (без Django и библиотек)
+    и узел шаблона, если запрос выполнен при отрисовке шаблона.
+    """
+    base = str(Path(settings.BASE_DIR).resolve())
+    frames = []
+    template_node = None
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if template_node is None and frame.f_code.co_name == 'render_annotated':
+            node = frame.f_locals.get('self')
+            origin = getattr(node, 'origin', None)
+            if origin is not None and getattr(node, 'token', None) is not None:
+                opening, closing = ('{{', '}}') if node.token.token_type == TokenType.VAR else ('{%', '%}')
+                template_node = f'{origin.template_name}:{node.token.lineno} {opening} {node.token.contents} {closing}'
+        elif (
+            filename.startswith(base) and '/site-packages/' not in filename
+            and not filename.endswith(_SKIPPED_FILES)
+        ):
+            frames.append(f'{filename}:{frame.f_lineno} in {frame.f_code.co_name}')
+        frame = frame.f_back
+    frames = frames[:STACK_DEPTH]
+    if template_node:
+        frames.insert(0, f'шаблон {template_node}')
+    return frames
+
+
+class QueryRecorder:
+    """Обертка выполнения SQL: запоминает текст запроса и место в коде, откуда он выполнен"""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries.append((sql, _query_origin()))
+        return execute(sql, params, many, context)
+
+    def report(self):
+        lines = []
+        for number, (sql, frames) in enumerate(self.queries, 1):
+            lines.append(f'{number}. {sql}')
+            lines.extend(f'     {frame}' for frame in frames)
+        return '\n'.join(lines)
+
+
+class QueryBudgetMixin:
+    """Для TestCase: проверка бюджета запросов и наполнение БД тестовыми данными"""
+
+    # Сколько строк каждого вида добавляется перед повторным запросом
+    GROWTH = 15
+
+    def record_queries(self, make_request):
+        # Кэш очищается, чтобы оба прогона выполняли одинаковую работу
+        cache.clear()
+        recorder = QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            response = make_request()
+        self.assertLess(response.status_code, 400, f'Ответ {response.status_code}')
+        return recorder
+
+    def assertQueryBudget(self, budget, make_request, grow=None):
+        """
+        make_request — функция, выполняющая запрос и возвращающая ответ;
+        grow — функция, добавляющая данные (по умолчанию self.seed(self.GROWTH)).
+        """
+        before = self.record_queries(make_request)
+        (grow or (lambda: self.seed(self.GROWTH)))()
+        after = self.record_queries(make_request)
+
+        count = len(after.queries)
+        if count > budget or count != len(before.queries):
+            self.fail(
+                f'Запросов к БД: {count} при бюджете {budget} '
+                f'(до добавления данных: {len(before.queries)})\n{after.report()}'
+            )
+
+    def assertPerItemQueryBudget(self, base, per_item, make_request, count_items, grow=None):
+        """
+        Для запросов, которые обрабатывают каждую строку отдельно (оформление корзины):
+        в обоих прогонах число запросов не превышает base + per_item * count_items().
+        Рост с числом строк не скрывается, а ограничивается явным бюджетом на строку.
+        """
+        for run in range(2):
+            if run:
+                (grow or (lambda: self.seed(self.GROWTH)))()
+            items = count_items()
+            recorder = self.record_queries(make_request)
+            budget = base + per_item * items
+            if len(recorder.queries) > budget:
+                self.fail(
+                    f'Запросов к БД: {len(recorder.queries)} при бюджете {budget} '
+                    f'({base} + {per_item} на каждую из {items} строк)\n{recorder.report()}'
+                )
+
+    def create_users(self):
+        self.staff_user = User.objects.create_user(
+            username='budget_staff', password='staffpass', email='budget_staff@example.com', role='staff',
+        )
+        self.client_user = User.objects.create_user(
+            username='budget_client', password='clientpass', email='budget_client@example.com',
+        )
+
+    def seed(self, count):
+        """Добавляет count строк каждого вида: автомобили, прокаты со штрафами, корзина, контент"""
+        start = getattr(self, '_seeded', 0)
+        self._seeded = start + count
+        today = timezone.now().date()
+
+        penalty_type, _ = PenaltyType.objects.get_or_create(name='Царапина', defaults={'amount': Decimal('50.00')})
+        cart, _ = Cart.objects.get_or_create(user=self.client_user)
+        for number in range(start, start + count):
+            body_type = BodyType.objects.create(name=f'Кузов {number}')
+            car_model = CarModel.objects.create(brand=f'Марка {number % 5}', model=f'Модель {number}', body_type=body_type)
+            car_park = CarPark.objects.create(name=f'Парк {number}', address=f'ул. Тестовая, {number}')
+            vehicle = Vehicle.objects.create(
+                license_plate=f'BUDGET-{number}', car_model=car_model, year=2010 + number % 15,
+                car_price=Decimal('20000.00'), daily_rental_price=Decimal(100 + number), car_park=car_park,
+            )
+            promo_code = PromoCode.objects.create(
+                code=f'BUDGET{number}', discount_percentage=Decimal('10.00'),
+                valid_from=today - timedelta(days=1), valid_to=today + timedelta(days=30), max_uses=5,
+            )
+            rental = Rental.objects.create(
+                vehicle=vehicle, user=self.client_user, rental_days=3, promo_code=promo_code,
+                discount_amount=Decimal('0.00'), status='active',
+                rental_date=today - timedelta(days=number % 60), expected_return_date=today + timedelta(days=3),
+            )
+            RentalPenalty.objects.create(rental=rental, penalty_type=penalty_type)
+            CartItem.objects.create(cart=cart, vehicle=vehicle, rental_days=2, promo_code=promo_code)
+
+            Article.objects.create(
+                title=f'Новость {number}', summary='Кратко', content='<p>Текст новости</p>', author=self.staff_user,
+                published=True, published_at=timezone.now() - timedelta(hours=number),
+            )
+            Review.objects.create(
+                user=self.client_user, text=f'Отзыв номер {number}: все понравилось', rating=5,
+                approved=bool(number % 2),
+            )
+            GlossaryEntry.objects.create(question=f'Термин {number}', answer='Определение')
+            Vacancy.objects.create(title=f'Вакансия {number}', description='Описание', requirements='Требования')
+            Contact.objects.create(
+                first_name='Иван', last_name=f'Иванов {number}', position='Менеджер', department='Продажи',
+                email=f'contact{number}@example.com', phone='+375291234567',
+            )
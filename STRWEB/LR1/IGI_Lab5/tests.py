@@ -0,0 +1,336 @@
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.http import HttpResponse
+from django.test import LiveServerTestCase, RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from IGI_Lab5 import caching, log, metrics, replica
+from IGI_Lab5.testing import QueryBudgetMixin
+from rentals.models import Rental
+from stats import loadtest
+
+User = get_user_model()
+
+
+class RequestMetricsTestCase(TestCase):
+    """Метрики запросов и эндпоинт /metrics"""
+
+    def setUp(self):
+        metrics.reset()
+
+    def test_request_is_recorded(self):
+        self.client.get(reverse('about'))
+        output = self.client.get(reverse('metrics')).content.decode()
+
+        self.assertIn('http_requests_total{view="about",method="GET",status="200"} 1', output)
+        self.assertIn('http_request_duration_seconds_bucket{view="about",method="GET",le="+Inf"} 1', output)
+        self.assertIn('http_request_duration_seconds_count{view="about",method="GET"} 1', output)
+        self.assertIn('http_response_size_bytes_count{view="about"} 1', output)
+        self.assertIn('db_queries_total{view="about"}', output)
+        # Сам /metrics не учитывается
+        self.assertNotIn('view="metrics"', output)
+
+    def test_histogram_buckets_are_cumulative(self):
+        labels = (('view', 'test'), ('method', 'GET'))
+        for value in (0.001, 0.02, 0.02, 30.0):
+            metrics.observe('http_request_duration_seconds', labels, value)
+        output = metrics.render(metrics.collect())
+
+        self.assertIn('http_request_duration_seconds_bucket{view="test",method="GET",le="0.005"} 1', output)
+        self.assertIn('http_request_duration_seconds_bucket{view="test",method="GET",le="0.025"} 3', output)
+        self.assertIn('http_request_duration_seconds_bucket{view="test",method="GET",le="10.0"} 3', output)
+        self.assertIn('http_request_duration_seconds_bucket{view="test",method="GET",le="+Inf"} 4', output)
+        self.assertIn('http_request_duration_seconds_sum{view="test",method="GET"} 30.041', output)
+
+    def test_finished_threads_do_not_accumulate(self):
+        def work():
+            metrics.inc('test_total')
+
+        for _ in range(50):
+            thread = threading.Thread(target=work)
+            thread.start()
+            thread.join()
+
+        self.assertEqual(metrics.process_snapshot()[('test_total', ())], 50)
+        # Словари завершившихся потоков перенесены в общий итог
+        self.assertLessEqual(len(metrics._shards), threading.active_count())
+
+    def test_cache_hits_and_misses(self):
+        cache.set('metrics-test', 1)
+        cache.get('metrics-test')
+        cache.get('metrics-test-missing')
+        cache.get_many(['metrics-test', 'metrics-test-missing'])
+        snapshot = metrics.collect()
+
+        # Записанное значение читается из памяти процесса (L1), отсутствующее ищется и в L2
+        self.assertEqual(snapshot[('cache_requests_total', (('tier', 'l1'), ('result', 'hit')))], 2)
+        self.assertEqual(snapshot[('cache_requests_total', (('tier', 'l1'), ('result', 'miss')))], 2)
+        self.assertEqual(snapshot[('cache_requests_total', (('tier', 'l2'), ('result', 'miss')))], 2)
+
+    def test_multiprocess_files_are_summed(self):
+        with tempfile.TemporaryDirectory() as directory, override_settings(METRICS_MULTIPROC_DIR=directory):
+            metrics.inc('db_queries_total', (('view', 'test'),), 3)
+            metrics.flush(force=True)
+            # Файл другого воркера
+            other = [['db_queries_total', [['view', 'test']], 4.0]]
+            with open(f'{directory}/999999.json', 'w') as file:
+                file.write(json.dumps(other))
+
+            output = metrics.render(metrics.collect())
+
+        self.assertIn('db_queries_total{view="test"} 7', output)
+
+    def test_forbidden_for_other_addresses(self):
+        response = self.client.get(reverse('metrics'), REMOTE_ADDR='10.0.0.5')
+        self.assertEqual(response.status_code, 403)
+
+
+class LoggingPipelineTestCase(SimpleTestCase):
+    """Очередь логирования, JSON-формат и выборка записей"""
+
+    def make_record(self, name, level=logging.INFO, msg='Page viewed by %s', args=('user',)):
+        return logging.LogRecord(name, level, __file__, 1, msg, args, None)
+
+    def test_sampling_keeps_every_nth_info_record(self):
+        sampling = log.SamplingFilter({'content.pages': 3})
+        kept = [sampling.filter(self.make_record('content.pages')) for _ in range(6)]
+        self.assertEqual(kept, [True, False, False, True, False, False])
+        # Предупреждения и другие логгеры не отбрасываются
+        self.assertTrue(sampling.filter(self.make_record('content.pages', logging.WARNING)))
+        self.assertTrue(sampling.filter(self.make_record('content.views')))
+
+    def test_json_lines_are_written_in_background(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'logs', 'app.jsonl')
+            handler = log.QueueLogHandler(filename, console=False)
+            handler.handle(self.make_record('rentals'))
+            try:
+                raise ValueError('boom')
+            except ValueError:
+                record = self.make_record('rentals', logging.ERROR, 'Failed', ())
+                record.exc_info = sys.exc_info()
+                handler.handle(record)
+            handler.close()
+
+            self.assertEqual(handler.path, os.path.join(directory, 'logs', f'app.{os.getpid()}.jsonl'))
+            with open(handler.path, encoding='utf-8') as file:
+                lines = [json.loads(line) for line in file]
+
+        self.assertEqual(lines[0]['message'], 'Page viewed by user')
+        self.assertEqual(lines[0]['logger'], 'rentals')
+        self.assertEqual(lines[1]['level'], 'ERROR')
+        self.assertIn('ValueError: boom', lines[1]['exception'])
+
+    def test_listener_starts_in_each_process(self):
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, 'app.jsonl')
+            handler = log.QueueLogHandler(filename, console=False)
+            # При настройке LOGGING поток не запускается
+            self.assertIsNone(handler.listener)
+            handler.handle(self.make_record('rentals'))
+            parent_listener, parent_path = handler.listener, handler.path
+            # Воркер после fork: поток родителя в нем не работает, запускается свой и пишет в свой файл
+            with mock.patch.object(log.os, 'getpid', return_value=os.getpid() + 1):
+                handler.handle(self.make_record('rentals'))
+                self.assertIsNot(handler.listener, parent_listener)
+                self.assertNotEqual(handler.path, parent_path)
+                handler.close()
+            parent_listener.stop()
+            for target in parent_listener.handlers:
+                target.close()
+
+            for path in (parent_path, handler.path):
+                with open(path, encoding='utf-8') as file:
+                    self.assertEqual(len(file.readlines()), 1)
+
+    def test_full_queue_drops_records_instead_of_waiting(self):
+        with tempfile.TemporaryDirectory() as directory:
+            handler = log.QueueLogHandler(os.path.join(directory, 'app.jsonl'), console=False, queue_size=1)
+            handler.handle(self.make_record('rentals'))
+            # Фоновый поток остановлен — очередь никто не разбирает
+            handler.listener.stop()
+            handler.handle(self.make_record('rentals'))
+            handler.handle(self.make_record('rentals'))
+            self.assertEqual(handler.dropped, 1)
+            listener, handler.listener = handler.listener, None
+            for target in listener.handlers:
+                target.close()
+
+
+class LoadTestTestCase(LiveServerTestCase):
+    """Сценарии нагрузочного теста против живого сервера"""
+
+    def setUp(self):
+        call_command(
+            'generate_load_data', users=5, vehicles=6, promo_codes=2, rentals=20, reviews=3, articles=2,
+            stdout=StringIO(),
+        )
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def run_loadtest(self, **options):
+        path = os.path.join(self.directory.name, 'report.json')
+        call_command(
+            'run_loadtest', base_url=self.live_server_url, iterations=1, duration=60, output=path,
+            stdout=StringIO(), **options,
+        )
+        with open(path, encoding='utf-8') as file:
+            return json.load(file)
+
+    def test_client_and_staff_journeys(self):
+        report = self.run_loadtest(clients=1, staff=0)
+        self.assertEqual(report['total']['errors'], 0, report['steps'])
+        self.assertEqual(report['steps']['payment: pay']['requests'], 1)
+        rental = Rental.objects.get(user__username='loadtest_client0')
+        self.assertEqual(rental.status, 'pending')
+
+        report = self.run_loadtest(clients=0, staff=1)
+        self.assertEqual(report['total']['errors'], 0, report['steps'])
+        rental.refresh_from_db()
+        self.assertEqual(rental.status, 'returned')
+        self.assertTrue(rental.vehicle.is_available)
+
+    def test_compare_with_baseline(self):
+        report = {
+            'total': {'throughput_rps': 50.0},
+            'steps': {'catalogue: list': {'requests': 30, 'p95_ms': 100.0, 'errors': 0}},
+        }
+        faster = {
+            'total': {'throughput_rps': 55.0},
+            'steps': {'catalogue: list': {'requests': 30, 'p95_ms': 90.0, 'errors': 0}},
+        }
+        slower = {
+            'total': {'throughput_rps': 30.0},
+            'steps': {'catalogue: list': {'requests': 30, 'p95_ms': 150.0, 'errors': 2}},
+        }
+        self.assertEqual(loadtest.compare(faster, report, 0.2), [])
+        self.assertEqual(len(loadtest.compare(slower, report, 0.2)), 3)
+        # p95 по нескольким замерам не сравнивается
+        self.assertEqual(len(loadtest.compare(slower, report, 0.2, min_requests=50)), 2)
+        self.assertEqual(loadtest.percentile([1, 2, 3, 4], 50), 2)
+        self.assertEqual(loadtest.percentile([1, 2, 3, 4], 99), 4)
+
+        baseline = os.path.join(self.directory.name, 'baseline.json')
+        with open(baseline, 'w', encoding='utf-8') as file:
+            json.dump(slower | {'total': {'throughput_rps': 1000.0}}, file)
+        with self.assertRaisesMessage(CommandError, 'Ухудшение относительно эталона'):
+            self.run_loadtest(clients=1, staff=0, baseline=baseline, compare=True)
+
+
+@mock.patch.object(replica, 'replica_enabled', return_value=True)
+class ReplicaRoutingTestCase(TestCase):
+    """Чтение из реплики в отмеченных представлениях и прилипание к основной БД после POST"""
+
+    def setUp(self):
+        self.client_user = User.objects.create_user(username='clientuser', password='clientpass')
+        self.router = replica.ReplicaRouter()
+
+    def routed_view(self, request):
+        @replica.replica_reads
+        def view(request):
+            return HttpResponse(f'{self.router.db_for_read(Rental)} {self.router.db_for_read(User)}')
+        return view(request).content.decode()
+
+    def test_marked_views_read_from_replica(self, enabled):
+        request = RequestFactory().get('/')
+        self.assertEqual(self.routed_view(request), 'replica None')
+        # Вне представления и для записи — основная БД
+        self.assertIsNone(self.router.db_for_read(Rental))
+        self.assertEqual(self.router.db_for_write(Rental), 'default')
+        self.assertFalse(self.router.allow_migrate('replica', 'rentals'))
+
+    def test_reads_stick_to_primary_after_post(self, enabled):
+        self.client.force_login(self.client_user)
+        response = self.client.post(reverse('cart'))
+        self.assertIn(replica.STICKY_COOKIE, response.cookies)
+        self.assertEqual(response.cookies[replica.STICKY_COOKIE]['max-age'], 30)
+
+        request = RequestFactory().get('/')
+        request.COOKIES[replica.STICKY_COOKIE] = '1'
+        self.assertEqual(self.routed_view(request), 'None None')
+
+
+class TieredCacheTestCase(SimpleTestCase):
+    """Двухуровневый кэш: ограничение L1, чтение из L2, теги и вычисление значения один раз"""
+
+    def setUp(self):
+        cache.clear()
+        metrics.reset()
+
+    def test_l1_is_bounded_and_falls_back_to_l2(self):
+        tiered = caching.TieredCache('', {'OPTIONS': {
+            'L1_MAX_ENTRIES': 2,
+            'L2': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tiered-test'},
+        }})
+        for key in ('a', 'b', 'c'):
+            tiered.set(key, key.upper())
+        self.assertEqual(len(tiered.l1._data), 2)
+
+        # Вытесненное из L1 значение читается из L2 и снова попадает в L1
+        self.assertEqual(tiered.get('a'), 'A')
+        snapshot = metrics.collect()
+        self.assertEqual(snapshot[('cache_requests_total', (('tier', 'l2'), ('result', 'hit')))], 1)
+        self.assertIsNot(tiered.l1.get(tiered.make_key('a')), caching.MISSING)
+
+        tiered.delete('a')
+        self.assertIsNone(tiered.get('a'))
+
+    def test_tags_invalidate_and_count(self):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return len(calls)
+
+        self.assertEqual(caching.get_or_set('tagged', compute, tags=['vehicles.vehicle']), 1)
+        self.assertEqual(caching.get_or_set('tagged', compute, tags=['vehicles.vehicle']), 1)
+        caching.invalidate_tags('vehicles.vehicle')
+        self.assertEqual(caching.get_or_set('tagged', compute, tags=['vehicles.vehicle']), 2)
+
+        snapshot = metrics.collect()
+        self.assertEqual(snapshot[('cache_tag_requests_total', (('tag', 'vehicles.vehicle'), ('result', 'hit')))], 1)
+        self.assertEqual(snapshot[('cache_tag_requests_total', (('tag', 'vehicles.vehicle'), ('result', 'miss')))], 2)
+
+    def test_concurrent_misses_compute_once(self):
+        calls = []
+        results = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.2)
+            return 'значение'
+
+        def worker():
+            results.append(caching.get_or_set('single-flight', compute, 60))
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ['значение'] * 8)
+
+
+class MetricsQueryBudgetTestCase(QueryBudgetMixin, TestCase):
+    """Выдача /metrics не обращается к БД"""
+
+    def setUp(self):
+        self.create_users()
+        self.seed(3)
+
+    def test_metrics(self):
+        self.assertQueryBudget(0, lambda: self.client.get(reverse('metrics')))
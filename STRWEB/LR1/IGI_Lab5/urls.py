@@ -20,6 +20,8 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
+from IGI_Lab5.metrics import metrics_view
+
 urlpatterns = [
     path("", include("content.urls")),
     path("admin/", admin.site.urls),
@@ -28,6 +30,7 @@ urlpatterns = [
     path("users/", include("users.urls")),
     path("rentals/", include("rentals.urls")),
     path("statistics/", include("stats.urls")),
+    path("metrics", metrics_view, name="metrics"),
 ]
 
 # Serve media files in development
@@ -11,13 +11,10 @@ def staff_required(view_func):
             messages.error(request, 'Вам необходимо войти в систему для доступа к этой странице.')
             return redirect('login')
 
-        try:
-            if request.user.has_role('staff') or request.user.has_role('admin'):
-                return view_func(request, *args, **kwargs)
-            else:
-                messages.error(request, 'У вас нет прав для выполнения этого действия. Необходимы права сотрудника.')
-                return redirect('vehicle_list')
-        finally:
-            print('ab')
+        if request.user.has_role('staff') or request.user.has_role('admin'):
+            return view_func(request, *args, **kwargs)
+        else:
+            messages.error(request, 'У вас нет прав для выполнения этого действия. Необходимы права сотрудника.')
+            return redirect('vehicle_list')
 
     return _wrapped_view
\ No newline at end of file
@@ -1,3 +1,29 @@
 from django.test import TestCase
+from django.urls import reverse
 
-# Create your tests here.
+from IGI_Lab5.testing import QueryBudgetMixin
+
+
+class AuthenticationQueryBudgetTestCase(QueryBudgetMixin, TestCase):
+    """Число запросов страниц входа и профиля не зависит от количества записей"""
+
+    def setUp(self):
+        self.create_users()
+        self.seed(3)
+
+    def test_anonymous_pages(self):
+        for url in (reverse('login'), reverse('register')):
+            with self.subTest(url=url):
+                self.assertQueryBudget(1, lambda: self.client.get(url))
+
+    def test_profile(self):
+        self.client.force_login(self.client_user)
+        self.assertQueryBudget(3, lambda: self.client.get(reverse('profile')))
+
+    def test_logout(self):
+        def login_and_grow():
+            self.seed(self.GROWTH)
+            self.client.force_login(self.client_user)
+
+        self.client.force_login(self.client_user)
+        self.assertQueryBudget(4, lambda: self.client.get(reverse('logout')), login_and_grow)
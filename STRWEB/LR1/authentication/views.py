@@ -27,7 +27,7 @@ class RegisterView(FormView):
         user.save()
         login(self.request, user)
         messages.success(self.request, 'Регистрация успешно завершена!')
-        logger.info(f"User registered: {user.username} (ID: {user.id}), DOB: {user.date_of_birth}, Role: {user.role}")
+        logger.info("User registered: %s (ID: %s), DOB: %s, Role: %s", user.username, user.id, user.date_of_birth, user.role)
         return super().form_valid(form)
 
 
@@ -42,12 +42,12 @@ class LoginView(FormView):
         if user:
             login(self.request, user)
             messages.success(self.request, f'Добро пожаловать, {user.username}!')
-            logger.info(f"User logged in: {user.username} (ID: {user.id})")
+            logger.info("User logged in: %s (ID: %s)", user.username, user.id)
             next_url = self.request.GET.get('next', 'home')
             return redirect(next_url)
         else:
             messages.error(self.request, 'Неверное имя пользователя или пароль')
-            logger.warning(f"Failed login attempt for username: {username}")
+            logger.warning("Failed login attempt for username: %s", username)
             return self.form_invalid(form)
 
 
@@ -58,7 +58,7 @@ class LogoutView(View):
         user_id = request.user.id
         logout(request)
         messages.info(request, 'Вы вышли из системы')
-        logger.info(f"User logged out: {username} (ID: {user_id})")
+        logger.info("User logged out: %s (ID: %s)", username, user_id)
         return redirect('home')
 
 
@@ -79,7 +79,7 @@ class ProfileView(FormView):
     def form_valid(self, form):
         form.save()
         messages.success(self.request, 'Ваш профиль успешно обновлён!')
-        logger.info(f"User profile updated: {self.request.user.username} (ID: {self.request.user.id})")
+        logger.info("User profile updated: %s (ID: %s)", self.request.user.username, self.request.user.id)
         return super().form_valid(form)
 
     def form_invalid(self, form):
@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Article, CompanyInfo, Review, Partner, Contact, GlossaryEntry, Vacancy, Banner
+from . import reviews
+from .models import Article, CompanyInfo, Review, ReviewSummary, Partner, Contact, GlossaryEntry, Vacancy, Banner
 
 @admin.register(Article)
 class ArticleAdmin(admin.ModelAdmin):
@@ -50,9 +51,17 @@ class ReviewAdmin(admin.ModelAdmin):
     actions = ['approve_reviews']
     
     def approve_reviews(self, request, queryset):
-        queryset.update(approved=True)
+        # queryset.update не вызывает сигналов — сводку обновляем вместе с отзывами
+        reviews.approve_reviews(queryset)
     approve_reviews.short_description = "Одобрить выбранные отзывы"
 
+@admin.register(ReviewSummary)
+class ReviewSummaryAdmin(admin.ModelAdmin):
+    list_display = ('__str__', 'rating_sum', 'pending_count')
+
+    def has_add_permission(self, request):
+        return False
+
 @admin.register(Contact)
 class ContactAdmin(admin.ModelAdmin):
     list_display = ('get_full_name', 'position', 'email', 'phone', 'order', 'is_main_contact')
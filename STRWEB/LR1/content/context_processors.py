@@ -1,8 +1,4 @@
-from .models import CompanyInfo
+from . import singletons
 
 def company_info(request):
-    try:
-        info = CompanyInfo.objects.first()
-    except CompanyInfo.DoesNotExist:
-        info = None
-    return {'company_info': info}
\ No newline at end of file
+    return {'company_info': singletons.company_info()}
@@ -0,0 +1,134 @@
+"""
+Поиск почти одинаковых отзывов (MinHash + LSH).
+
+Текст разбивается на шинглы — перекрывающиеся фрагменты по SHINGLE_SIZE
+символов. MinHash-сигнатура из NUM_HASHES минимумов хеш-функций сохраняет
+меру Жаккара: доля совпавших позиций двух сигнатур примерно равна доле общих
+шинглов. Сигнатура делится на BANDS полос по ROWS значений, каждая полоса
+хешируется в корзину (таблица ReviewBucket с индексом). Кандидаты в дубликаты —
+отзывы, совпавшие с новым хотя бы в одной корзине, поэтому проверка нового
+отзыва не сравнивает его со всеми остальными.
+"""
+import hashlib
+import re
+import zlib
+from functools import cache
+
+from django.db import transaction
+from django.db.models import Count, Min, Q
+
+from .models import Review, ReviewBucket, ReviewSignature
+
+SHINGLE_SIZE = 5
+NUM_HASHES = 64
+BANDS = 16
+ROWS = NUM_HASHES // BANDS
+# Порог сходства по оценке MinHash, с которого отзывы считаются дубликатами
+SIMILARITY_THRESHOLD = 0.7
+
+_MERSENNE_PRIME = (1 << 61) - 1
+
+
+@cache
+def _coefficients():
+    # NumPy импортируется при первой записи отзыва, а не при запуске каждого воркера
+    import numpy as np
+
+    generator = np.random.default_rng(20250301)  # фиксированное зерно: сигнатуры хранятся в БД
+    a = generator.integers(1, 1 << 31, size=NUM_HASHES, dtype=np.uint64)
+    b = generator.integers(0, 1 << 31, size=NUM_HASHES, dtype=np.uint64)
+    return a, b
+
+
+def shingles(text):
+    normalized = re.sub(r'\W+', ' ', text.lower()).strip()
+    if len(normalized) <= SHINGLE_SIZE:
+        return {normalized}
+    return {normalized[i:i + SHINGLE_SIZE] for i in range(len(normalized) - SHINGLE_SIZE + 1)}
+
+
+def minhash(text):
+    """MinHash-сигнатура текста: список из NUM_HASHES целых чисел"""
+    import numpy as np
+
+    a, b = _coefficients()
+    values = np.fromiter((zlib.crc32(shingle.encode()) for shingle in shingles(text)), dtype=np.uint64)
+    # Хеш-функции вида (a * x + b) mod p для всех шинглов сразу: матрица NUM_HASHES x шинглы
+    hashes = (a[:, None] * values[None, :] + b[:, None]) % _MERSENNE_PRIME
+    return hashes.min(axis=1).tolist()
+
+
+def band_buckets(signature):
+    """Ключ корзины для каждой полосы сигнатуры"""
+    return [
+        (band, hashlib.md5(repr(signature[band * ROWS:(band + 1) * ROWS]).encode()).hexdigest()[:16])
+        for band in range(BANDS)
+    ]
+
+
+def similarity(first, second):
+    return sum(x == y for x, y in zip(first, second)) / len(first)
+
+
+def find_similar(signature, exclude=None):
+    """Возвращает [(сигнатура кандидата, сходство)] для отзывов из общих корзин не ниже порога"""
+    condition = Q()
+    for band, bucket in band_buckets(signature):
+        condition |= Q(band=band, bucket=bucket)
+    candidates = ReviewBucket.objects.filter(condition).values_list('review_id', flat=True).distinct()
+    if exclude is not None:
+        candidates = candidates.exclude(review_id=exclude)
+
+    matches = []
+    for candidate in ReviewSignature.objects.filter(review_id__in=candidates):
+        score = similarity(signature, candidate.minhash)
+        if score >= SIMILARITY_THRESHOLD:
+            matches.append((candidate, score))
+    return matches
+
+
+def index_review(review):
+    """Сохраняет сигнатуру и корзины отзыва и относит его к кластеру самого похожего отзыва"""
+    signature = minhash(review.text)
+    with transaction.atomic():
+        ReviewBucket.objects.filter(review=review).delete()
+        matches = find_similar(signature, exclude=review.pk)
+        cluster = max(matches, key=lambda match: match[1])[0].cluster if matches else review.pk
+        ReviewSignature.objects.update_or_create(review=review, defaults={'minhash': signature, 'cluster': cluster})
+        ReviewBucket.objects.bulk_create(
+            ReviewBucket(band=band, bucket=bucket, review=review) for band, bucket in band_buckets(signature)
+        )
+    return cluster
+
+
+def pending_clusters(limit=20):
+    """Кластеры непроверенных отзывов из нескольких отзывов, самые крупные первыми"""
+    clusters = list(
+        ReviewSignature.objects.filter(review__approved=False)
+        .values('cluster')
+        .annotate(size=Count('review'), first_review=Min('review'))
+        .filter(size__gt=1)
+        .order_by('-size', 'cluster')[:limit]
+    )
+    members = {}
+    for review_id, cluster in ReviewSignature.objects.filter(
+        review__approved=False, cluster__in=[item['cluster'] for item in clusters]
+    ).values_list('review_id', 'cluster'):
+        members.setdefault(cluster, []).append(review_id)
+    texts = dict(Review.objects.filter(pk__in=[item['first_review'] for item in clusters]).values_list('pk', 'text'))
+    for item in clusters:
+        item['ids'] = sorted(members.get(item['cluster'], []))
+        item['text'] = texts.get(item['first_review'], '')
+    return clusters
+
+
+def rebuild_index(reviews):
+    """Строит сигнатуры и корзины заново для переданных отзывов (по порядку id)"""
+    with transaction.atomic():
+        ReviewBucket.objects.all().delete()
+        ReviewSignature.objects.all().delete()
+        count = 0
+        for review in reviews.order_by('pk').iterator():
+            index_review(review)
+            count += 1
+    return count
@@ -0,0 +1,65 @@
+import hashlib
+
+from django.contrib.syndication.views import Feed
+from django.db.models import Count, Max
+from django.urls import reverse, reverse_lazy
+from django.utils.feedgenerator import Atom1Feed
+from django.views.decorators.http import condition
+
+from .models import Article
+
+FEED_SIZE = 20
+
+
+def feed_state(request):
+    """Время последнего изменения и количество опубликованных новостей (один запрос)"""
+    if not hasattr(request, '_news_feed_state'):
+        request._news_feed_state = Article.objects.filter(published=True, published_at__isnull=False).aggregate(
+            updated_at=Max('updated_at'), count=Count('pk')
+        )
+    return request._news_feed_state
+
+
+def feed_last_modified(request):
+    return feed_state(request)['updated_at']
+
+
+def feed_etag(request):
+    state = feed_state(request)
+    # Количество учитывается, чтобы удаление старой новости тоже меняло ETag
+    source = f"{state['updated_at'] and state['updated_at'].isoformat()}:{state['count']}"
+    return hashlib.md5(source.encode()).hexdigest()
+
+
+class NewsFeed(Feed):
+    feed_type = Atom1Feed
+    title = 'Новости и акции - Автопрокат'
+    subtitle = 'Последние новости и акции автопроката'
+    link = reverse_lazy('news_list')
+
+    def items(self):
+        return (
+            Article.objects.filter(published=True, published_at__isnull=False)
+            .select_related('author').order_by('-published_at', '-pk')[:FEED_SIZE]
+        )
+
+    def item_title(self, item):
+        return item.title
+
+    def item_description(self, item):
+        return item.summary
+
+    def item_link(self, item):
+        return reverse('news_detail', kwargs={'pk': item.pk})
+
+    def item_author_name(self, item):
+        return item.author.username
+
+    def item_pubdate(self, item):
+        return item.published_at
+
+    def item_updateddate(self, item):
+        return item.updated_at
+
+
+news_feed = condition(etag_func=feed_etag, last_modified_func=feed_last_modified)(NewsFeed())
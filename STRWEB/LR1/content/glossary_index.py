@@ -0,0 +1,92 @@
+"""
+Индекс словаря для мгновенного поиска по мере набора.
+
+Все записи словаря и отсортированный список слов (слово, id записи) хранятся
+в двухуровневом кэше (IGI_Lab5.caching), то есть обычно в памяти процесса;
+поиск по префиксу — двоичный поиск в этом списке, поэтому запросы при каждом
+нажатии клавиши не обращаются к БД. Версия индекса — версия тега GlossaryEntry,
+ее меняют сигналы (content.signals); индекс перестраивается при первом
+обращении после смены версии. Тот же индекс отдается браузеру как JSON-снимок
+для поиска без запросов к серверу.
+"""
+import re
+from bisect import bisect_left
+
+from django.utils.html import strip_tags
+
+from IGI_Lab5.caching import get_or_set, tag_for, tag_versions
+
+from .models import GlossaryEntry
+
+INDEX_KEY = 'content:glossary:index'
+TAG = tag_for(GlossaryEntry)
+WORD_RE = re.compile(r'\w+')
+
+
+def words(text):
+    return WORD_RE.findall(text.lower())
+
+
+class GlossaryIndex:
+    def __init__(self, version, entries):
+        self.version = version
+        self.entries = {entry_id: (question, answer) for entry_id, question, answer in entries}
+        tokens = set()
+        self.question_words = {}
+        for entry_id, question, answer in entries:
+            question_words = set(words(question))
+            self.question_words[entry_id] = question_words
+            tokens.update((word, entry_id) for word in question_words | set(words(answer)))
+        self.tokens = sorted(tokens)
+
+    def prefix_ids(self, prefix):
+        ids = set()
+        position = bisect_left(self.tokens, (prefix,))
+        while position < len(self.tokens) and self.tokens[position][0].startswith(prefix):
+            ids.add(self.tokens[position][1])
+            position += 1
+        return ids
+
+    def lookup(self, query, limit=10):
+        """Записи, содержащие слова с префиксами из запроса; совпадения в вопросе выше"""
+        prefixes = words(query)
+        if not prefixes:
+            return []
+        ids = set.intersection(*(self.prefix_ids(prefix) for prefix in prefixes))
+
+        def rank(entry_id):
+            in_question = sum(
+                any(word.startswith(prefix) for word in self.question_words[entry_id]) for prefix in prefixes
+            )
+            return -in_question, entry_id
+
+        return [
+            {'id': entry_id, 'question': self.entries[entry_id][0], 'answer': self.entries[entry_id][1]}
+            for entry_id in sorted(ids, key=rank)[:limit]
+        ]
+
+    def snapshot(self):
+        """Компактное представление для браузера: записи и слова с номерами записей"""
+        postings = {}
+        for word, entry_id in self.tokens:
+            postings.setdefault(word, []).append(entry_id)
+        return {
+            'version': self.version,
+            'entries': [[entry_id, question, answer] for entry_id, (question, answer) in self.entries.items()],
+            'words': [[word, ids] for word, ids in postings.items()],
+        }
+
+
+def build_index():
+    version, = tag_versions([TAG])
+    entries = [
+        (entry_id, question, strip_tags(answer))
+        for entry_id, question, answer in GlossaryEntry.objects.order_by('created_at').values_list('id', 'question', 'answer')
+    ]
+    return GlossaryIndex(version, entries)
+
+
+def get_index():
+    """Индекс текущей версии; перестраивается при первом обращении после изменения словаря"""
+    # Прочитанное внутри транзакции может быть откатано — такой индекс не сохраняем
+    return get_or_set(INDEX_KEY, build_index, timeout=None, tags=[TAG], store_in_transaction=False)
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from content.duplicates import rebuild_index
+from content.models import Review
+
+
+class Command(BaseCommand):
+    help = 'Строит MinHash-сигнатуры, корзины LSH и кластеры похожих отзывов заново'
+
+    def handle(self, *args, **options):
+        count = rebuild_index(Review.objects.all())
+        self.stdout.write(self.style.SUCCESS(f'Проиндексировано отзывов: {count}'))
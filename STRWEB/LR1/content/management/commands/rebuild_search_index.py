@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from content.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Строит полнотекстовый индекс новостей, словаря и вакансий заново'
+
+    def handle(self, *args, **options):
+        count = rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f'Проиндексировано объектов: {count}'))
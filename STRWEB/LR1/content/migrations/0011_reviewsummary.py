@@ -0,0 +1,48 @@
+# Generated by Django 5.2.4 on 2026-10-19 02:31
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def fill_summary(apps, schema_editor):
+    Review = apps.get_model('content', 'Review')
+    ReviewSummary = apps.get_model('content', 'ReviewSummary')
+    counts = dict(Review.objects.filter(approved=True).values_list('rating').annotate(count=Count('pk')).order_by())
+    ReviewSummary.objects.create(
+        pk=1,
+        rating_1=counts.get(1, 0),
+        rating_2=counts.get(2, 0),
+        rating_3=counts.get(3, 0),
+        rating_4=counts.get(4, 0),
+        rating_5=counts.get(5, 0),
+        rating_sum=sum(rating * count for rating, count in counts.items()),
+        pending_count=Review.objects.filter(approved=False).count(),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content', '0010_article_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReviewSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('rating_1', models.IntegerField(default=0, verbose_name='Одобрено с оценкой 1')),
+                ('rating_2', models.IntegerField(default=0, verbose_name='Одобрено с оценкой 2')),
+                ('rating_3', models.IntegerField(default=0, verbose_name='Одобрено с оценкой 3')),
+                ('rating_4', models.IntegerField(default=0, verbose_name='Одобрено с оценкой 4')),
+                ('rating_5', models.IntegerField(default=0, verbose_name='Одобрено с оценкой 5')),
+                ('rating_sum', models.IntegerField(default=0, verbose_name='Сумма оценок одобренных отзывов')),
+                ('pending_count', models.IntegerField(default=0, verbose_name='Ожидают проверки')),
+            ],
+            options={
+                'verbose_name': 'Сводка по отзывам',
+                'verbose_name_plural': 'Сводка по отзывам',
+            },
+        ),
+        migrations.RunPython(fill_summary, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.4 on 2026-10-19 02:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content', '0011_reviewsummary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReviewSignature',
+            fields=[
+                ('review', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='signature', serialize=False, to='content.review', verbose_name='Отзыв')),
+                ('minhash', models.JSONField(verbose_name='MinHash-сигнатура')),
+                ('cluster', models.PositiveIntegerField(db_index=True, verbose_name='Кластер')),
+            ],
+            options={
+                'verbose_name': 'Сигнатура отзыва',
+                'verbose_name_plural': 'Сигнатуры отзывов',
+            },
+        ),
+        migrations.CreateModel(
+            name='ReviewBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('band', models.PositiveSmallIntegerField(verbose_name='Полоса')),
+                ('bucket', models.CharField(max_length=16, verbose_name='Корзина')),
+                ('review', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lsh_buckets', to='content.review', verbose_name='Отзыв')),
+            ],
+            options={
+                'verbose_name': 'Корзина LSH',
+                'verbose_name_plural': 'Корзины LSH',
+                'indexes': [models.Index(fields=['band', 'bucket'], name='review_lsh_bucket_idx')],
+            },
+        ),
+    ]
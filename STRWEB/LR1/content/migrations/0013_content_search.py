@@ -0,0 +1,48 @@
+from django.db import migrations
+from django.utils.html import strip_tags
+
+
+def create_search_index(apps, schema_editor):
+    # FTS5 есть только в SQLite; на других СУБД поиск отключен (content.search.is_available)
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE content_search USING fts5("
+        "kind UNINDEXED, object_id UNINDEXED, title, body, tokenize = 'unicode61 remove_diacritics 2')"
+    )
+    # rowid = код типа << 32 | id объекта (см. content.search.rowid)
+    Article = apps.get_model('content', 'Article')
+    GlossaryEntry = apps.get_model('content', 'GlossaryEntry')
+    Vacancy = apps.get_model('content', 'Vacancy')
+    documents = [
+        (1 << 32 | article.pk, 'article', article.pk, article.title, f'{article.summary}\n{strip_tags(article.content)}')
+        for article in Article.objects.filter(published=True)
+    ]
+    documents += [
+        (2 << 32 | entry.pk, 'glossary', entry.pk, entry.question, strip_tags(entry.answer)) for entry in GlossaryEntry.objects.all()
+    ]
+    documents += [
+        (3 << 32 | vacancy.pk, 'vacancy', vacancy.pk, vacancy.title, f'{strip_tags(vacancy.description)}\n{strip_tags(vacancy.requirements)}')
+        for vacancy in Vacancy.objects.filter(is_active=True)
+    ]
+    with schema_editor.connection.cursor() as cursor:
+        cursor.executemany(
+            "INSERT INTO content_search (rowid, kind, object_id, title, body) VALUES (%s, %s, %s, %s, %s)", documents
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute("DROP TABLE IF EXISTS content_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content', '0012_review_duplicates'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-19 03:17
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('content', '0013_content_search'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(condition=models.Q(('approved', True)), fields=['-created_at'], name='review_approved_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='review',
+            index=models.Index(condition=models.Q(('approved', False)), fields=['-created_at'], name='review_pending_created_idx'),
+        ),
+    ]
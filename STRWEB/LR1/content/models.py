@@ -18,6 +18,12 @@ class Article(models.Model):
         verbose_name = 'Статья'
         verbose_name_plural = 'Статьи'
         ordering = ['-published_at', '-created_at']
+        indexes = [
+            # Лента новостей и постраничный вывод по курсору
+            models.Index(fields=['published', '-published_at', '-id'], name='article_feed_idx'),
+            # Время последнего изменения для Atom-ленты
+            models.Index(fields=['published', 'updated_at'], name='article_updated_idx'),
+        ]
     
     def __str__(self):
         return self.title
@@ -70,10 +76,80 @@ class Review(models.Model):
         verbose_name = 'Отзыв'
         verbose_name_plural = 'Отзывы'
         ordering = ['-created_at']
+        indexes = [
+            # Опубликованные отзывы и модерация; частичные по той же причине, что индекс каталога автомобилей
+            models.Index(fields=['-created_at'], condition=models.Q(approved=True), name='review_approved_created_idx'),
+            models.Index(fields=['-created_at'], condition=models.Q(approved=False), name='review_pending_created_idx'),
+        ]
     
     def __str__(self):
         return f'Отзыв от {self.user} - {self.rating}/5'
 
+
+class ReviewSummary(models.Model):
+    """Сводка по отзывам (одна строка): обновляется при создании и модерации отзывов"""
+    rating_1 = models.IntegerField(default=0, verbose_name='Одобрено с оценкой 1')
+    rating_2 = models.IntegerField(default=0, verbose_name='Одобрено с оценкой 2')
+    rating_3 = models.IntegerField(default=0, verbose_name='Одобрено с оценкой 3')
+    rating_4 = models.IntegerField(default=0, verbose_name='Одобрено с оценкой 4')
+    rating_5 = models.IntegerField(default=0, verbose_name='Одобрено с оценкой 5')
+    rating_sum = models.IntegerField(default=0, verbose_name='Сумма оценок одобренных отзывов')
+    pending_count = models.IntegerField(default=0, verbose_name='Ожидают проверки')
+
+    class Meta:
+        verbose_name = 'Сводка по отзывам'
+        verbose_name_plural = 'Сводка по отзывам'
+
+    def __str__(self):
+        return f'Одобрено: {self.approved_count}, ожидают проверки: {self.pending_count}'
+
+    @property
+    def approved_count(self):
+        return sum(getattr(self, f'rating_{rating}') for rating, _ in Review.RATING_CHOICES)
+
+    @property
+    def avg_rating(self):
+        if not self.approved_count:
+            return None
+        return self.rating_sum / self.approved_count
+
+    @property
+    def rating_counts(self):
+        """Количество одобренных отзывов по оценкам (только встречающиеся оценки)"""
+        counts = [
+            {'rating': rating, 'count': getattr(self, f'rating_{rating}')} for rating, _ in Review.RATING_CHOICES
+        ]
+        return [item for item in counts if item['count']]
+
+class ReviewSignature(models.Model):
+    """MinHash-сигнатура текста отзыва и кластер похожих отзывов"""
+    review = models.OneToOneField(Review, on_delete=models.CASCADE, primary_key=True, related_name='signature', verbose_name='Отзыв')
+    minhash = models.JSONField(verbose_name='MinHash-сигнатура')
+    # id первого отзыва кластера; не внешний ключ, чтобы кластер переживал удаление этого отзыва
+    cluster = models.PositiveIntegerField(db_index=True, verbose_name='Кластер')
+
+    class Meta:
+        verbose_name = 'Сигнатура отзыва'
+        verbose_name_plural = 'Сигнатуры отзывов'
+
+    def __str__(self):
+        return f'Отзыв #{self.review_id} (кластер {self.cluster})'
+
+
+class ReviewBucket(models.Model):
+    """Корзина LSH: отзывы с одинаковой полосой сигнатуры — кандидаты в дубликаты"""
+    band = models.PositiveSmallIntegerField(verbose_name='Полоса')
+    bucket = models.CharField(max_length=16, verbose_name='Корзина')
+    review = models.ForeignKey(Review, on_delete=models.CASCADE, related_name='lsh_buckets', verbose_name='Отзыв')
+
+    class Meta:
+        verbose_name = 'Корзина LSH'
+        verbose_name_plural = 'Корзины LSH'
+        indexes = [models.Index(fields=['band', 'bucket'], name='review_lsh_bucket_idx')]
+
+    def __str__(self):
+        return f'{self.band}:{self.bucket}'
+
 class Contact(models.Model):
     """Model for company contact persons"""
     first_name = models.CharField(max_length=100, verbose_name='Имя')
@@ -0,0 +1,80 @@
+"""
+Кэш целых страниц для анонимных посетителей.
+
+Ответ сохраняется в общем кэше по адресу страницы (путь и строка запроса) и
+версиям ее тегов (IGI_Lab5.caching). Тег — метка модели, например 'content.article';
+при изменении строк модели сигнал меняет версию тега (content.signals), и все
+страницы с этим тегом перестают находиться в кэше. Авторизованные пользователи, запросы кроме
+GET/HEAD и запросы с непоказанными сообщениями обслуживаются без кэша.
+"""
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.contrib import messages
+from django.core.cache import cache
+from django.db import connection
+from django.http import HttpResponse
+
+from IGI_Lab5.caching import MISSING, tag_for, tagged_get
+from IGI_Lab5.replica import read_from_replica
+
+KEY_PREFIX = 'page_cache'
+
+
+def page_key(request):
+    return f'{KEY_PREFIX}:page:{hashlib.md5(request.get_full_path().encode()).hexdigest()}'
+
+
+def is_cacheable_request(request):
+    if request.method not in ('GET', 'HEAD'):
+        return False
+    if request.user.is_authenticated:
+        return False
+    # Сообщения должны показаться один раз — такую страницу не кэшируем
+    return not len(messages.get_messages(request))
+
+
+def is_cacheable_response(request, response):
+    return (
+        response.status_code == 200
+        and not response.cookies
+        and not request.META.get('CSRF_COOKIE_NEEDS_UPDATE')
+        # Прочитанное внутри транзакции может быть откатано
+        and not connection.in_atomic_block
+        # Реплика может отставать: устаревшая страница сохранилась бы под новыми версиями тегов
+        and not read_from_replica(response)
+    )
+
+
+def cache_page_for_anonymous(*models):
+    """Декоратор представления: кэширует страницу, пока не изменятся строки моделей"""
+    tags = [tag_for(model) for model in models]
+
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            timeout = getattr(settings, 'PAGE_CACHE_TIMEOUT', 600)
+            if not timeout or not is_cacheable_request(request):
+                return view_func(request, *args, **kwargs)
+
+            key, cached = tagged_get(page_key(request), tags)
+            if cached is not MISSING:
+                content, content_type = cached
+                response = HttpResponse(content, content_type=content_type)
+                response['X-Page-Cache'] = 'hit'
+                return response
+
+            response = view_func(request, *args, **kwargs)
+
+            def store(response):
+                if is_cacheable_response(request, response):
+                    cache.set(key, (response.content, response['Content-Type']), timeout)
+
+            if hasattr(response, 'render') and callable(response.render):
+                response.add_post_render_callback(store)
+            else:
+                store(response)
+            return response
+        return wrapper
+    return decorator
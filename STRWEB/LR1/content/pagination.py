@@ -0,0 +1,79 @@
+"""
+Постраничный вывод по курсору.
+
+Вместо номера страницы (OFFSET) и общего количества (COUNT) ссылка на соседнюю
+страницу содержит ключ сортировки крайней записи. Следующая страница выбирается
+условием «ключ меньше курсора» по индексу, поэтому ее стоимость не зависит от
+того, как далеко пользователь пролистал ленту.
+"""
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from django.db.models import Q
+
+
+def encode_cursor(published_at, pk):
+    payload = json.dumps([published_at.isoformat(), pk]).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Возвращает (published_at, pk) или None для пустого или испорченного курсора"""
+    if not token:
+        return None
+    try:
+        payload = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        published_at, pk = json.loads(payload)
+        return datetime.fromisoformat(published_at), int(pk)
+    except (binascii.Error, ValueError, TypeError):
+        return None
+
+
+class CursorPage:
+    def __init__(self, object_list, has_next, has_previous):
+        self.object_list = object_list
+        self.has_next = has_next
+        self.has_previous = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def next_cursor(self):
+        if self.has_next:
+            last = self.object_list[-1]
+            return encode_cursor(last.published_at, last.pk)
+
+    @property
+    def previous_cursor(self):
+        if self.has_previous:
+            first = self.object_list[0]
+            return encode_cursor(first.published_at, first.pk)
+
+
+def paginate_by_cursor(queryset, per_page, after=None, before=None):
+    """
+    Страница ленты, упорядоченной по (-published_at, -pk); в queryset не должно
+    быть записей без published_at — по ним нельзя построить курсор.
+
+    after — курсор последней записи предыдущей страницы, before — первой записи
+    следующей (для перехода назад).
+    """
+    after, before = decode_cursor(after), decode_cursor(before)
+    if before:
+        published_at, pk = before
+        newer = Q(published_at__gt=published_at) | Q(published_at=published_at, pk__gt=pk)
+        items = list(queryset.filter(newer).order_by('published_at', 'pk')[:per_page + 1])
+        has_previous = len(items) > per_page
+        return CursorPage(items[:per_page][::-1], has_next=True, has_previous=has_previous)
+
+    if after:
+        published_at, pk = after
+        queryset = queryset.filter(Q(published_at__lt=published_at) | Q(published_at=published_at, pk__lt=pk))
+    items = list(queryset.order_by('-published_at', '-pk')[:per_page + 1])
+    return CursorPage(items[:per_page], has_next=len(items) > per_page, has_previous=after is not None)
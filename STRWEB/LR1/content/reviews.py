@@ -0,0 +1,135 @@
+"""
+Поддержка сводки ReviewSummary.
+
+Вместо агрегирования всей таблицы отзывов на каждой странице сводка меняется
+на разницу при каждом событии: создание, одобрение, отклонение (удаление) и
+массовая модерация (админка и JSON-endpoint). Изменения выполняются через F(),
+поэтому одновременные события не теряются.
+"""
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import transaction
+from django.db.models import Count, F
+
+from .models import Review, ReviewSummary
+
+SUMMARY_PK = 1
+
+_bulk_delete = ContextVar('reviews_bulk_delete', default=False)
+
+
+def is_bulk_delete():
+    """Идет массовое удаление: сводка обновляется одной разницей, а не по каждому отзыву"""
+    return _bulk_delete.get()
+
+
+@contextmanager
+def bulk_delete():
+    token = _bulk_delete.set(True)
+    try:
+        yield
+    finally:
+        _bulk_delete.reset(token)
+
+
+def get_summary():
+    summary, _ = ReviewSummary.objects.get_or_create(pk=SUMMARY_PK)
+    return summary
+
+
+def review_state(review):
+    """Вклад отзыва в сводку: (одобрен, оценка)"""
+    return review.approved, review.rating
+
+
+def apply_delta(approved=None, pending=0):
+    """approved — изменение количества одобренных отзывов по оценкам, pending — ожидающих проверки"""
+    updates = {}
+    for rating, delta in (approved or {}).items():
+        if delta:
+            updates[f'rating_{rating}'] = F(f'rating_{rating}') + delta
+    rating_sum = sum(rating * delta for rating, delta in (approved or {}).items())
+    if rating_sum:
+        updates['rating_sum'] = F('rating_sum') + rating_sum
+    if pending:
+        updates['pending_count'] = F('pending_count') + pending
+    if not updates:
+        return
+
+    with transaction.atomic():
+        get_summary()
+        ReviewSummary.objects.filter(pk=SUMMARY_PK).update(**updates)
+
+
+def add_state(state, sign=1):
+    approved, rating = state
+    if approved:
+        apply_delta(approved={rating: sign})
+    else:
+        apply_delta(pending=sign)
+
+
+def move_state(old, new):
+    if old == new:
+        return
+    if old is not None:
+        add_state(old, sign=-1)
+    if new is not None:
+        add_state(new)
+
+
+def _lock(queryset):
+    """Блокирует выбранные отзывы до конца транзакции и возвращает queryset по их id"""
+    ids = list(queryset.select_for_update().values_list('pk', flat=True))
+    return Review.objects.filter(pk__in=ids)
+
+
+def approve_reviews(queryset):
+    """Одобряет отзывы одним UPDATE и переносит их из ожидающих в одобренные"""
+    with transaction.atomic():
+        pending = _lock(queryset.filter(approved=False))
+        ratings = Counter(dict(pending.values_list('rating').annotate(count=Count('pk')).order_by()))
+        updated = pending.update(approved=True)
+        apply_delta(approved=ratings, pending=-sum(ratings.values()))
+    return updated
+
+
+def reject_reviews(queryset):
+    """Удаляет отзывы вместе со связанными строками и вычитает их из сводки одной разницей"""
+    with transaction.atomic():
+        selected = _lock(queryset)
+        states = selected.values_list('approved', 'rating').annotate(count=Count('pk')).order_by()
+        approved, pending = Counter(), 0
+        for is_approved, rating, count in states:
+            if is_approved:
+                approved[rating] -= count
+            else:
+                pending -= count
+        # Связанные строки удаляются каскадом; сводка обновляется одной разницей ниже
+        with bulk_delete():
+            _, per_model = selected.delete()
+        deleted = per_model.get(Review._meta.label, 0)
+        apply_delta(approved=approved, pending=pending)
+    return deleted
+
+
+MODERATION_ACTIONS = {
+    'approve': approve_reviews,
+    'reject': reject_reviews,
+}
+
+
+def moderate_reviews(ids, action):
+    """Применяет действие модерации к отзывам с указанными id; возвращает количество обработанных"""
+    return MODERATION_ACTIONS[action](Review.objects.filter(pk__in=ids))
+
+
+def rebuild_summary():
+    """Пересчитывает сводку по таблице отзывов"""
+    counts = dict(Review.objects.filter(approved=True).values_list('rating').annotate(count=Count('pk')).order_by())
+    fields = {f'rating_{rating}': counts.get(rating, 0) for rating, _ in Review.RATING_CHOICES}
+    fields['rating_sum'] = sum(rating * count for rating, count in counts.items())
+    fields['pending_count'] = Review.objects.filter(approved=False).count()
+    ReviewSummary.objects.update_or_create(pk=SUMMARY_PK, defaults=fields)
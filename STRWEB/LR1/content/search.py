@@ -0,0 +1,144 @@
+"""
+Полнотекстовый поиск по новостям, словарю и вакансиям.
+
+Индекс — виртуальная таблица SQLite FTS5 content_search (миграция
+0013_content_search) с колонками kind, object_id, title, body. Строки
+обновляются сигналами при каждом сохранении и удалении (content.signals).
+Результаты упорядочены по BM25, заголовок весит больше текста.
+"""
+import re
+
+from django.db import connection
+from django.urls import reverse
+from django.utils.html import escape, strip_tags
+
+from .models import Article, GlossaryEntry, Vacancy
+
+TABLE = 'content_search'
+TITLE_WEIGHT = 10.0
+BODY_WEIGHT = 1.0
+SNIPPET_TOKENS = 16
+# Служебные символы отмечают совпадения до экранирования HTML и потом заменяются на <mark>
+_MARK_START, _MARK_END = '\x02', '\x03'
+
+
+def article_document(article):
+    if not article.published:
+        return None
+    return article.title, f'{article.summary}\n{strip_tags(article.content)}'
+
+
+def glossary_document(entry):
+    return entry.question, strip_tags(entry.answer)
+
+
+def vacancy_document(vacancy):
+    if not vacancy.is_active:
+        return None
+    return vacancy.title, f'{strip_tags(vacancy.description)}\n{strip_tags(vacancy.requirements)}'
+
+
+# kind -> (модель, функция документа (None — не индексировать), имя URL)
+SOURCES = {
+    'article': (Article, article_document, 'news_detail'),
+    'glossary': (GlossaryEntry, glossary_document, 'glossary'),
+    'vacancy': (Vacancy, vacancy_document, 'vacancy_list'),
+}
+KIND_BY_MODEL = {model: kind for kind, (model, _, _) in SOURCES.items()}
+# rowid строки индекса = код типа << 32 | id объекта, чтобы обновлять строку без полного просмотра
+KIND_CODES = {'article': 1, 'glossary': 2, 'vacancy': 3}
+
+
+def rowid(kind, object_id):
+    return KIND_CODES[kind] << 32 | object_id
+
+
+def is_available():
+    return connection.vendor == 'sqlite'
+
+
+def remove_object(kind, object_id):
+    if not is_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE} WHERE rowid = %s', [rowid(kind, object_id)])
+
+
+def index_object(obj):
+    """Добавляет или обновляет объект в индексе (или удаляет, если он не должен искаться)"""
+    kind = KIND_BY_MODEL[type(obj)]
+    remove_object(kind, obj.pk)
+    document = SOURCES[kind][1](obj)
+    if document is None or not is_available():
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {TABLE} (rowid, kind, object_id, title, body) VALUES (%s, %s, %s, %s, %s)',
+            [rowid(kind, obj.pk), kind, obj.pk, *document],
+        )
+    return True
+
+
+def rebuild_index():
+    if not is_available():
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE}')
+    count = 0
+    for model, _, _ in SOURCES.values():
+        for obj in model.objects.iterator():
+            count += index_object(obj)
+    return count
+
+
+def match_expression(query):
+    """Превращает пользовательский ввод в запрос FTS5: все слова, каждое как префикс"""
+    terms = re.findall(r'\w+', query.lower())
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def _highlight(text):
+    return escape(text).replace(_MARK_START, '<mark>').replace(_MARK_END, '</mark>')
+
+
+def url_for(kind, object_id):
+    url_name = SOURCES[kind][2]
+    if kind == 'article':
+        return reverse(url_name, kwargs={'pk': object_id})
+    return f'{reverse(url_name)}#{kind}-{object_id}'
+
+
+def search(query, kinds=None, limit=20):
+    """Возвращает результаты поиска с подсвеченными заголовком и фрагментом текста"""
+    expression = match_expression(query)
+    if not expression or not is_available():
+        return []
+
+    sql = (
+        f'SELECT kind, object_id, '
+        f'highlight({TABLE}, 2, %s, %s), '
+        f'snippet({TABLE}, 3, %s, %s, %s, %s), '
+        f'bm25({TABLE}, 0, 0, %s, %s) AS rank '
+        f'FROM {TABLE} WHERE {TABLE} MATCH %s'
+    )
+    params = [_MARK_START, _MARK_END, _MARK_START, _MARK_END, '…', SNIPPET_TOKENS, TITLE_WEIGHT, BODY_WEIGHT, expression]
+    if kinds:
+        sql += f' AND kind IN ({", ".join(["%s"] * len(kinds))})'
+        params.extend(kinds)
+    sql += ' ORDER BY rank LIMIT %s'
+    params.append(limit)
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+    return [
+        {
+            'kind': kind,
+            'id': int(object_id),
+            'title': _highlight(title),
+            'snippet': _highlight(snippet),
+            'url': url_for(kind, int(object_id)),
+            'score': -rank,
+        }
+        for kind, object_id, title, snippet, rank in rows
+    ]
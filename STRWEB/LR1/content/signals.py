@@ -0,0 +1,85 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from content import duplicates, reviews, search
+from content.models import Article, Banner, CompanyInfo, Contact, GlossaryEntry, Partner, Review, Vacancy
+from IGI_Lab5.caching import invalidate_tags, tag_for
+from rentals.models import PromoCode
+
+
+@receiver(post_save, sender=Article)
+@receiver(post_delete, sender=Article)
+@receiver(post_save, sender=Contact)
+@receiver(post_delete, sender=Contact)
+@receiver(post_save, sender=GlossaryEntry)
+@receiver(post_delete, sender=GlossaryEntry)
+@receiver(post_save, sender=Vacancy)
+@receiver(post_delete, sender=Vacancy)
+@receiver(post_save, sender=CompanyInfo)
+@receiver(post_delete, sender=CompanyInfo)
+@receiver(post_save, sender=Banner)
+@receiver(post_delete, sender=Banner)
+@receiver(post_save, sender=Partner)
+@receiver(post_delete, sender=Partner)
+@receiver(post_save, sender=PromoCode)
+@receiver(post_delete, sender=PromoCode)
+def invalidate_cache_tags(sender, **kwargs):
+    """Страницы, данные оформления (content.singletons) и индекс словаря с тегом модели устаревают"""
+    tag = tag_for(sender)
+    invalidate_tags(tag)
+    # Повторно после коммита: другой процесс мог успеть закэшировать старые данные
+    transaction.on_commit(lambda: invalidate_tags(tag))
+
+
+@receiver(pre_save, sender=Review)
+def remember_review_state(sender, instance, raw=False, **kwargs):
+    """Запоминает состояние отзыва до изменения, чтобы записать в сводку только разницу"""
+    instance._summary_previous = None
+    instance._previous_text = None
+    if raw or not instance.pk:
+        return
+    previous = Review.objects.filter(pk=instance.pk).values_list('approved', 'rating', 'text').first()
+    if previous is not None:
+        instance._summary_previous = tuple(previous[:2])
+        instance._previous_text = previous[2]
+
+
+@receiver(post_save, sender=Review)
+def update_summary_on_review_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    reviews.move_state(getattr(instance, '_summary_previous', None), reviews.review_state(instance))
+
+
+@receiver(post_save, sender=Review)
+def index_review_text(sender, instance, created=False, raw=False, **kwargs):
+    """Новый отзыв или отзыв с измененным текстом попадает в индекс похожих отзывов"""
+    if raw:
+        return
+    if created or instance.text != getattr(instance, '_previous_text', None):
+        duplicates.index_review(instance)
+
+
+@receiver(post_delete, sender=Review)
+def update_summary_on_review_delete(sender, instance, **kwargs):
+    if reviews.is_bulk_delete():
+        return
+    reviews.add_state(reviews.review_state(instance), sign=-1)
+
+
+@receiver(post_save, sender=Article)
+@receiver(post_save, sender=GlossaryEntry)
+@receiver(post_save, sender=Vacancy)
+def update_search_index(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    search.index_object(instance)
+
+
+@receiver(post_delete, sender=Article)
+@receiver(post_delete, sender=GlossaryEntry)
+@receiver(post_delete, sender=Vacancy)
+def remove_from_search_index(sender, instance, **kwargs):
+    search.remove_object(search.KIND_BY_MODEL[sender], instance.pk)
+
@@ -0,0 +1,39 @@
+"""
+Кэш редко меняющихся данных оформления сайта: информация о компании,
+активные баннеры и партнеры.
+
+Значения лежат в двухуровневом кэше (IGI_Lab5.caching) с тегом своей модели:
+повторные обращения в процессе обслуживаются из памяти, а сигналы
+post_save/post_delete (content.signals) меняют версию тега, и значение
+перечитывается во всех процессах.
+"""
+from IGI_Lab5.caching import get_or_set, tag_for
+
+from .models import Banner, CompanyInfo, Partner
+
+KEY_PREFIX = 'content:singletons'
+
+LOADERS = {
+    'company_info': (CompanyInfo, lambda: CompanyInfo.objects.first()),
+    'banners': (Banner, lambda: list(Banner.objects.filter(is_active=True))),
+    'partners': (Partner, lambda: list(Partner.objects.all())),
+}
+
+
+def get(name):
+    """Возвращает значение из кэша, после изменения модели загружает его заново"""
+    model, loader = LOADERS[name]
+    # Данные, прочитанные внутри транзакции, могут быть откатаны — не сохраняем их
+    return get_or_set(f'{KEY_PREFIX}:{name}', loader, timeout=None, tags=[tag_for(model)], store_in_transaction=False)
+
+
+def company_info():
+    return get('company_info')
+
+
+def active_banners():
+    return get('banners')
+
+
+def partners():
+    return get('partners')
@@ -0,0 +1,161 @@
+"""
+Общий для процесса пул внешних виджетов главной страницы (факты о кошках, шутки).
+
+Главная страница только читает готовые значения из пула и никогда не ждет сеть.
+Пул пополняется в фоне одним рабочим потоком: если значений мало или они
+устарели, запускается обновление, а пока оно идет, отдаются старые значения
+(stale-while-revalidate). После нескольких ошибок подряд источник временно
+отключается (circuit breaker), чтобы не нагружать недоступный сервис.
+"""
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import requests
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_OPTIONS = {
+    'SIZE': 5,  # сколько значений держать про запас
+    'TTL': 600,  # через сколько секунд значения считаются устаревшими
+    'TIMEOUT': 5,  # таймаут запроса к внешнему сервису
+    'FAILURE_THRESHOLD': 3,  # ошибок подряд до отключения источника
+    'RESET_TIMEOUT': 60,  # на сколько секунд отключается источник
+}
+
+
+def parse_cat_fact(data):
+    return {'fact': data['fact']}
+
+
+def parse_joke(data):
+    return {'setup': data['setup'], 'punchline': data['punchline']}
+
+
+PARSERS = {
+    'cat_fact': parse_cat_fact,
+    'joke': parse_joke,
+}
+
+
+class CircuitBreaker:
+    def __init__(self):
+        self.failures = 0
+        self.opened_at = None
+
+    def allows(self, reset_timeout):
+        if self.opened_at is None:
+            return True
+        # После паузы пропускаем пробный запрос (half-open)
+        return time.monotonic() - self.opened_at >= reset_timeout
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self, threshold):
+        self.failures += 1
+        if self.failures >= threshold:
+            self.opened_at = time.monotonic()
+
+
+class SnippetPool:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._breakers = {}
+        self._in_flight = {}
+        self._executor = None
+        self._pid = None
+
+    @staticmethod
+    def options():
+        return {**DEFAULT_OPTIONS, **getattr(settings, 'CONTENT_SNIPPET_POOL', {})}
+
+    @staticmethod
+    def sources():
+        # Адреса задаются только в settings.CONTENT_SNIPPET_SOURCES
+        return getattr(settings, 'CONTENT_SNIPPET_SOURCES', {})
+
+    def _get_executor(self):
+        # После fork потоки родителя не наследуются — создаем исполнителя заново
+        if self._executor is None or self._pid != os.getpid():
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='snippet-pool')
+            self._in_flight = {}
+            self._pid = os.getpid()
+        return self._executor
+
+    def get(self, name, fresh=False):
+        """
+        Возвращает значение из пула или None, не обращаясь к сети.
+
+        fresh=True забирает значение из пула, чтобы следующий вызов вернул другое.
+        """
+        options = self.options()
+        with self._lock:
+            entries = self._entries.setdefault(name, deque())
+            snippet = None
+            if entries:
+                _, snippet = entries.popleft() if fresh else entries[-1]
+            stale = not entries or time.monotonic() - entries[0][0] > options['TTL']
+            if stale or len(entries) < options['SIZE']:
+                self._schedule_refill(name, options)
+        return snippet
+
+    def _schedule_refill(self, name, options):
+        future = self._in_flight.get(name)
+        if future is not None and not future.done():
+            return
+        if not self._breakers.setdefault(name, CircuitBreaker()).allows(options['RESET_TIMEOUT']):
+            return
+        url = self.sources().get(name)
+        if not url:
+            # Источник не настроен — виджет просто не показывается
+            return
+        self._in_flight[name] = self._get_executor().submit(self._refill, name, url, options)
+
+    def _refill(self, name, url, options):
+        parse = PARSERS[name]
+        fetched = []
+        with self._lock:
+            missing = options['SIZE'] - len(self._entries.get(name, ()))
+        # Если пул полон, но устарел, обновляем его целиком
+        for _ in range(missing if missing > 0 else options['SIZE']):
+            try:
+                response = requests.get(url, timeout=options['TIMEOUT'])
+                response.raise_for_status()
+                fetched.append((time.monotonic(), parse(response.json())))
+            except Exception as e:
+                logger.error("Error fetching %s snippet: %s", name, e)
+                with self._lock:
+                    self._breakers[name].record_failure(options['FAILURE_THRESHOLD'])
+                break
+            else:
+                with self._lock:
+                    self._breakers[name].record_success()
+
+        with self._lock:
+            entries = self._entries.setdefault(name, deque())
+            entries.extend(fetched)
+            while len(entries) > options['SIZE']:
+                entries.popleft()
+
+    def drain(self, timeout=None):
+        """Ждет завершения фоновых обновлений (используется в тестах и командах)"""
+        with self._lock:
+            futures = list(self._in_flight.values())
+        wait(futures, timeout=timeout)
+
+    def clear(self):
+        self.drain()
+        with self._lock:
+            self._entries.clear()
+            self._breakers.clear()
+            self._in_flight.clear()
+
+
+snippet_pool = SnippetPool()
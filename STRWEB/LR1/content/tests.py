@@ -1,3 +1,763 @@
-from django.test import TestCase
+import json
+import re
+from datetime import date, datetime
+from io import StringIO
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 
-# Create your tests here.
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone, translation
+
+from IGI_Lab5 import caching, metrics
+from IGI_Lab5.testing import QueryBudgetMixin
+from content import duplicates, reviews, search, singletons, views
+from content.admin import ReviewAdmin
+from content.models import (
+    Article, Banner, CompanyInfo, Contact, GlossaryEntry, Partner, Review, ReviewBucket, ReviewSignature, ReviewSummary,
+    Vacancy,
+)
+from content.snippets import snippet_pool
+from content.utils import month_events, render_month
+from content.views import AsyncHomeView, HomeView
+from rentals.models import PromoCode
+from vehicles.models import Vehicle
+
+
+class StubApiHandler(BaseHTTPRequestHandler):
+    """Локальная заглушка внешних API факта о кошках и шуток"""
+
+    def do_GET(self):
+        self.server.hits[self.path] = self.server.hits.get(self.path, 0) + 1
+        number = self.server.hits[self.path]
+        if self.path == '/fact':
+            body = {'fact': f'Факт {number}'}
+        elif self.path == '/joke':
+            body = {'setup': f'Вопрос {number}', 'punchline': f'Ответ {number}'}
+        else:
+            self.send_response(500)
+            self.end_headers()
+            return
+        payload = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubApiMixin:
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.stub_server = ThreadingHTTPServer(('127.0.0.1', 0), StubApiHandler)
+        cls.stub_server.hits = {}
+        cls.stub_url = f'http://127.0.0.1:{cls.stub_server.server_port}'
+        threading.Thread(target=cls.stub_server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.stub_server.shutdown()
+        cls.stub_server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        super().setUp()
+        overrides = override_settings(CONTENT_SNIPPET_SOURCES={
+            'cat_fact': self.stub_url + '/fact',
+            'joke': self.stub_url + '/joke',
+        })
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        snippet_pool.clear()
+        self.stub_server.hits.clear()
+        self.addCleanup(snippet_pool.clear)
+
+
+class SnippetPoolTestCase(StubApiMixin, SimpleTestCase):
+    def test_get_never_waits_and_refills_in_background(self):
+        self.assertIsNone(snippet_pool.get('cat_fact'))
+        snippet_pool.drain(timeout=5)
+
+        self.assertEqual(self.stub_server.hits['/fact'], 5)
+        self.assertEqual(snippet_pool.get('cat_fact'), {'fact': 'Факт 5'})
+
+    def test_fresh_takes_next_snippet(self):
+        snippet_pool.get('joke')
+        snippet_pool.drain(timeout=5)
+
+        first = snippet_pool.get('joke', fresh=True)
+        second = snippet_pool.get('joke', fresh=True)
+        self.assertNotEqual(first, second)
+
+    @override_settings(CONTENT_SNIPPET_POOL={'TTL': 0})
+    def test_stale_snippets_served_while_revalidating(self):
+        snippet_pool.get('cat_fact')
+        snippet_pool.drain(timeout=5)
+
+        self.assertEqual(snippet_pool.get('cat_fact'), {'fact': 'Факт 5'})
+        snippet_pool.drain(timeout=5)
+        self.assertEqual(self.stub_server.hits['/fact'], 10)
+        self.assertEqual(snippet_pool.get('cat_fact'), {'fact': 'Факт 10'})
+
+    @override_settings(CONTENT_SNIPPET_POOL={'FAILURE_THRESHOLD': 2, 'RESET_TIMEOUT': 60})
+    def test_circuit_breaker_stops_calls_to_failing_source(self):
+        with override_settings(CONTENT_SNIPPET_SOURCES={'cat_fact': self.stub_url + '/error'}):
+            for _ in range(5):
+                self.assertIsNone(snippet_pool.get('cat_fact'))
+                snippet_pool.drain(timeout=5)
+
+        self.assertEqual(self.stub_server.hits['/error'], 2)
+
+
+class HomeViewSnippetsTestCase(StubApiMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = Client()
+
+    def test_home_page_uses_pool(self):
+        response = self.client.get(reverse('home'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['cat_fact'], 'Не удалось загрузить факт о кошках.')
+
+        snippet_pool.drain(timeout=5)
+        response = self.client.get(reverse('home'))
+        self.assertEqual(response.context['cat_fact'], 'Факт 5')
+        self.assertEqual(response.context['joke_punchline'], 'Ответ 5')
+
+        # Значение хранится в сессии, пока пользователь не попросит новое
+        response = self.client.get(reverse('home'))
+        self.assertEqual(response.context['cat_fact'], 'Факт 5')
+        response = self.client.get(reverse('home') + '?refresh_cat_fact=1')
+        self.assertNotEqual(response.context['cat_fact'], 'Факт 5')
+
+
+class AsyncHomeViewTestCase(StubApiMixin, TransactionTestCase):
+    def setUp(self):
+        super().setUp()
+        # Очистка таблиц между тестами не вызывает сигналов
+        cache.clear()
+
+    def slow(self, value, delay=0.3):
+        def component(view):
+            time.sleep(delay)
+            return value
+        return component
+
+    async def test_components_run_concurrently(self):
+        await Partner.objects.acreate(name='Белоруснефть', logo='partners/logo.png', website_url='https://example.com')
+        slow_parts = {
+            'get_banners': self.slow([]),
+            'get_latest_article': self.slow(None),
+            'get_latest_vehicles': self.slow([]),
+            'get_calendar': self.slow('<table></table>'),
+        }
+        with mock.patch.multiple(AsyncHomeView, **slow_parts):
+            started = time.monotonic()
+            response = await self.async_client.get(reverse('home'))
+            elapsed = time.monotonic() - started
+
+        self.assertEqual(response.status_code, 200)
+        self.assertLess(elapsed, 1.0)  # последовательно было бы не меньше 1.2 с
+        self.assertEqual([partner.name for partner in response.context['partners']], ['Белоруснефть'])
+
+    @override_settings(HOME_COMPONENT_TIMEOUT=0.2)
+    async def test_slow_component_replaced_by_default(self):
+        with mock.patch.object(AsyncHomeView, 'get_partners', self.slow(['late'], delay=1)):
+            response = await self.async_client.get(reverse('home'))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['partners'], [])
+        self.assertIn('cat_fact', response.context)
+
+
+    async def test_component_threads_keep_connections_and_count_queries(self):
+        # Один поток в пуле: обе части страницы и оба запроса выполняются в нем
+        executor = ThreadPoolExecutor(max_workers=1)
+        self.addCleanup(executor.shutdown)
+        used = []
+
+        def latest_vehicles(view):
+            vehicles = list(Vehicle.objects.all()[:3])
+            used.append(connection.connection)
+            return vehicles
+
+        metrics.reset()
+        with mock.patch.multiple(views, _component_executor=executor, _component_executor_pid=os.getpid()), \
+                mock.patch.object(AsyncHomeView, 'get_latest_vehicles', latest_vehicles):
+            await self.async_client.get(reverse('home'))
+            await self.async_client.get(reverse('home'))
+
+        self.assertEqual(len(used), 2)
+        self.assertIs(used[0], used[1])
+        # Запросы потоков пула попадают в метрики страницы
+        queries = metrics.process_snapshot()[('db_queries_total', (('view', 'home'),))]
+        self.assertGreaterEqual(queries, 2)
+
+
+@override_settings(PAGE_CACHE_TIMEOUT=0)
+class SiteSingletonsTestCase(TransactionTestCase):
+    def setUp(self):
+        # Очистка таблиц между тестами не вызывает сигналов
+        cache.clear()
+        self.info = CompanyInfo.objects.create(
+            name='Автопрокат', description='Описание', address='Минск',
+            phone='+375291234567', email='info@example.com', working_hours='9-18',
+        )
+        Banner.objects.create(title='Акция', image='banners/1.png', is_active=True)
+        Banner.objects.create(title='Архив', image='banners/2.png', is_active=False)
+
+    def test_cached_values_cost_no_queries(self):
+        self.client.get(reverse('about'))
+        singletons.active_banners()
+        with self.assertNumQueries(0):
+            self.assertEqual(singletons.company_info(), self.info)
+            self.assertEqual([banner.title for banner in singletons.active_banners()], ['Акция'])
+            response = self.client.get(reverse('about'))
+        self.assertEqual(response.context['company_info'], self.info)
+
+    def test_save_and_delete_invalidate_cache(self):
+        self.assertEqual(singletons.partners(), [])
+        partner = Partner.objects.create(name='Белоруснефть', logo='partners/logo.png', website_url='https://example.com')
+        self.assertEqual(singletons.partners(), [partner])
+
+        self.info.name = 'Новое название'
+        self.info.save()
+        self.assertEqual(singletons.company_info().name, 'Новое название')
+
+        partner.delete()
+        self.assertEqual(singletons.partners(), [])
+
+    def test_other_process_sees_new_version(self):
+        singletons.company_info()
+        # Другой процесс изменил строку и сменил версию тега в общем кэше (L2)
+        CompanyInfo.objects.filter(pk=self.info.pk).update(name='Из другого процесса')
+        tag = caching.tag_for(CompanyInfo)
+        version, = caching.tag_versions([tag])
+        cache.l2.set(f'{caching.TAG_PREFIX}:{tag}', version + 1, None)
+
+        # До истечения L1_TIMEOUT процесс видит свою копию, затем — новую версию
+        self.assertEqual(singletons.company_info().name, 'Автопрокат')
+        cache.l1.clear()
+        self.assertEqual(singletons.company_info().name, 'Из другого процесса')
+
+
+class AnonymousPageCacheTestCase(TransactionTestCase):
+    def setUp(self):
+        # Очистка таблиц между тестами не вызывает сигналов
+        cache.clear()
+        GlossaryEntry.objects.create(question='Что такое залог?', answer='Сумма на время аренды')
+
+    def test_second_request_served_from_cache(self):
+        first = self.client.get(reverse('glossary'))
+        self.assertContains(first, 'Что такое залог?')
+        self.assertNotIn('X-Page-Cache', first)
+
+        with self.assertNumQueries(0):
+            second = self.client.get(reverse('glossary'))
+        self.assertEqual(second['X-Page-Cache'], 'hit')
+        self.assertEqual(second.content, first.content)
+
+        # Строка запроса входит в ключ
+        self.assertNotIn('X-Page-Cache', self.client.get(reverse('glossary') + '?page=2'))
+
+    def test_model_change_invalidates_tagged_pages(self):
+        self.client.get(reverse('glossary'))
+        self.client.get(reverse('contacts'))
+
+        GlossaryEntry.objects.create(question='Можно ли продлить аренду?', answer='Да')
+        response = self.client.get(reverse('glossary'))
+        self.assertNotIn('X-Page-Cache', response)
+        self.assertContains(response, 'Можно ли продлить аренду?')
+        # Страница контактов от словаря не зависит
+        self.assertEqual(self.client.get(reverse('contacts'))['X-Page-Cache'], 'hit')
+
+        Contact.objects.create(
+            first_name='Иван', last_name='Петров', position='Менеджер', department='Продажи',
+            email='ivan@example.com', phone='+375291234567',
+        )
+        self.assertContains(self.client.get(reverse('contacts')), 'Петров')
+
+    def test_company_info_invalidates_every_page(self):
+        self.client.get(reverse('glossary'))
+        CompanyInfo.objects.create(
+            name='Автопрокат', description='Описание', address='Минск',
+            phone='+375291234567', email='info@example.com', working_hours='9-18',
+        )
+        self.assertNotIn('X-Page-Cache', self.client.get(reverse('glossary')))
+
+    def test_authenticated_users_bypass_cache(self):
+        get_user_model().objects.create_user(username='reader', password='readerpass')
+        self.client.get(reverse('glossary'))
+        self.client.login(username='reader', password='readerpass')
+
+        response = self.client.get(reverse('glossary'))
+        self.assertNotIn('X-Page-Cache', response)
+        self.assertContains(response, 'reader')
+
+
+class NewsFeedTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = get_user_model().objects.create_user(username='editor', password='editorpass')
+        now = timezone.now()
+        for number in range(25):
+            Article.objects.create(
+                title=f'Новость {number}', content='Текст', summary=f'Кратко {number}',
+                published=True, published_at=now - timezone.timedelta(hours=number), author=author,
+            )
+        Article.objects.create(title='Черновик', content='Текст', summary='Кратко', author=author)
+
+    def titles(self, response):
+        return [article.title for article in response.context['articles']]
+
+    def test_cursor_pagination_without_count_or_offset(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('news_list'))
+        self.assertEqual(self.titles(response), [f'Новость {number}' for number in range(10)])
+        sql = ' '.join(query['sql'] for query in queries.captured_queries)
+        self.assertNotIn('COUNT(', sql)
+        self.assertNotIn('OFFSET', sql)
+
+        next_url = re.search(r'href="(\?after=[^"]+)"', response.content.decode()).group(1)
+        response = self.client.get(reverse('news_list') + next_url)
+        self.assertEqual(self.titles(response), [f'Новость {number}' for number in range(10, 20)])
+
+        response = self.client.get(reverse('news_list') + '?after=' + response.context['page_obj'].next_cursor)
+        self.assertEqual(self.titles(response), [f'Новость {number}' for number in range(20, 25)])
+        self.assertFalse(response.context['page_obj'].has_next)
+
+        response = self.client.get(reverse('news_list') + '?before=' + response.context['page_obj'].previous_cursor)
+        self.assertEqual(self.titles(response), [f'Новость {number}' for number in range(10, 20)])
+
+    def test_published_without_date_skipped(self):
+        # update() обходит Article.save, и дата публикации остается пустой: по такой
+        # новости нельзя построить курсор, поэтому в ленту она не попадает
+        Article.objects.filter(title='Черновик').update(published=True)
+        Article.objects.exclude(title__in=['Черновик', 'Новость 0', 'Новость 1']).delete()
+
+        response = self.client.get(reverse('news_list'))
+        self.assertEqual(self.titles(response), ['Новость 0', 'Новость 1'])
+        self.assertNotContains(self.client.get(reverse('news_feed')), 'Черновик')
+
+    def test_broken_cursor_shows_first_page(self):
+        response = self.client.get(reverse('news_list') + '?after=broken')
+        self.assertEqual(self.titles(response)[0], 'Новость 0')
+
+    def test_feed_supports_conditional_get(self):
+        response = self.client.get(reverse('news_feed'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/atom+xml; charset=utf-8')
+        self.assertContains(response, 'Новость 0')
+        self.assertNotContains(response, 'Черновик')
+
+        with self.assertNumQueries(1):
+            cached = self.client.get(reverse('news_feed'), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.status_code, 304)
+        cached = self.client.get(reverse('news_feed'), HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(cached.status_code, 304)
+
+        Article.objects.filter(title='Новость 24').delete()
+        changed = self.client.get(reverse('news_feed'), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(changed.status_code, 200)
+
+
+class ReviewSummaryTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.client_user = User.objects.create_user(username='clientuser', password='clientpass', email='client@example.com', role='client')
+        cls.staff_user = User.objects.create_user(username='staffuser', password='staffpass', email='staff@example.com', role='staff')
+
+    def summary(self):
+        return ReviewSummary.objects.get(pk=reviews.SUMMARY_PK)
+
+    def add_review(self, rating):
+        self.client.login(username='clientuser', password='clientpass')
+        self.client.post(reverse('review_add'), {'text': 'Отличный сервис', 'rating': rating})
+        return Review.objects.latest('pk')
+
+    def moderate(self, review, action):
+        self.client.login(username='staffuser', password='staffpass')
+        self.client.post(reverse('review_approve', args=[review.pk]), {'action': action})
+
+    def test_summary_follows_moderation(self):
+        first, second, third = self.add_review(5), self.add_review(3), self.add_review(4)
+        self.assertEqual(self.summary().pending_count, 3)
+
+        self.moderate(first, 'approve')
+        self.moderate(second, 'approve')
+        self.moderate(third, 'reject')
+        summary = self.summary()
+        self.assertEqual(summary.pending_count, 0)
+        self.assertEqual(summary.rating_counts, [{'rating': 3, 'count': 1}, {'rating': 5, 'count': 1}])
+        self.assertEqual(summary.avg_rating, 4)
+
+        Review.objects.get(pk=first.pk).delete()
+        self.assertEqual(self.summary().rating_sum, 3)
+
+    def test_admin_action_updates_summary(self):
+        self.add_review(2)
+        self.add_review(4)
+        ReviewAdmin(Review, None).approve_reviews(None, Review.objects.all())
+
+        summary = self.summary()
+        self.assertEqual(summary.pending_count, 0)
+        self.assertEqual(summary.approved_count, 2)
+        self.assertEqual(summary.rating_sum, 6)
+
+        # Сводка совпадает с пересчетом по таблице
+        reviews.rebuild_summary()
+        self.assertEqual(self.summary().rating_sum, 6)
+        self.assertEqual(self.summary().approved_count, 2)
+
+    def test_review_list_reads_summary(self):
+        for rating in (5, 4):
+            self.moderate(self.add_review(rating), 'approve')
+        self.client.logout()
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('review_list'))
+        self.assertEqual(response.context['avg_rating'], 4.5)
+        self.assertEqual(response.context['page_obj'].paginator.count, 2)
+        sql = ' '.join(query['sql'] for query in queries.captured_queries)
+        self.assertNotIn('AVG(', sql)
+        self.assertNotIn('COUNT(', sql)
+
+    def bulk(self, ids, action, username='staffuser', password='staffpass'):
+        self.client.login(username=username, password=password)
+        return self.client.post(
+            reverse('review_bulk_moderation'), json.dumps({'ids': ids, 'action': action}),
+            content_type='application/json',
+        )
+
+    def test_bulk_moderation_uses_single_statement(self):
+        created = [Review.objects.create(user=self.client_user, text='Отзыв', rating=rating % 5 + 1) for rating in range(30)]
+        approve, reject = [review.pk for review in created[:20]], [review.pk for review in created[20:]]
+
+        self.client.login(username='staffuser', password='staffpass')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.bulk(approve, 'approve')
+        self.assertEqual(response.json(), {'action': 'approve', 'processed': 20, 'pending_count': 10, 'approved_count': 20})
+        updates = [query['sql'] for query in queries.captured_queries if query['sql'].startswith('UPDATE "content_review"')]
+        self.assertEqual(len(updates), 1)
+
+        # Отклонить можно и уже одобренные отзывы
+        response = self.bulk(reject + approve[:5], 'reject')
+        self.assertEqual(response.json()['processed'], 15)
+        self.assertEqual(Review.objects.count(), 15)
+        # Строки индекса похожих отзывов удалены каскадом
+        self.assertFalse(ReviewSignature.objects.filter(review_id__in=reject).exists())
+        self.assertFalse(ReviewBucket.objects.filter(review_id__in=reject).exists())
+
+        summary = self.summary()
+        expected = Review.objects.filter(approved=True)
+        self.assertEqual(summary.pending_count, 0)
+        self.assertEqual(summary.approved_count, expected.count())
+        self.assertEqual(summary.rating_sum, sum(review.rating for review in expected))
+
+    def test_bulk_moderation_validates_request(self):
+        review = Review.objects.create(user=self.client_user, text='Отзыв', rating=5)
+        self.assertEqual(self.bulk([review.pk], 'publish').status_code, 400)
+        self.assertEqual(self.bulk([], 'approve').status_code, 400)
+        self.assertEqual(self.bulk(['x'], 'approve').status_code, 400)
+
+        response = self.bulk([review.pk], 'approve', username='clientuser', password='clientpass')
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(Review.objects.get(pk=review.pk).approved)
+
+
+class DuplicateReviewsTestCase(TestCase):
+    SPAM = 'Лучший прокат автомобилей в городе! Переходите по ссылке и получите скидку 50 процентов на первую аренду'
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.author = User.objects.create_user(username='clientuser', password='clientpass', email='client@example.com', role='client')
+        User.objects.create_user(username='staffuser', password='staffpass', email='staff@example.com', role='staff')
+
+    def add(self, text):
+        return Review.objects.create(user=self.author, text=text, rating=5)
+
+    def cluster(self, review):
+        return ReviewSignature.objects.get(review=review).cluster
+
+    def test_minhash_estimates_jaccard_similarity(self):
+        first, second = self.SPAM, self.SPAM.replace('50', '40')
+        exact = len(duplicates.shingles(first) & duplicates.shingles(second)) / len(duplicates.shingles(first) | duplicates.shingles(second))
+        estimate = duplicates.similarity(duplicates.minhash(first), duplicates.minhash(second))
+        self.assertAlmostEqual(estimate, exact, delta=0.15)
+        self.assertEqual(duplicates.minhash(first), duplicates.minhash(first.upper()))
+
+    def test_near_duplicates_grouped_into_one_cluster(self):
+        original = self.add(self.SPAM)
+        copies = [self.add(self.SPAM.replace('50', str(percent))) for percent in (40, 45, 60)]
+        copies.append(self.add(self.SPAM + '!!!'))
+        other = self.add('Машина была чистой, менеджер вежливый, но выдача автомобиля заняла почти час')
+
+        self.assertEqual({self.cluster(review) for review in copies}, {original.pk})
+        self.assertEqual(self.cluster(other), other.pk)
+        self.assertEqual(ReviewBucket.objects.filter(review=other).count(), duplicates.BANDS)
+
+        clusters = duplicates.pending_clusters()
+        self.assertEqual(len(clusters), 1)
+        self.assertEqual(clusters[0]['size'], 5)
+        self.assertEqual(clusters[0]['ids'], sorted([original.pk] + [review.pk for review in copies]))
+
+    def test_changed_text_is_reindexed(self):
+        original = self.add(self.SPAM)
+        review = self.add('Отличный сервис, все понравилось, обязательно вернусь еще раз')
+        self.assertEqual(self.cluster(review), review.pk)
+
+        review.text = self.SPAM + ' Спешите!'
+        review.save()
+        self.assertEqual(self.cluster(review), original.pk)
+
+    def test_cluster_rejected_in_bulk(self):
+        ids = [self.add(self.SPAM + ' ' * n + '!').pk for n in range(5)]
+        self.client.login(username='staffuser', password='staffpass')
+        response = self.client.get(reverse('review_management'))
+        self.assertEqual(response.context['duplicate_clusters'][0]['ids'], ids)
+
+        response = self.client.post(
+            reverse('review_bulk_moderation'), json.dumps({'ids': ids, 'action': 'reject'}), content_type='application/json',
+        )
+        self.assertEqual(response.json()['processed'], 5)
+        self.assertFalse(ReviewSignature.objects.exists())
+        self.assertFalse(ReviewBucket.objects.exists())
+
+    def test_rebuild_command(self):
+        first, second = self.add(self.SPAM), self.add(self.SPAM + '?')
+        ReviewSignature.objects.all().delete()
+        ReviewBucket.objects.all().delete()
+
+        call_command('rebuild_review_duplicates', stdout=StringIO())
+        self.assertEqual(self.cluster(second), first.pk)
+
+
+class ContentSearchTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = get_user_model().objects.create_user(username='editor', password='editorpass')
+        cls.article = Article.objects.create(
+            title='Скидки на электромобили', summary='Весенняя акция',
+            content='<p>Аренда электромобиля <b>Tesla</b> дешевле на 20%</p>', published=True, author=author,
+        )
+        cls.draft = Article.objects.create(title='Черновик про электромобили', summary='-', content='-', author=author)
+        cls.entry = GlossaryEntry.objects.create(question='Что такое залог?', answer='Залог за электромобиль возвращается после аренды')
+        cls.vacancy = Vacancy.objects.create(title='Механик', description='Обслуживание автопарка', requirements='<ul><li>Опыт с электромобилями</li></ul>')
+
+    def test_search_ranks_titles_and_highlights(self):
+        results = search.search('электромоб')
+        self.assertEqual([result['kind'] for result in results][0], 'article')
+        self.assertEqual({result['id'] for result in results}, {self.article.pk, self.entry.pk, self.vacancy.pk})
+        self.assertIn('<mark>электромобили</mark>', results[0]['title'])
+        vacancy = next(result for result in results if result['kind'] == 'vacancy')
+        self.assertNotIn('<li>', vacancy['snippet'])
+        self.assertEqual(vacancy['url'], reverse('vacancy_list') + f'#vacancy-{self.vacancy.pk}')
+
+    def test_index_follows_changes(self):
+        self.draft.published = True
+        self.draft.save()
+        self.assertEqual(len(search.search('черновик')), 1)
+
+        self.vacancy.is_active = False
+        self.vacancy.save()
+        self.entry.delete()
+        self.assertEqual([result['kind'] for result in search.search('электромобил')], ['article', 'article'])
+
+    def test_user_input_is_not_fts_syntax(self):
+        self.assertEqual(search.search('"залог*" -(^'), search.search('залог'))
+        self.assertEqual(search.search('<script>'), [])
+
+    def test_search_page_and_api(self):
+        response = self.client.get(reverse('search'), {'q': 'залог'})
+        self.assertContains(response, '<mark>залог</mark>', html=False)
+
+        response = self.client.get(reverse('search_api'), {'q': 'электромобил', 'kind': 'glossary'})
+        data = response.json()
+        self.assertEqual([result['id'] for result in data['results']], [self.entry.pk])
+        self.assertIn('<mark>', data['results'][0]['snippet'])
+
+
+class GlossaryIndexTestCase(TransactionTestCase):
+    def setUp(self):
+        # Очистка таблиц между тестами не вызывает сигналов
+        cache.clear()
+        self.deposit = GlossaryEntry.objects.create(question='Что такое залог?', answer='Сумма, которую возвращают после аренды')
+        self.extend = GlossaryEntry.objects.create(question='Можно ли продлить аренду?', answer='Да, если автомобиль свободен; залог не меняется')
+
+    def lookup(self, query):
+        return [result['id'] for result in self.client.get(reverse('glossary_lookup'), {'q': query}).json()['results']]
+
+    def test_prefix_lookup_without_queries(self):
+        self.lookup('за')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.lookup('зал'), [self.deposit.pk, self.extend.pk])
+            self.assertEqual(self.lookup('аренд прод'), [self.extend.pk])
+            self.assertEqual(self.lookup('штраф'), [])
+
+    def test_signals_rebuild_index(self):
+        self.assertEqual(self.lookup('штраф'), [])
+        fine = GlossaryEntry.objects.create(question='Какие бывают штрафы?', answer='За опоздание и повреждения')
+        self.assertEqual(self.lookup('штраф'), [fine.pk])
+
+        self.deposit.delete()
+        self.assertEqual(self.lookup('залог'), [self.extend.pk])
+
+    def test_snapshot_is_versioned(self):
+        response = self.client.get(reverse('glossary_snapshot'))
+        snapshot = response.json()
+        self.assertEqual(len(snapshot['entries']), 2)
+        self.assertIn(['залог', [self.deposit.pk, self.extend.pk]], snapshot['words'])
+        self.assertEqual(self.client.get(reverse('glossary_snapshot'), HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+        GlossaryEntry.objects.create(question='Нужна ли страховка?', answer='Она уже включена')
+        changed = self.client.get(reverse('glossary_snapshot'), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(changed.status_code, 200)
+        self.assertGreater(changed.json()['version'], snapshot['version'])
+
+
+class EventCalendarTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = get_user_model().objects.create_user(username='editor', password='editorpass')
+        PromoCode.objects.create(code='SPRING', discount_percentage=10, valid_from=date(2025, 4, 20), valid_to=date(2025, 5, 3))
+        PromoCode.objects.create(code='OLD', discount_percentage=10, valid_from=date(2025, 1, 1), valid_to=date(2025, 1, 31))
+        Article.objects.create(
+            title='Новые <автомобили>', summary='-', content='-', published=True, author=author,
+            published_at=timezone.make_aware(datetime(2025, 5, 15, 12)),
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_events_loaded_once_per_month(self):
+        with self.assertNumQueries(1):
+            events = dict(month_events(2025, 5))
+        self.assertEqual(events, {
+            1: (('promo', 'SPRING'),), 2: (('promo', 'SPRING'),), 3: (('promo', 'SPRING'),),
+            15: (('news', 'Новые <автомобили>'),),
+        })
+        with self.assertNumQueries(0):
+            month_events(2025, 5)
+
+        PromoCode.objects.filter(code='OLD').get().delete()
+        with self.assertNumQueries(1):
+            month_events(2025, 5)
+
+    def test_calendar_marks_events(self):
+        with translation.override('ru'):
+            html = render_month(2025, 5, 'ru', month_events(2025, 5))
+        self.assertIn('Май 2025', html)
+        self.assertIn('<td class="thu promo" title="Промокод: SPRING">1</td>', html)
+        self.assertIn('<td class="thu news" title="Новость: Новые &lt;автомобили&gt;">15</td>', html)
+        self.assertIn('<td class="fri">16</td>', html)
+
+        hits = render_month.cache_info().hits
+        render_month(2025, 5, 'ru', month_events(2025, 5))
+        self.assertEqual(render_month.cache_info().hits, hits + 1)
+
+
+@override_settings(PAGE_CACHE_TIMEOUT=0)
+class ContentQueryBudgetTestCase(QueryBudgetMixin, TestCase):
+    """Число запросов страниц контента не зависит от количества записей"""
+
+    def setUp(self):
+        self.create_users()
+        self.seed(3)
+        CompanyInfo.objects.create(
+            name='Компания', description='Описание', address='Адрес', phone='+375291234567',
+            email='info@example.com', working_hours='9-18',
+        )
+        self.article = Article.objects.first()
+
+    def test_public_pages(self):
+        for url, budget in (
+            (reverse('about'), 2),
+            (reverse('contacts'), 3),
+            (reverse('glossary'), 2),
+            (reverse('glossary_lookup') + '?q=терм', 1),
+            (reverse('glossary_snapshot'), 1),
+            (reverse('privacy_policy'), 1),
+            (reverse('vacancy_list'), 2),
+            (reverse('news_list'), 2),
+            (reverse('news_feed'), 2),
+            (reverse('news_detail', args=[self.article.pk]), 3),
+            (reverse('search') + '?q=новость', 2),
+            (reverse('search_api') + '?q=новость', 1),
+            (reverse('review_list'), 3),
+        ):
+            with self.subTest(url=url):
+                self.assertQueryBudget(budget, lambda: self.client.get(url))
+
+    def test_home_page_components(self):
+        # Части асинхронной главной страницы выполняются в других потоках, поэтому
+        # запросы считаются на синхронной HomeView с теми же методами
+        request = RequestFactory().get(reverse('home'))
+        request.user = self.client_user
+        SessionMiddleware(lambda request: None).process_request(request)
+        with mock.patch.object(snippet_pool, 'get', return_value=None):
+            self.assertQueryBudget(9, lambda: HomeView.as_view()(request).render())
+
+    def test_async_home_page(self):
+        # Части страницы переводятся в поток запроса, чтобы их запросы попали в счетчик
+        in_request_thread = staticmethod(lambda func: sync_to_async(func))
+        self.client.force_login(self.client_user)
+        with mock.patch.object(AsyncHomeView, '_in_thread', in_request_thread), \
+                mock.patch.object(snippet_pool, 'get', return_value=None):
+            self.assertQueryBudget(11, lambda: self.client.get(reverse('home')))
+
+    def test_authenticated_pages(self):
+        self.client.force_login(self.client_user)
+        self.assertQueryBudget(3, lambda: self.client.get(reverse('review_add')))
+
+        self.client.force_login(self.staff_user)
+        for url, budget in (
+            (reverse('article_create'), 3),
+            (reverse('article_edit', args=[self.article.pk]), 4),
+            (reverse('article_delete', args=[self.article.pk]), 4),
+            (reverse('review_management'), 9),
+        ):
+            with self.subTest(url=url):
+                self.assertQueryBudget(budget, lambda: self.client.get(url))
+
+    def test_moderation_actions(self):
+        self.client.force_login(self.staff_user)
+        created = [
+            Review.objects.create(user=self.client_user, text=f'Отзыв для модерации {number}', rating=4)
+            for number in range(4)
+        ]
+        # Каждый прогон обрабатывает свой отзыв
+        for action, budget, targets in (('approve', 14, iter(created[:2])), ('reject', 11, iter(created[2:]))):
+            with self.subTest(action=action):
+                self.assertQueryBudget(budget, lambda: self.client.post(
+                    reverse('review_approve', args=[next(targets).pk]), {'action': action}
+                ))
+
+        ids = []
+
+        def grow():
+            self.seed(self.GROWTH)
+            ids[:] = Review.objects.filter(approved=False).values_list('pk', flat=True)
+
+        grow()
+        self.assertQueryBudget(12, lambda: self.client.post(
+            reverse('review_bulk_moderation'), json.dumps({'ids': ids, 'action': 'approve'}),
+            content_type='application/json',
+        ), grow)
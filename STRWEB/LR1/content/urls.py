@@ -1,20 +1,27 @@
 from django.urls import path
 from . import views
+from .feeds import news_feed
 
 urlpatterns = [
-    path('', views.HomeView.as_view(), name='home'),
+    path('', views.AsyncHomeView.as_view(), name='home'),
     path('about/', views.AboutView.as_view(), name='about'),
     path('contacts/', views.ContactsView.as_view(), name='contacts'),
     path('glossary/', views.GlossaryView.as_view(), name='glossary'),
+    path('glossary/lookup/', views.GlossaryLookupView.as_view(), name='glossary_lookup'),
+    path('glossary/index.json', views.GlossarySnapshotView.as_view(), name='glossary_snapshot'),
     path('privacy-policy/', views.PrivacyPolicyView.as_view(), name='privacy_policy'),
     path('vacancies/', views.VacancyListView.as_view(), name='vacancy_list'),
     path('news/', views.NewsListView.as_view(), name='news_list'),
+    path('news/feed/', news_feed, name='news_feed'),
     path('news/<int:pk>/', views.NewsDetailView.as_view(), name='news_detail'),
     path('news/create/', views.ArticleCreateView.as_view(), name='article_create'),
     path('news/<int:pk>/edit/', views.ArticleUpdateView.as_view(), name='article_edit'),
     path('news/<int:pk>/delete/', views.ArticleDeleteView.as_view(), name='article_delete'),
+    path('search/', views.SearchView.as_view(), name='search'),
+    path('search/api/', views.SearchApiView.as_view(), name='search_api'),
     path('reviews/', views.ReviewListView.as_view(), name='review_list'),
     path('reviews/add/', views.ReviewCreateView.as_view(), name='review_add'),
     path('staff/reviews/', views.ReviewManagementView.as_view(), name='review_management'),
-    path('staff/review/<int:pk>/approve', views.ReviewApproveView.as_view(), name='review_approve')
+    path('staff/review/<int:pk>/approve', views.ReviewApproveView.as_view(), name='review_approve'),
+    path('staff/reviews/bulk/', views.ReviewBulkModerationView.as_view(), name='review_bulk_moderation'),
 ]
\ No newline at end of file
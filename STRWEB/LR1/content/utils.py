@@ -1,18 +1,93 @@
 import calendar
-from datetime import datetime
+from datetime import date, datetime, time, timedelta
+from functools import lru_cache
+
+from django.db.models import DateField, F, Value
+from django.db.models.functions import Cast, TruncDate
+from django.utils import timezone, translation
+from django.utils.dates import MONTHS, WEEKDAYS_ABBR
+from django.utils.html import escape
 from django.utils.safestring import mark_safe
 
+from IGI_Lab5.caching import get_or_set, tag_for
+from rentals.models import PromoCode
+from .models import Article
+
+EVENTS_CACHE_TIMEOUT = 60 * 60 * 24
+EVENT_TITLES = {'promo': 'Промокод', 'news': 'Новость'}
+
+
 class Calendar(calendar.HTMLCalendar):
+    """Календарь месяца с отметками событий: events — {день: ((вид, название), ...)}"""
+
+    def __init__(self, events=None, firstweekday=0):
+        super().__init__(firstweekday)
+        self.events = events or {}
+
     def formatday(self, day, weekday):
         if day == 0:
             return '<td class="noday">&nbsp;</td>'  # day outside month
-        else:
+        day_events = self.events.get(day, ())
+        if not day_events:
             return f'<td class="{self.cssclasses[weekday]}">{day}</td>'
+        kinds = ' '.join(sorted({kind for kind, _ in day_events}))
+        title = escape('\n'.join(f'{EVENT_TITLES[kind]}: {name}' for kind, name in day_events))
+        return f'<td class="{self.cssclasses[weekday]} {kinds}" title="{title}">{day}</td>'
+
+    def formatweekday(self, day):
+        return f'<th class="{self.cssclasses_weekday_head[day]}">{WEEKDAYS_ABBR[day]}</th>'
+
+    def formatmonthname(self, theyear, themonth, withyear=True):
+        name = f'{MONTHS[themonth]} {theyear}' if withyear else f'{MONTHS[themonth]}'
+        return f'<tr><th colspan="7" class="{self.cssclass_month_head}">{name}</th></tr>'
+
+
+def month_events(year, month):
+    """
+    События месяца: {день: ((вид, название), ...)}.
+
+    Промокоды, действующие в этом месяце, и новости, опубликованные в нем,
+    выбираются одним запросом (UNION) и кэшируются до изменения промокодов или новостей.
+    """
+    return get_or_set(
+        f'content:calendar:events:{year}-{month:02d}', lambda: load_month_events(year, month),
+        EVENTS_CACHE_TIMEOUT, tags=[tag_for(PromoCode), tag_for(Article)],
+    )
+
+
+def load_month_events(year, month):
+    first_day = date(year, month, 1)
+    last_day = date(year, month, calendar.monthrange(year, month)[1])
+    promo_codes = PromoCode.objects.filter(
+        is_active=True, valid_from__lte=last_day, valid_to__gte=first_day
+    ).values_list(Value('promo'), 'code', 'valid_from', 'valid_to').order_by()
+    published_on = Cast(TruncDate('published_at'), DateField())
+    # Диапазон по самому полю, а не по дате из него, чтобы работал индекс (published, published_at)
+    month_start = timezone.make_aware(datetime.combine(first_day, time.min))
+    month_end = timezone.make_aware(datetime.combine(last_day + timedelta(days=1), time.min))
+    articles = Article.objects.filter(
+        published=True, published_at__gte=month_start, published_at__lt=month_end
+    ).annotate(day=published_on).values_list(Value('news'), 'title', F('day'), F('day')).order_by()
+
+    days = {}
+    for kind, name, starts, ends in promo_codes.union(articles, all=True):
+        start, end = max(starts, first_day), min(ends, last_day)
+        for day in range(start.day, end.day + 1):
+            days.setdefault(day, []).append((kind, name))
+    return tuple(sorted((day, tuple(sorted(day_events))) for day, day_events in days.items()))
+
+
+@lru_cache(maxsize=64)
+def render_month(year, month, locale, events):
+    """HTML месяца; результат запоминается для одинаковых (год, месяц, язык, события)"""
+    with translation.override(locale):
+        return Calendar(dict(events)).formatmonth(year, month)
+
 
 def create_html_calendar():
     """
     Generates an HTML calendar for the current month.
     """
-    now = datetime.now()
-    cal = Calendar().formatmonth(now.year, now.month)
-    return mark_safe(cal)
\ No newline at end of file
+    today = timezone.localdate()
+    events = month_events(today.year, today.month)
+    return mark_safe(render_month(today.year, today.month, translation.get_language(), events))
@@ -1,9 +1,16 @@
+import asyncio
+import contextvars
+import json
 import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
 
-import requests
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.db.models import Avg, Count
+from django.db import close_old_connections
+from django.http import HttpResponseNotModified, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse_lazy, reverse
 from django.utils import timezone
@@ -12,97 +19,184 @@ from django.views import View
 from django.views.generic import ListView, DetailView, TemplateView, CreateView, UpdateView, DeleteView
 
 from authentication.decorators import staff_required
+from IGI_Lab5.metrics import count_queries
 from vehicles.models import Vehicle
 from .forms import ReviewForm, ArticleForm
-from .models import Article, CompanyInfo, Review, Contact, Partner, GlossaryEntry, Vacancy, Banner
+from . import duplicates, glossary_index, reviews, search, singletons
+from .models import Article, CompanyInfo, Review, Contact, GlossaryEntry, Vacancy
+from .page_cache import cache_page_for_anonymous
+from .pagination import paginate_by_cursor
+from .snippets import snippet_pool
 from .utils import create_html_calendar
 
 # Set up logging
 logger = logging.getLogger(__name__)
+# Просмотры страниц: пишутся выборочно (SamplingFilter в settings.LOGGING)
+page_logger = logging.getLogger('content.pages')
 
 class HomeView(TemplateView):
     template_name = 'content/home.html'
 
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
-        context['banners'] = Banner.objects.filter(is_active=True)
-        context['calendar'] = create_html_calendar()
+    def get_banners(self):
+        return singletons.active_banners()
+
+    def get_calendar(self):
+        return create_html_calendar()
+
+    def get_latest_article(self):
         # Get the latest published article
         try:
-            latest_article = Article.objects.filter(published=True).latest('published_at')
-            context['latest_article'] = latest_article
-            logger.info(f"Latest article displayed on home page: {latest_article.title}")
+            latest_article = Article.objects.filter(published=True, published_at__isnull=False).latest('published_at')
+            page_logger.info("Latest article displayed on home page: %s", latest_article.title)
+            return latest_article
         except Article.DoesNotExist:
-            context['latest_article'] = None
             logger.warning("No published articles available for home page")
+            return None
 
-        # Get partners
-        context['partners'] = Partner.objects.all()
+    def get_partners(self):
+        return singletons.partners()
 
-        # Get latest vehicles
-        context['vehicles'] = Vehicle.objects.filter(is_available=True).order_by('-id')[:3]
+    def get_latest_vehicles(self):
+        return list(Vehicle.objects.filter(is_available=True).order_by('-id')[:3])
 
+    def get_widgets(self):
+        """Факт о кошках и шутка: из сессии или из общего пула (content.snippets), без ожидания сети"""
         # Получаем данные из сессии, если они там есть
         joke_setup = self.request.session.get('joke_setup')
         joke_punchline = self.request.session.get('joke_punchline')
         cat_fact = self.request.session.get('cat_fact')
 
-        # Если в запросе указано обновить факт о котах или фактов нет в сессии
+        # Если в запросе указано обновить факт о котах или факта нет в сессии
         if 'refresh_cat_fact' in self.request.GET or not cat_fact:
-            try:
-                cat_fact_response = requests.get('https://catfact.ninja/fact', timeout=5)
-                if cat_fact_response.status_code == 200:
-                    cat_fact = cat_fact_response.json().get('fact')
-                    # Сохраняем в сессию
-                    self.request.session['cat_fact'] = cat_fact
-                else:
-                    cat_fact = "Не удалось загрузить факт о кошках."
-            except Exception as e:
-                logger.error(f"Error fetching cat fact: {str(e)}")
+            snippet = snippet_pool.get('cat_fact', fresh='refresh_cat_fact' in self.request.GET)
+            if snippet:
+                cat_fact = snippet['fact']
+                # Сохраняем в сессию
+                self.request.session['cat_fact'] = cat_fact
+            elif not cat_fact:
                 cat_fact = "Не удалось загрузить факт о кошках."
 
         # Если в запросе указано получить новую шутку или шутки нет в сессии
         if 'get_joke' in self.request.GET or (not joke_setup and not joke_punchline):
-            try:
-                joke_response = requests.get('https://official-joke-api.appspot.com/random_joke', timeout=5)
-                if joke_response.status_code == 200:
-                    joke_data = joke_response.json()
-                    joke_setup = joke_data.get('setup')
-                    joke_punchline = joke_data.get('punchline')
-                    # Сохраняем в сессию
-                    self.request.session['joke_setup'] = joke_setup
-                    self.request.session['joke_punchline'] = joke_punchline
-                else:
-                    joke_setup = "Не удалось загрузить шутку."
-                    joke_punchline = "Попробуйте еще раз позже."
-            except Exception as e:
-                logger.error(f"Error fetching joke: {str(e)}")
-                joke_setup = "Ошибка при получении шутки."
+            snippet = snippet_pool.get('joke', fresh='get_joke' in self.request.GET)
+            if snippet:
+                joke_setup = snippet['setup']
+                joke_punchline = snippet['punchline']
+                # Сохраняем в сессию
+                self.request.session['joke_setup'] = joke_setup
+                self.request.session['joke_punchline'] = joke_punchline
+            elif not joke_setup:
+                joke_setup = "Не удалось загрузить шутку."
                 joke_punchline = "Попробуйте еще раз позже."
 
-        # Добавляем данные в контекст
-        context['joke_setup'] = joke_setup
-        context['joke_punchline'] = joke_punchline
-        context['cat_fact'] = cat_fact
+        return {
+            'joke_setup': joke_setup,
+            'joke_punchline': joke_punchline,
+            'cat_fact': cat_fact,
+        }
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['banners'] = self.get_banners()
+        context['calendar'] = self.get_calendar()
+        context['latest_article'] = self.get_latest_article()
+        context['partners'] = self.get_partners()
+        context['vehicles'] = self.get_latest_vehicles()
+        context.update(self.get_widgets())
         return context
 
+
+_component_executor = None
+_component_executor_pid = None
+
+
+def get_component_executor():
+    """Пул потоков для частей асинхронной главной страницы (один на процесс)"""
+    global _component_executor, _component_executor_pid
+    # После fork потоки родителя не наследуются — создаем пул заново
+    if _component_executor is None or _component_executor_pid != os.getpid():
+        _component_executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'HOME_COMPONENT_WORKERS', 8), thread_name_prefix='home-components'
+        )
+        _component_executor_pid = os.getpid()
+    return _component_executor
+
+
+class AsyncHomeView(HomeView):
+    """
+    Асинхронная главная страница для ASGI.
+
+    Независимые части страницы выполняются одновременно в пуле потоков, у каждой
+    свой таймаут, поэтому время ответа равно времени самой медленной части,
+    а не их сумме. Часть, не уложившаяся в таймаут, заменяется пустым значением.
+    Потоки пула постоянные, и их соединения с БД живут между запросами (CONN_MAX_AGE).
+    """
+
+    def _in_thread(self, func):
+        request = self.request
+
+        def run():
+            # Как в начале и в конце обычного запроса: закрываются только устаревшие и сломанные соединения
+            close_old_connections()
+            try:
+                with count_queries(request):
+                    return func()
+            finally:
+                close_old_connections()
+
+        async def call():
+            # Контекст запроса (например, выбор реплики) переносится в поток пула
+            context = contextvars.copy_context()
+            return await asyncio.get_running_loop().run_in_executor(get_component_executor(), context.run, run)
+        return call
+
+    async def _with_timeout(self, name, awaitable, default):
+        timeout = getattr(settings, 'HOME_COMPONENT_TIMEOUT', 2)
+        try:
+            return await asyncio.wait_for(awaitable, timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Home page component '%s' timed out after %ss", name, timeout)
+            return default
+
+    async def get(self, request, *args, **kwargs):
+        components = {
+            'banners': (self._in_thread(self.get_banners), []),
+            'calendar': (self._in_thread(self.get_calendar), ''),
+            'latest_article': (self._in_thread(self.get_latest_article), None),
+            'partners': (self._in_thread(self.get_partners), []),
+            'vehicles': (self._in_thread(self.get_latest_vehicles), []),
+            # Сессия не потокобезопасна, поэтому виджеты выполняются в основном потоке запроса
+            'widgets': (sync_to_async(self.get_widgets), {}),
+        }
+        results = await asyncio.gather(*(
+            self._with_timeout(name, func(), default) for name, (func, default) in components.items()
+        ))
+
+        context = super(HomeView, self).get_context_data(**kwargs)
+        for name, result in zip(components, results):
+            if name == 'widgets':
+                context.update(result)
+            else:
+                context[name] = result
+        return self.render_to_response(context)
+
+
+@method_decorator(cache_page_for_anonymous(CompanyInfo), name='dispatch')
 class AboutView(TemplateView):
     template_name = 'content/about.html'
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        try:
-            company_info = CompanyInfo.objects.first()
-            context['company_info'] = company_info
-            logger.info("Company information displayed on about page")
-        except CompanyInfo.DoesNotExist:
-            context['company_info'] = None
+        context['company_info'] = singletons.company_info()
+        if context['company_info']:
+            page_logger.info("Company information displayed on about page")
+        else:
             logger.warning("No company information available for about page")
 
         return context
 
 
+@method_decorator(cache_page_for_anonymous(Article, CompanyInfo), name='dispatch')
 class NewsListView(ListView):
     model = Article
     template_name = 'content/news_list.html'
@@ -110,11 +204,20 @@ class NewsListView(ListView):
     paginate_by = 10
 
     def get_queryset(self):
-        queryset = Article.objects.filter(published=True).order_by('-published_at')
-        logger.info(f"News list displayed with {queryset.count()} articles")
-        return queryset
+        # Курсор строится по published_at: новости без даты публикации (например, после
+        # queryset.update) в ленту не попадают
+        return Article.objects.filter(published=True, published_at__isnull=False).order_by('-published_at', '-pk')
+
+    def paginate_queryset(self, queryset, page_size):
+        # Курсор вместо номера страницы: без OFFSET и COUNT
+        page = paginate_by_cursor(
+            queryset, page_size, after=self.request.GET.get('after'), before=self.request.GET.get('before')
+        )
+        page_logger.info("News list page displayed with %s articles", len(page))
+        return None, page, page.object_list, page.has_next or page.has_previous
 
 
+@method_decorator(cache_page_for_anonymous(Article, CompanyInfo), name='dispatch')
 class NewsDetailView(DetailView):
     model = Article
     template_name = 'content/news_detail.html'
@@ -125,7 +228,7 @@ class NewsDetailView(DetailView):
 
     def get_object(self, queryset=None):
         obj = super().get_object(queryset)
-        logger.info(f"Article viewed: {obj.title}")
+        page_logger.info("Article viewed: %s", obj.title)
         return obj
 
 
@@ -140,7 +243,7 @@ class ArticleCreateView(CreateView):
         form.instance.author = self.request.user
         form.instance.published_at = timezone.now() if form.instance.published else None
         messages.success(self.request, f"Новость '{form.instance.title}' успешно создана")
-        logger.info(f"Article created: {form.instance.title} by {self.request.user}")
+        logger.info("Article created: %s by %s", form.instance.title, self.request.user)
         return super().form_valid(form)
 
     def get_context_data(self, **kwargs):
@@ -164,7 +267,7 @@ class ArticleUpdateView(UpdateView):
             form.instance.published_at = timezone.now()
 
         messages.success(self.request, f"Новость '{form.instance.title}' успешно обновлена")
-        logger.info(f"Article updated: {form.instance.title} by {self.request.user}")
+        logger.info("Article updated: %s by %s", form.instance.title, self.request.user)
         return super().form_valid(form)
 
     def get_context_data(self, **kwargs):
@@ -182,7 +285,7 @@ class ArticleDeleteView(DeleteView):
     def delete(self, request, *args, **kwargs):
         article = self.get_object()
         messages.success(request, f"Новость '{article.title}' успешно удалена")
-        logger.info(f"Article deleted: {article.title} by {request.user}")
+        logger.info("Article deleted: %s by %s", article.title, request.user)
         return super().delete(request, *args, **kwargs)
 
     def get_context_data(self, **kwargs):
@@ -198,18 +301,20 @@ class ReviewListView(ListView):
     paginate_by = 10
 
     def get_queryset(self):
-        queryset = Review.objects.filter(approved=True).order_by('-created_at')
-        logger.info(f"Review list displayed with {queryset.count()} reviews")
-        return queryset
+        self.summary = reviews.get_summary()
+        page_logger.info("Review list displayed with %s reviews", self.summary.approved_count)
+        return Review.objects.filter(approved=True).select_related('user').order_by('-created_at')
+
+    def get_paginator(self, *args, **kwargs):
+        paginator = super().get_paginator(*args, **kwargs)
+        # Количество берем из сводки, а не отдельным COUNT
+        paginator.count = self.summary.approved_count
+        return paginator
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        # Add average rating
-        avg_rating = Review.objects.filter(approved=True).aggregate(Avg('rating'))
-        context['avg_rating'] = avg_rating['rating__avg']
-        # Add rating counts
-        rating_counts = Review.objects.filter(approved=True).values('rating').annotate(count=Count('rating')).order_by('rating')
-        context['rating_counts'] = rating_counts
+        context['avg_rating'] = self.summary.avg_rating
+        context['rating_counts'] = self.summary.rating_counts
         return context
 
 
@@ -224,7 +329,7 @@ class ReviewCreateView(CreateView):
         form.instance.user = self.request.user
         response = super().form_valid(form)
         messages.success(self.request, 'Спасибо за ваш отзыв! Он будет опубликован после проверки.')
-        logger.info(f"Review submitted by {self.request.user.username}")
+        logger.info("Review submitted by %s", self.request.user.username)
         return response
 
 @method_decorator(staff_required, name='dispatch')
@@ -232,10 +337,11 @@ class ReviewManagementView(ListView):
     model = Review
     template_name = 'content/review_management.html'
     context_object_name = 'reviews'
+    paginate_by = 50
 
     def get_queryset(self):
         # Получаем все отзывы, включая неподтвержденные
-        queryset = Review.objects.all().order_by('-created_at')
+        queryset = Review.objects.select_related('user').order_by('-created_at', '-pk')
 
         # Добавляем возможность фильтрации
         approved_filter = self.request.GET.get('approved')
@@ -249,7 +355,9 @@ class ReviewManagementView(ListView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['approved_filter'] = self.request.GET.get('approved', '')
-        context['pending_count'] = Review.objects.filter(approved=False).count()
+        context['pending_count'] = reviews.get_summary().pending_count
+        # Похожие непроверенные отзывы свернуты в кластеры, чтобы отклонять их разом
+        context['duplicate_clusters'] = duplicates.pending_clusters()
         return context
 
 
@@ -264,16 +372,50 @@ class ReviewApproveView(View):
             review.approved = True
             review.save()
             messages.success(request, f'Отзыв пользователя {review.user.username} успешно одобрен')
-            logger.info(f"Staff {request.user.username} approved review #{review.pk}")
+            logger.info("Staff %s approved review #%s", request.user.username, review.pk)
 
         elif action == 'reject':
             review.delete()  # Удаляем отзыв или можно добавить поле rejected=True и сохранять
             messages.warning(request, f'Отзыв пользователя {review.user.username} отклонен')
-            logger.info(f"Staff {request.user.username} rejected review #{review.pk}")
+            logger.info("Staff %s rejected review #%s", request.user.username, review.pk)
 
         next_url = request.POST.get('next', reverse('review_management'))
         return redirect(next_url)
 
+@method_decorator(staff_required, name='dispatch')
+class ReviewBulkModerationView(View):
+    """
+    Массовая модерация отзывов.
+
+    Принимает JSON {"ids": [...], "action": "approve" | "reject"} и применяет
+    действие ко всем отзывам одним запросом в одной транзакции.
+    """
+    max_ids = 5000
+
+    def post(self, request):
+        try:
+            payload = json.loads(request.body)
+            ids = [int(pk) for pk in payload['ids']]
+            action = payload['action']
+        except (ValueError, TypeError, KeyError):
+            return JsonResponse({'error': 'Ожидается JSON с полями ids и action'}, status=400)
+        if action not in reviews.MODERATION_ACTIONS:
+            return JsonResponse({'error': f'Неизвестное действие: {action}'}, status=400)
+        if not ids or len(ids) > self.max_ids:
+            return JsonResponse({'error': f'Количество отзывов должно быть от 1 до {self.max_ids}'}, status=400)
+
+        processed = reviews.moderate_reviews(ids, action)
+        summary = reviews.get_summary()
+        logger.info("Staff %s bulk %s: %s of %s reviews", request.user.username, action, processed, len(ids))
+        return JsonResponse({
+            'action': action,
+            'processed': processed,
+            'pending_count': summary.pending_count,
+            'approved_count': summary.approved_count,
+        })
+
+
+@method_decorator(cache_page_for_anonymous(Contact, CompanyInfo), name='dispatch')
 class ContactsView(View):
     template_name = 'content/contacts.html'
 
@@ -281,19 +423,14 @@ class ContactsView(View):
         # Получаем всех контактных лиц, отсортированных по порядку и имени
         contacts = Contact.objects.all().order_by('order', 'last_name', 'first_name')
 
-        # Получаем информацию о компании (предполагая, что она существует)
-        try:
-            company_info = CompanyInfo.objects.first()
-        except CompanyInfo.DoesNotExist:
-            company_info = None
-
         context = {
             'contacts': contacts,
-            'company_info': company_info
+            'company_info': singletons.company_info()
         }
 
         return render(request, self.template_name, context)
 
+@method_decorator(cache_page_for_anonymous(GlossaryEntry, CompanyInfo), name='dispatch')
 class GlossaryView(ListView):
     model = GlossaryEntry
     template_name = 'content/glossary.html'
@@ -303,9 +440,34 @@ class GlossaryView(ListView):
         return GlossaryEntry.objects.all().order_by('created_at')
 
 
+class GlossaryLookupView(View):
+    """Мгновенный поиск по словарю из индекса в памяти: ?q=префикс"""
+
+    def get(self, request):
+        results = glossary_index.get_index().lookup(request.GET.get('q', ''))
+        return JsonResponse({'results': results})
+
+
+class GlossarySnapshotView(View):
+    """Снимок индекса словаря для поиска в браузере; версия служит ETag"""
+
+    def get(self, request):
+        index = glossary_index.get_index()
+        etag = f'"glossary-{index.version}"'
+        if request.headers.get('If-None-Match') == etag:
+            response = HttpResponseNotModified()
+        else:
+            response = JsonResponse(index.snapshot())
+        response['ETag'] = etag
+        response['Cache-Control'] = 'no-cache'
+        return response
+
+
+@method_decorator(cache_page_for_anonymous(CompanyInfo), name='dispatch')
 class PrivacyPolicyView(TemplateView):
     template_name = 'content/privacy_policy.html'
 
+@method_decorator(cache_page_for_anonymous(Vacancy, CompanyInfo), name='dispatch')
 class VacancyListView(ListView):
     model = Vacancy
     template_name = 'content/vacancy_list.html'
@@ -313,3 +475,27 @@ class VacancyListView(ListView):
 
     def get_queryset(self):
         return Vacancy.objects.filter(is_active=True)
+
+
+class SearchView(TemplateView):
+    template_name = 'content/search.html'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        query = self.request.GET.get('q', '').strip()
+        context['query'] = query
+        context['results'] = search.search(query, limit=50) if query else []
+        return context
+
+
+class SearchApiView(View):
+    """Поиск в формате JSON: ?q=...&kind=article&kind=glossary"""
+
+    def get(self, request):
+        query = request.GET.get('q', '').strip()
+        kinds = [kind for kind in request.GET.getlist('kind') if kind in search.SOURCES]
+        try:
+            limit = min(max(int(request.GET.get('limit', 20)), 1), 100)
+        except ValueError:
+            limit = 20
+        return JsonResponse({'query': query, 'results': search.search(query, kinds=kinds, limit=limit)})
@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from rentals.models import RentalPenalty, Rental, PenaltyType, PromoCode
+from rentals.models import ArchivedRental, ArchivedRentalPenalty, RentalPenalty, Rental, PenaltyType, PromoCode
 
 
 class RentalPenaltyInline(admin.TabularInline):
@@ -38,3 +38,31 @@ class RenalPenaltyAdmin(admin.ModelAdmin):
     list_display = ('rental', 'penalty_type', 'date_applied')
     list_filter = ('date_applied',)
     search_fields = ('rental__user__last_name', 'penalty_type__name')
+
+
+class ArchivedRentalPenaltyInline(admin.TabularInline):
+    model = ArchivedRentalPenalty
+    extra = 0
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(ArchivedRental)
+class ArchivedRentalAdmin(admin.ModelAdmin):
+    """Архив только просматривается: строки в него переносит команда archive_rentals"""
+    list_display = ('user', 'vehicle', 'rental_date', 'actual_return_date', 'status',
+                    'total_amount', 'archived_at')
+    list_filter = ('status', 'rental_date')
+    search_fields = ('user__last_name', 'user__first_name', 'vehicle__license_plate')
+    inlines = [ArchivedRentalPenaltyInline]
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,104 @@
+"""
+Архив завершенных прокатов.
+
+Возвращенные и отмененные прокаты с датой выдачи старше заданного срока переносятся вместе со штрафами из Rental/RentalPenalty в ArchivedRental/
+ArchivedRentalPenalty (команда archive_rentals) — рабочая таблица остается
+небольшой. Перенос идет пачками, каждая пачка — в своей транзакции. Удаление
+перенесенных строк не считается удалением прокатов: пока идет перенос,
+обработчики сигналов сводок (stats.signals) ничего не вычитают.
+
+Чтение истории (списки прокатов клиента, отчеты, пересчет сводок и скетчей)
+объединяет обе таблицы: поля архива называются так же, как в рабочих моделях,
+поэтому один и тот же фильтр или values_list применяется к обеим.
+"""
+import heapq
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import timedelta
+from operator import attrgetter
+
+from django.db import transaction
+from django.utils import timezone
+
+from rentals.models import ArchivedRental, ArchivedRentalPenalty, Rental, RentalPenalty
+
+ARCHIVED_STATUSES = ('returned', 'cancelled')
+# Рабочая модель -> модель архива
+ARCHIVE_MODELS = {Rental: ArchivedRental, RentalPenalty: ArchivedRentalPenalty}
+
+_archiving = ContextVar('archiving', default=False)
+
+
+def is_archiving():
+    """Идет перенос в архив: удаление строк Rental и RentalPenalty — не удаление данных"""
+    return _archiving.get()
+
+
+@contextmanager
+def archiving():
+    token = _archiving.set(True)
+    try:
+        yield
+    finally:
+        _archiving.reset(token)
+
+
+def archive_cutoff(months, today=None):
+    # Месяц считается за 30 дней: точность до дня здесь не нужна
+    return (today or timezone.now().date()) - timedelta(days=30 * months)
+
+
+def archivable(cutoff):
+    """Завершенные прокаты, выданные раньше cutoff"""
+    return Rental.objects.filter(status__in=ARCHIVED_STATUSES, rental_date__lt=cutoff)
+
+
+def _copy(model, rows, **extra):
+    fields = [field.attname for field in model._meta.concrete_fields]
+    archive_model = ARCHIVE_MODELS[model]
+    return archive_model.objects.bulk_create(
+        [archive_model(**row, **extra) for row in rows.values(*fields)]
+    )
+
+
+def archive_batch(cutoff, batch_size):
+    """Переносит одну пачку прокатов; возвращает (прокатов, штрафов)"""
+    with transaction.atomic(), archiving():
+        ids = list(archivable(cutoff).order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return 0, 0
+        rentals = _copy(Rental, Rental.objects.filter(pk__in=ids), archived_at=timezone.now())
+        penalties = _copy(RentalPenalty, RentalPenalty.objects.filter(rental_id__in=ids))
+        # Штрафы удаляются каскадом вместе с прокатами
+        Rental.objects.filter(pk__in=ids).delete()
+    return len(rentals), len(penalties)
+
+
+def union_archive(model, build):
+    """
+    UNION ALL рабочей таблицы и архива: build(queryset) добавляет фильтры и должен
+    вернуть values/values_list (объединяются строки, а не объекты разных моделей).
+    """
+    # Порядок по умолчанию (Meta.ordering) в частях UNION не допускается
+    return build(model.objects.all()).order_by().union(build(ARCHIVE_MODELS[model].objects.all()).order_by(), all=True)
+
+
+def rental_history(build):
+    """
+    Прокаты из рабочей таблицы и архива (объекты обеих моделей) по убыванию created_at.
+    build(queryset) добавляет фильтры и select_related.
+    """
+    key = attrgetter('created_at')
+    return list(heapq.merge(
+        build(Rental.objects.all()).order_by('-created_at'),
+        build(ArchivedRental.objects.all()).order_by('-created_at'),
+        key=key, reverse=True,
+    ))
+
+
+def get_rental(build, **lookup):
+    """Прокат из рабочей таблицы, а если его там нет — из архива; None, если нет нигде"""
+    return (
+        build(Rental.objects.all()).filter(**lookup).first()
+        or build(ArchivedRental.objects.all()).filter(**lookup).first()
+    )
@@ -21,7 +21,7 @@ class RentalCreateForm(forms.ModelForm):
         super().__init__(*args, **kwargs)
         
         # Only show available vehicles
-        self.fields['vehicle'].queryset = Vehicle.objects.filter(is_available=True)
+        self.fields['vehicle'].queryset = Vehicle.objects.filter(is_available=True).select_related('car_model')
         
         # Add Bootstrap classes
         for field_name, field in self.fields.items():
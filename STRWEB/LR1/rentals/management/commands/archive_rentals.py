@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from rentals.archive import archivable, archive_batch, archive_cutoff
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит возвращенные и отмененные прокаты, выданные более N месяцев назад, '
+        'вместе со штрафами в архив (ArchivedRental); сводки и скетчи не меняются'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months', type=int, default=12, help='Возраст прокатов для переноса, в месяцах')
+        parser.add_argument('--batch-size', type=int, default=500, help='Прокатов в одной транзакции')
+        parser.add_argument('--dry-run', action='store_true', help='Только показать, сколько прокатов будет перенесено')
+
+    def handle(self, *args, **options):
+        if options['months'] < 1 or options['batch_size'] < 1:
+            raise CommandError('--months и --batch-size должны быть положительными')
+        cutoff = archive_cutoff(options['months'])
+        if options['dry_run']:
+            self.stdout.write(f'К переносу: {archivable(cutoff).count()} прокатов (выданы до {cutoff:%d.%m.%Y})')
+            return
+
+        total_rentals = total_penalties = 0
+        while True:
+            # Каждая пачка — отдельная транзакция: блокировка записи держится недолго
+            rentals, penalties = archive_batch(cutoff, options['batch_size'])
+            if not rentals:
+                break
+            total_rentals += rentals
+            total_penalties += penalties
+            self.stdout.write(f'Перенесено {total_rentals} прокатов, {total_penalties} штрафов')
+        self.stdout.write(self.style.SUCCESS(
+            f'Архивирование завершено: {total_rentals} прокатов, {total_penalties} штрафов'
+        ))
@@ -0,0 +1,66 @@
+# Generated by Django 5.2.4 on 2026-10-19 03:49
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rentals', '0003_rental_indexes'),
+        ('vehicles', '0002_vehicle_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedRental',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('status', models.CharField(choices=[('pending', 'Ожидает подтверждения'), ('active', 'Активен'), ('returned', 'Возвращен'), ('cancelled', 'Отменен'), ('overdue', 'Просрочен')], max_length=20, verbose_name='Статус')),
+                ('rental_date', models.DateField(verbose_name='Дата выдачи')),
+                ('rental_days', models.PositiveIntegerField(verbose_name='Количество дней')),
+                ('expected_return_date', models.DateField(verbose_name='Ожидаемая дата возврата')),
+                ('actual_return_date', models.DateField(blank=True, null=True, verbose_name='Фактическая дата возврата')),
+                ('rental_amount', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Сумма проката')),
+                ('discount_amount', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Сумма скидки')),
+                ('total_amount', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Итоговая сумма')),
+                ('condition_notes', models.TextField(blank=True, verbose_name='Примечания о состоянии автомобиля')),
+                ('is_active', models.BooleanField(default=True, verbose_name='Активен')),
+                ('created_at', models.DateTimeField(verbose_name='Дата создания')),
+                ('updated_at', models.DateTimeField(verbose_name='Дата обновления')),
+                ('archived_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата переноса в архив')),
+                ('promo_code', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_rentals', to='rentals.promocode', verbose_name='Промокод')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='archived_rentals', to=settings.AUTH_USER_MODEL, verbose_name='Клиент')),
+                ('vehicle', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='archived_rentals', to='vehicles.vehicle', verbose_name='Автомобиль')),
+            ],
+            options={
+                'verbose_name': 'Архивный прокат',
+                'verbose_name_plural': 'Архив прокатов',
+                'ordering': ['-rental_date'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedRentalPenalty',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('date_applied', models.DateField(verbose_name='Дата применения')),
+                ('notes', models.TextField(blank=True, verbose_name='Примечания')),
+                ('penalty_type', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='archived_rental_penalties', to='rentals.penaltytype', verbose_name='Тип штрафа')),
+                ('rental', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='penalties', to='rentals.archivedrental', verbose_name='Прокат')),
+            ],
+            options={
+                'verbose_name': 'Архивный штраф по прокату',
+                'verbose_name_plural': 'Архив штрафов по прокатам',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='archivedrental',
+            index=models.Index(fields=['user', '-created_at'], name='archived_rental_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedrental',
+            index=models.Index(fields=['rental_date'], name='archived_rental_date_idx'),
+        ),
+    ]
@@ -121,6 +121,12 @@ class Rental(models.Model):
         verbose_name = "Прокат"
         verbose_name_plural = "Прокаты"
         ordering = ["-rental_date"]
+        indexes = [
+            # Список прокатов клиента
+            models.Index(fields=["user", "-created_at"], name="rental_user_created_idx"),
+            # Список прокатов для сотрудников с фильтром по статусу
+            models.Index(fields=["status", "-created_at"], name="rental_status_created_idx"),
+        ]
 
     def save(self, *args, **kwargs):
         # Calculate expected return date if not provided
@@ -173,6 +179,100 @@ class RentalPenalty(models.Model):
     def __str__(self):
         return f"Штраф {self.penalty_type} для проката {self.rental}"
 
+class ArchivedRental(models.Model):
+    """
+    Завершенный прокат, перенесенный из Rental командой archive_rentals.
+    Поля и их имена совпадают с Rental (rentals.archive копирует строки как есть), id сохраняется.
+    """
+
+    STATUS_CHOICES = Rental.STATUS_CHOICES
+
+    id = models.BigIntegerField(primary_key=True)
+    vehicle = models.ForeignKey(
+        Vehicle,
+        on_delete=models.PROTECT,
+        related_name="archived_rentals",
+        verbose_name="Автомобиль",
+    )
+    user = models.ForeignKey(
+        User, on_delete=models.PROTECT, related_name="archived_rentals", verbose_name="Клиент"
+    )
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, verbose_name="Статус")
+    rental_date = models.DateField(verbose_name="Дата выдачи")
+    rental_days = models.PositiveIntegerField(verbose_name="Количество дней")
+    expected_return_date = models.DateField(verbose_name="Ожидаемая дата возврата")
+    actual_return_date = models.DateField(
+        null=True, blank=True, verbose_name="Фактическая дата возврата"
+    )
+    rental_amount = models.DecimalField(
+        max_digits=10, decimal_places=2, verbose_name="Сумма проката"
+    )
+    promo_code = models.ForeignKey(
+        PromoCode,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="archived_rentals",
+        verbose_name="Промокод",
+    )
+    discount_amount = models.DecimalField(
+        max_digits=10, decimal_places=2, verbose_name="Сумма скидки"
+    )
+    total_amount = models.DecimalField(
+        max_digits=10, decimal_places=2, verbose_name="Итоговая сумма"
+    )
+    condition_notes = models.TextField(
+        blank=True, verbose_name="Примечания о состоянии автомобиля"
+    )
+    is_active = models.BooleanField(default=True, verbose_name="Активен")
+    created_at = models.DateTimeField(verbose_name="Дата создания")
+    updated_at = models.DateTimeField(verbose_name="Дата обновления")
+    archived_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата переноса в архив")
+
+    objects = models.Manager()
+
+    class Meta:
+        verbose_name = "Архивный прокат"
+        verbose_name_plural = "Архив прокатов"
+        ordering = ["-rental_date"]
+        indexes = [
+            # История прокатов клиента
+            models.Index(fields=["user", "-created_at"], name="archived_rental_user_idx"),
+            # Отчеты за период
+            models.Index(fields=["rental_date"], name="archived_rental_date_idx"),
+        ]
+
+    def __str__(self):
+        return f"Прокат {self.vehicle} для {self.user} от {self.rental_date} (архив)"
+
+
+class ArchivedRentalPenalty(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    rental = models.ForeignKey(
+        ArchivedRental,
+        on_delete=models.CASCADE,
+        related_name="penalties",
+        verbose_name="Прокат",
+    )
+    penalty_type = models.ForeignKey(
+        PenaltyType,
+        on_delete=models.PROTECT,
+        related_name="archived_rental_penalties",
+        verbose_name="Тип штрафа",
+    )
+    date_applied = models.DateField(verbose_name="Дата применения")
+    notes = models.TextField(blank=True, verbose_name="Примечания")
+
+    objects = models.Manager()
+
+    class Meta:
+        verbose_name = "Архивный штраф по прокату"
+        verbose_name_plural = "Архив штрафов по прокатам"
+
+    def __str__(self):
+        return f"Штраф {self.penalty_type} для проката {self.rental}"
+
+
 class Cart(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='cart')
     created_at = models.DateTimeField(auto_now_add=True)
@@ -1,3 +1,86 @@
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
 
-# Create your tests here.
+from IGI_Lab5.testing import QueryBudgetMixin
+from rentals.models import CartItem, PenaltyType, PromoCode, Rental
+from vehicles.models import Vehicle
+
+
+class RentalQueryBudgetTestCase(QueryBudgetMixin, TestCase):
+    """Число запросов страниц проката не зависит от количества записей"""
+
+    def setUp(self):
+        self.create_users()
+        self.seed(3)
+        self.rental = Rental.objects.first()
+        self.vehicle = Vehicle.objects.filter(is_available=True).first()
+        self.promo_code = PromoCode.objects.first()
+
+    def test_client_pages(self):
+        self.client.force_login(self.client_user)
+        for url, budget in (
+            (reverse('rental_list'), 5),
+            (reverse('rental_detail', args=[self.rental.pk]), 6),
+            (reverse('cart'), 5),
+            (reverse('payment'), 5),
+            (reverse('payment_success'), 3),
+            (reverse('rental_create'), 7),
+            (reverse('rental_create_for_vehicle', args=[self.vehicle.pk]), 8),
+            (reverse('promocode_list'), 5),
+        ):
+            with self.subTest(url=url):
+                self.assertQueryBudget(budget, lambda: self.client.get(url))
+
+    def test_staff_pages(self):
+        self.client.force_login(self.staff_user)
+        for url, budget in (
+            (reverse('staff_rental_list'), 4),
+            (reverse('rental_detail', args=[self.rental.pk]), 6),
+            (reverse('rental_return', args=[self.rental.pk]), 8),
+            (reverse('promocode_create'), 3),
+            (reverse('promocode_detail', args=[self.promo_code.pk]), 4),
+            (reverse('promocode_edit', args=[self.promo_code.pk]), 4),
+        ):
+            with self.subTest(url=url):
+                self.assertQueryBudget(budget, lambda: self.client.get(url))
+
+    def test_invalid_rental_form(self):
+        self.client.force_login(self.client_user)
+        self.assertQueryBudget(9, lambda: self.client.post(reverse('rental_create'), {'rental_days': 0}))
+
+    def test_cart_actions(self):
+        self.client.force_login(self.client_user)
+        item, *removed = CartItem.objects.order_by('pk')[:3]
+        self.assertQueryBudget(
+            4, lambda: self.client.post(reverse('update_cart_item', args=[item.pk]), {'quantity': 2})
+        )
+        # Каждый прогон удаляет свою позицию корзины
+        removed = iter(removed)
+        self.assertQueryBudget(4, lambda: self.client.post(reverse('remove_from_cart', args=[next(removed).pk])))
+
+    def test_payment(self):
+        self.client.force_login(self.client_user)
+        # Каждая позиция корзины — отдельный прокат со сводкой и значениями скетчей
+        self.assertPerItemQueryBudget(
+            7, 8, lambda: self.client.post(reverse('payment')),
+            lambda: CartItem.objects.filter(cart__user=self.client_user).count(),
+        )
+
+    def test_staff_actions(self):
+        self.client.force_login(self.staff_user)
+        rentals = list(Rental.objects.order_by('pk')[:2])
+        for rental in rentals:
+            rental.status = 'pending'
+            rental.save()
+        pending = iter(rentals)
+        self.assertQueryBudget(
+            16, lambda: self.client.post(reverse('rental_confirm', args=[next(pending).pk]), {'action': 'approve'})
+        )
+
+        active = iter(list(Rental.objects.filter(status='active').order_by('pk')[:2]))
+        penalty_type = PenaltyType.objects.get()
+        data = {'actual_return_date': timezone.now().date(), 'penalty_types': [penalty_type.pk]}
+        self.assertQueryBudget(
+            25, lambda: self.client.post(reverse('rental_return', args=[next(active).pk]), data)
+        )
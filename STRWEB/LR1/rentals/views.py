@@ -4,6 +4,7 @@ import json
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.db import transaction
+from django.http import Http404
 from django.shortcuts import render, redirect, get_object_or_404
 from django.urls import reverse_lazy
 from django.utils import timezone
@@ -13,11 +14,15 @@ from django.views.generic import ListView, CreateView, DetailView, UpdateView
 from rest_framework import permissions
 
 from authentication.decorators import staff_required
+from IGI_Lab5.replica import replica_reads
+from rentals.archive import get_rental, rental_history
 from rentals.forms import RentalCreateForm, RentalReturnForm, PromoCodeForm
 from rentals.models import Rental, RentalPenalty, PromoCode, Cart, CartItem
 from vehicles.models import Vehicle
 
 logger = logging.getLogger("rentals")
+# Просмотры страниц: пишутся выборочно (SamplingFilter в settings.LOGGING)
+page_logger = logging.getLogger("rentals.pages")
 
 
 class IsRentalClientOrStaff(permissions.BasePermission):
@@ -41,21 +46,20 @@ class RentalListView(View):
 
     @method_decorator(login_required)
     def get(self, request):
-        if hasattr(request.user, 'has_role') and request.user.has_role("staff"):
-            rentals = Rental.objects.select_related("vehicle", "promo_code").order_by(
-                "-created_at"
-            )
-        else:
-            rentals = (
-                Rental.objects.select_related("vehicle", "promo_code")
-                .filter(user=request.user)
-                .order_by("-created_at")
-            )
-
-        # Filter by status if provided
+        is_staff = hasattr(request.user, 'has_role') and request.user.has_role("staff")
         status_filter = request.GET.get("status")
-        if status_filter:
-            rentals = rentals.filter(status=status_filter)
+
+        def build(rentals):
+            rentals = rentals.select_related("vehicle__car_model", "promo_code")
+            if not is_staff:
+                rentals = rentals.filter(user=request.user)
+            # Filter by status if provided
+            if status_filter:
+                rentals = rentals.filter(status=status_filter)
+            return rentals
+
+        # Завершенные прокаты могут быть перенесены в архив — история объединяет обе таблицы
+        rentals = rental_history(build)
 
         context = {
             "rentals": rentals,
@@ -63,7 +67,7 @@ class RentalListView(View):
             "status_choices": Rental.STATUS_CHOICES,
         }
 
-        logger.info(f"User {request.user.username} viewed their rentals list")
+        page_logger.info("User %s viewed their rentals list", request.user.username)
         return render(request, self.template_name, context)
 
 
@@ -74,16 +78,19 @@ class RentalDetailView(View):
 
     @method_decorator(login_required)
     def get(self, request, pk):
-        # Define the base queryset with optimizations
-        queryset = Rental.objects.select_related(
-            "user", "vehicle__car_model__body_type", "vehicle__car_park", "promo_code"
-        ).prefetch_related("penalties__penalty_type")
-
-        # Get rental for the current user or staff
-        if request.user.has_role("staff") or request.user.has_role("admin"):
-            rental = get_object_or_404(queryset, pk=pk)
-        else:
-            rental = get_object_or_404(queryset, pk=pk, user=request.user)
+        def build(rentals):
+            # Define the base queryset with optimizations
+            return rentals.select_related(
+                "user", "vehicle__car_model__body_type", "vehicle__car_park", "promo_code"
+            ).prefetch_related("penalties__penalty_type")
+
+        # Get rental for the current user or staff (из рабочей таблицы или архива)
+        lookup = {"pk": pk}
+        if not (request.user.has_role("staff") or request.user.has_role("admin")):
+            lookup["user"] = request.user
+        rental = get_rental(build, **lookup)
+        if rental is None:
+            raise Http404("Прокат не найден")
 
         next_url = request.GET.get("next", "")
 
@@ -93,7 +100,7 @@ class RentalDetailView(View):
             "next_url": next_url,
         }
 
-        logger.info(f"User {request.user.username} viewed rental {rental.pk}")
+        page_logger.info("User %s viewed rental %s", request.user.username, rental.pk)
         return render(request, self.template_name, context)
 
 
@@ -104,30 +111,22 @@ class RentalCreateView(View):
 
     def _get_json_context_data(self, form):
         """Helper method to get JSON data for vehicle prices and promo codes."""
-        vehicle_prices = {}
-        for vehicle in form.fields["vehicle"].queryset:
-            try:
-                vehicle_prices[str(vehicle.id)] = float(vehicle.daily_rental_price)
-            except (AttributeError, ValueError):
-                vehicle_prices[str(vehicle.id)] = 0
+        # Одним запросом на каждый словарь, а не запросом на каждый вариант выбора
+        vehicle_prices = {
+            str(vehicle_id): float(price)
+            for vehicle_id, price in form.fields["vehicle"].queryset.values_list(
+                "id", "daily_rental_price"
+            )
+        }
 
         promo_codes = {}
         if "promo_code" in form.fields:
-            for promo_choice in form.fields["promo_code"].choices:
-                promo_id = promo_choice[0]
-                if promo_id:  # Skip empty option
-                    try:
-                        if hasattr(promo_id, "value"):
-                            promo_id_value = int(promo_id.value)
-                        else:
-                            promo_id_value = int(promo_id)
-
-                        promo = PromoCode.objects.get(id=promo_id_value)
-                        promo_codes[str(promo_id_value)] = float(
-                            promo.discount_percentage
-                        )
-                    except (PromoCode.DoesNotExist, ValueError, TypeError):
-                        pass
+            promo_codes = {
+                str(promo_id): float(percentage)
+                for promo_id, percentage in form.fields["promo_code"].queryset.values_list(
+                    "id", "discount_percentage"
+                )
+            }
 
         return {
             "vehicle_prices_json": json.dumps(vehicle_prices),
@@ -213,7 +212,7 @@ class RentalConfirmationView(View):
                 f"Заявка на аренду #{rental.pk} подтверждена. Автомобиль {rental.vehicle} помечен как недоступный.",
             )
             logger.info(
-                f"Staff {request.user.username} approved rental {rental.pk} for vehicle {rental.vehicle}"
+                "Staff %s approved rental %s for vehicle %s", request.user.username, rental.pk, rental.vehicle
             )
 
         elif action == "reject":
@@ -221,7 +220,7 @@ class RentalConfirmationView(View):
             rental.save()
             messages.error(request, f"Заявка на аренду #{rental.pk} отклонена.")
             logger.info(
-                f"Staff {request.user.username} rejected rental {rental.pk} for vehicle {rental.vehicle}"
+                "Staff %s rejected rental %s for vehicle %s", request.user.username, rental.pk, rental.vehicle
             )
 
         else:
@@ -279,13 +278,13 @@ class RentalReturnView(View):
 
             # Log penalties if any
             penalty_names = ", ".join([p.name for p in penalties])
-            logger.info(f"Penalties applied to rental {rental.pk}: {penalty_names}")
+            logger.info("Penalties applied to rental %s: %s", rental.pk, penalty_names)
             if penalties:
                 messages.warning(request, f"Штрафы применены: {penalty_names}")
 
             messages.success(request, f"Автомобиль {rental.vehicle} успешно возвращен!")
             logger.info(
-                f"Staff {request.user.username} processed return of rental {rental.pk}"
+                "Staff %s processed return of rental %s", request.user.username, rental.pk
             )
 
             return redirect("rental_detail", pk=rental.pk)
@@ -301,9 +300,10 @@ class StaffRentalListView(View):
     template_name = "rentals/staff_rental_list.html"
 
     @method_decorator(staff_required)
+    @method_decorator(replica_reads)
     def get(self, request):
         rentals = (
-            Rental.objects.select_related("user", "vehicle")
+            Rental.objects.select_related("user", "vehicle__car_model")
             .all()
             .order_by("-created_at")
         )
@@ -325,7 +325,7 @@ class StaffRentalListView(View):
             "status_choices": Rental.STATUS_CHOICES,
         }
 
-        logger.info(f"Staff {request.user.username} viewed all rentals list")
+        page_logger.info("Staff %s viewed all rentals list", request.user.username)
         return render(request, self.template_name, context)
 
 
@@ -344,9 +344,8 @@ class PromoCodeListView(ListView):
             is_active=False
         ) | PromoCode.objects.filter(valid_to__lte=timezone.now())
 
-        logger.info(
-            f"PromoCode list displayed with {active_promocodes.count()} active and {expired_promocodes.count()} expired codes"
-        )
+        # Без подсчета записей: два COUNT-запроса на каждый просмотр ради строки лога не нужны
+        page_logger.info("PromoCode list displayed")
 
         # Return both as a dictionary
         return {"active": active_promocodes, "expired": expired_promocodes}
@@ -364,7 +363,7 @@ class PromoCodeCreateView(CreateView):
             self.request, f'Промокод "{form.instance.code}" успешно создан!'
         )
         logger.info(
-            f"Staff {self.request.user.username} created promo code: {form.instance.code}"
+            "Staff %s created promo code: %s", self.request.user.username, form.instance.code
         )
         return super().form_valid(form)
 
@@ -377,7 +376,9 @@ class PromoCodeDetailView(DetailView):
 
     def get_object(self, queryset=None):
         obj = super().get_object(queryset)
-        logger.info(f"Staff {self.request.user.username} viewed promo code: {obj.code}")
+        page_logger.info(
+            "Staff %s viewed promo code: %s", self.request.user.username, obj.code
+        )
         return obj
 
 
@@ -398,7 +399,7 @@ class PromoCodeUpdateView(UpdateView):
             self.request, f'Промокод "{form.instance.code}" успешно обновлен!'
         )
         logger.info(
-            f"Staff {self.request.user.username} updated promo code: {form.instance.code}"
+            "Staff %s updated promo code: %s", self.request.user.username, form.instance.code
         )
         return super().form_valid(form)
 
@@ -424,7 +425,7 @@ class CartView(View):
     @method_decorator(login_required)
     def get(self, request):
         cart, created = Cart.objects.get_or_create(user=request.user)
-        cart_items = cart.items.all()
+        cart_items = cart.items.select_related("vehicle__car_model", "promo_code")
         total_cart_price = 0
         
         for item in cart_items:
@@ -469,7 +470,7 @@ class PaymentView(View):
     @method_decorator(login_required)
     def get(self, request):
         cart = get_object_or_404(Cart, user=request.user)
-        cart_items = cart.items.all()
+        cart_items = cart.items.select_related("vehicle__car_model", "promo_code")
         if not cart_items:
             messages.error(request, "Ваша корзина пуста.")
             return redirect('cart')
@@ -493,7 +494,8 @@ class PaymentView(View):
     @transaction.atomic
     def post(self, request):
         cart = get_object_or_404(Cart, user=request.user)
-        cart_items = cart.items.all()
+        # car_model нужен обработчику сигнала сводок при создании проката
+        cart_items = cart.items.select_related('vehicle__car_model', 'promo_code')
 
         if not cart_items:
             messages.error(request, "Ваша корзина пуста.")
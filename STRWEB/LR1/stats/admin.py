@@ -1,3 +1,25 @@
 from django.contrib import admin
 
-# Register your models here.
+from stats.models import DailyRentalRollup, QuantileSketch, RevenueForecast
+
+
+@admin.register(DailyRentalRollup)
+class DailyRentalRollupAdmin(admin.ModelAdmin):
+    list_display = ('date', 'brand', 'car_park', 'status', 'rental_count', 'revenue', 'discount_sum', 'penalty_sum')
+    list_filter = ('status', 'car_park', 'brand')
+    date_hierarchy = 'date'
+
+
+@admin.register(RevenueForecast)
+class RevenueForecastAdmin(admin.ModelAdmin):
+    list_display = ('target_date', 'brand', 'car_park', 'revenue', 'rental_count', 'generated_at')
+    list_filter = ('car_park', 'brand')
+    date_hierarchy = 'target_date'
+
+
+@admin.register(QuantileSketch)
+class QuantileSketchAdmin(admin.ModelAdmin):
+    list_display = ('metric', 'dimension', 'key', 'count', 'p50', 'p90', 'p99', 'updated_at')
+    list_filter = ('metric', 'dimension')
+    exclude = ('data',)
+    readonly_fields = ('count', 'p50', 'p90', 'p99', 'updated_at')
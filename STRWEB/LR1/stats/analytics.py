@@ -0,0 +1,113 @@
+import numpy as np
+from django.conf import settings
+
+from IGI_Lab5.caching import get_or_set
+from rentals.archive import union_archive
+from rentals.models import Rental
+
+DURATION_CATEGORIES = ['1 день', '2-3 дня', '4-7 дней', '1-2 недели', '2-4 недели', 'Более месяца']
+# Верхние границы категорий длительности (включительно), последняя категория открыта
+DURATION_BOUNDS = [1, 3, 7, 14, 30]
+WEEKDAYS = ['Пн', 'Вт', 'Ср', 'Чт', 'Пт', 'Сб', 'Вс']
+PERCENTILES = [50, 75, 90, 95, 99]
+
+
+def load_rental_arrays(date_from=None, date_to=None):
+    """Одним запросом (рабочая таблица и архив) загружает нужные колонки аренд в массивы NumPy"""
+    def build(rentals):
+        if date_from:
+            rentals = rentals.filter(rental_date__gte=date_from)
+        if date_to:
+            rentals = rentals.filter(rental_date__lte=date_to)
+        return rentals.order_by().values_list(
+            'rental_date', 'actual_return_date', 'total_amount', 'vehicle__car_model__brand'
+        )
+
+    rows = list(union_archive(Rental, build))
+    count = len(rows)
+    rental_dates, return_dates, amounts, brands = zip(*rows) if rows else ((), (), (), ())
+
+    return {
+        'rental_date': np.array(rental_dates, dtype='datetime64[D]'),
+        'return_date': np.array(return_dates, dtype='datetime64[D]'),
+        'amount': np.fromiter(amounts, dtype=np.float64, count=count),
+        'brand': np.array(brands, dtype=object),
+    }
+
+
+def brand_popularity(arrays):
+    if not len(arrays['brand']):
+        return []
+    brands, inverse = np.unique(arrays['brand'], return_inverse=True)
+    counts = np.bincount(inverse, minlength=len(brands))
+    revenues = np.bincount(inverse, weights=arrays['amount'], minlength=len(brands))
+    order = np.argsort(-counts, kind='stable')
+    return [
+        {'brand': str(brands[i]), 'count': int(counts[i]), 'revenue': round(float(revenues[i]), 2)}
+        for i in order
+    ]
+
+
+def monthly_series(arrays):
+    if not len(arrays['rental_date']):
+        return []
+    months, inverse = np.unique(arrays['rental_date'].astype('datetime64[M]'), return_inverse=True)
+    counts = np.bincount(inverse, minlength=len(months))
+    revenues = np.bincount(inverse, weights=arrays['amount'], minlength=len(months))
+    return [
+        {'month': str(month), 'count': int(count), 'revenue': round(float(revenue), 2)}
+        for month, count, revenue in zip(months, counts, revenues)
+    ]
+
+
+def duration_histogram(arrays):
+    returned = ~np.isnat(arrays['return_date'])
+    durations = (arrays['return_date'][returned] - arrays['rental_date'][returned]).astype(np.int64)
+    counts = np.bincount(
+        np.searchsorted(DURATION_BOUNDS, durations, side='left'),
+        minlength=len(DURATION_CATEGORIES),
+    )
+    total = int(counts.sum())
+    return [
+        {
+            'category': category,
+            'count': int(count),
+            'percentage': round(float(count) / total * 100, 1) if total else 0,
+        }
+        for category, count in zip(DURATION_CATEGORIES, counts)
+    ]
+
+
+def weekday_distribution(arrays):
+    # 1970-01-01 — четверг, поэтому сдвиг на 3 дает 0 = Понедельник
+    weekdays = (arrays['rental_date'].astype(np.int64) + 3) % 7
+    counts = np.bincount(weekdays, minlength=7)
+    return [{'day': day, 'count': int(count)} for day, count in zip(WEEKDAYS, counts)]
+
+
+def revenue_percentiles(arrays):
+    amounts = arrays['amount']
+    if not len(amounts):
+        return {f'p{p}': None for p in PERCENTILES}
+    values = np.percentile(amounts, PERCENTILES)
+    return {f'p{p}': round(float(value), 2) for p, value in zip(PERCENTILES, values)}
+
+
+def compute_statistics(date_from=None, date_to=None):
+    """Считает все метрики по одним и тем же массивам"""
+    arrays = load_rental_arrays(date_from, date_to)
+    return {
+        'brands': brand_popularity(arrays),
+        'monthly': monthly_series(arrays),
+        'durations': duration_histogram(arrays),
+        'weekdays': weekday_distribution(arrays),
+        'revenue_percentiles': revenue_percentiles(arrays),
+    }
+
+
+def get_statistics(date_from=None, date_to=None):
+    """Возвращает метрики из кэша; ключ кэша — выбранный период, одновременные промахи считаются один раз"""
+    return get_or_set(
+        f'stats:api:{date_from or ""}:{date_to or ""}', lambda: compute_statistics(date_from, date_to),
+        getattr(settings, 'STATS_API_CACHE_TIMEOUT', 300),
+    )
@@ -0,0 +1,94 @@
+"""
+Построение графиков дашборда.
+
+Модуль не зависит от Django и выполняется в процессах пула рендеринга
+(см. stats.renderer). Используется объектный API Matplotlib с холстом Agg,
+без глобального состояния pyplot, поэтому параллельные отрисовки не мешают
+друг другу.
+"""
+import base64
+import io
+
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+
+def _new_figure(figsize):
+    figure = Figure(figsize=figsize)
+    FigureCanvasAgg(figure)
+    return figure
+
+
+def _to_png(figure):
+    """Преобразует график в base64-строку для HTML"""
+    buf = io.BytesIO()
+    figure.savefig(buf, format='png', bbox_inches='tight')
+    return base64.b64encode(buf.getvalue()).decode('utf-8')
+
+
+def pie_chart(labels, values, title):
+    """Создает круговую диаграмму"""
+    figure = _new_figure((8, 6))
+    ax = figure.subplots()
+    ax.pie(values, labels=labels, autopct='%1.1f%%', startangle=90)
+    ax.set_title(title)
+    ax.axis('equal')  # Equal aspect ratio ensures the pie chart is circular
+    return _to_png(figure)
+
+
+def line_chart(x_labels, y1_values, y2_values, title):
+    """Создает линейный график с двумя осями Y"""
+    figure = _new_figure((10, 6))
+    ax1 = figure.subplots()
+
+    color = 'tab:blue'
+    ax1.set_xlabel('Месяц')
+    ax1.set_ylabel('Количество аренд', color=color)
+    ax1.plot(x_labels, y1_values, color=color, marker='o')
+    ax1.tick_params(axis='y', labelcolor=color)
+    ax1.tick_params(axis='x', labelrotation=45)
+
+    ax2 = ax1.twinx()  # instantiate a second axes that shares the same x-axis
+    color = 'tab:red'
+    ax2.set_ylabel('Выручка ($)', color=color)
+    ax2.plot(x_labels, y2_values, color=color, marker='s')
+    ax2.tick_params(axis='y', labelcolor=color)
+
+    figure.tight_layout()
+    figure.suptitle(title, fontsize=16)
+    figure.subplots_adjust(top=0.9)
+    return _to_png(figure)
+
+
+def bar_chart(labels, values, title):
+    """Создает столбчатую диаграмму"""
+    figure = _new_figure((10, 6))
+    ax = figure.subplots()
+    y_pos = list(range(len(labels)))
+
+    ax.barh(y_pos, values, align='center')
+    ax.set_yticks(y_pos)
+    ax.set_yticklabels(labels)
+    ax.invert_yaxis()  # labels read top-to-bottom
+    ax.set_title(title)
+
+    # Добавляем значения на концах столбцов
+    for i, v in enumerate(values):
+        ax.text(v, i, str(v), va='center')
+    return _to_png(figure)
+
+
+CHARTS = {
+    'pie': pie_chart,
+    'line': line_chart,
+    'bar': bar_chart,
+}
+
+
+def render(kind, args):
+    return CHARTS[kind](*args)
+
+
+def warm_up():
+    """Прогревает процесс пула: шрифты и бэкенд загружаются до первого запроса"""
+    _to_png(_new_figure((1, 1)))
@@ -0,0 +1,142 @@
+"""
+Прогноз выручки и количества аренд по маркам и автопаркам.
+
+Дневные ряды загружаются из сводок DailyRentalRollup в матрицы NumPy
+(дни x ряды). Для рядов подбирается сезонная модель: среднее + поправки на
+день недели + поправки на месяц; ряды с одинаковым первым наблюдением решаются
+одним вызовом lstsq. Дни до первого наблюдения ряда в подбор не входят, а
+поправки на месяцы, которых нет в истории, не подбираются. Результат
+записывается в таблицу RevenueForecast; дашборд только читает ее.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from stats.models import DailyRentalRollup, RevenueForecast
+
+HORIZON_DAYS = 90
+HISTORY_DAYS = 730
+
+
+def load_daily_series(date_from, date_to):
+    """
+    Возвращает (ключи рядов, матрица выручки, матрица количества аренд, первые наблюдения).
+
+    Ключ ряда — (марка, id автопарка); строки матриц — дни с date_from по date_to.
+    Первое наблюдение — номер строки первой сводки ряда: до него ряд заполнен
+    нулями, которые означают отсутствие истории, а не дни без аренд.
+    Отмененные аренды не учитываются.
+    """
+    rows = list(
+        DailyRentalRollup.objects.filter(date__gte=date_from, date__lte=date_to)
+        .exclude(status='cancelled')
+        .values_list('date', 'brand', 'car_park_id')
+        .annotate(revenue=Sum('revenue'), count=Sum('rental_count'))
+        .order_by()
+    )
+    days = (date_to - date_from).days + 1
+    if not rows:
+        return [], np.zeros((days, 0)), np.zeros((days, 0)), np.zeros(0, dtype=np.int64)
+
+    dates, brands, car_parks, revenues, counts = zip(*rows)
+    day_index = (np.array(dates, dtype='datetime64[D]') - np.datetime64(date_from, 'D')).astype(np.int64)
+    keys = list(zip(brands, car_parks))
+    series_keys = sorted(set(keys))
+    lookup = {key: index for index, key in enumerate(series_keys)}
+    series_index = np.fromiter((lookup[key] for key in keys), dtype=np.int64, count=len(keys))
+
+    revenue = np.zeros((days, len(series_keys)))
+    count = np.zeros((days, len(series_keys)))
+    np.add.at(revenue, (day_index, series_index), np.fromiter(revenues, dtype=np.float64, count=len(rows)))
+    np.add.at(count, (day_index, series_index), np.fromiter(counts, dtype=np.float64, count=len(rows)))
+    first_observed = np.full(len(series_keys), days, dtype=np.int64)
+    np.minimum.at(first_observed, series_index, day_index)
+    return series_keys, revenue, count, first_observed
+
+
+def seasonal_design(start, days):
+    """Матрица признаков: свободный член, 6 дней недели и 11 месяцев (понедельник и январь — базовые)"""
+    dates = np.datetime64(start, 'D') + np.arange(days)
+    weekday = (dates.astype(np.int64) + 3) % 7  # 0 = Понедельник
+    month = dates.astype('datetime64[M]').astype(np.int64) % 12  # 0 = Январь
+
+    design = np.zeros((days, 1 + 6 + 11))
+    design[:, 0] = 1.0
+    rows = np.arange(days)
+    has_weekday = weekday > 0
+    design[rows[has_weekday], weekday[has_weekday]] = 1.0
+    has_month = month > 0
+    design[rows[has_month], 6 + month[has_month]] = 1.0
+    return design
+
+
+def observed_features(design):
+    """
+    Столбцы матрицы признаков, которые можно подобрать по ее строкам. Поправки на
+    отсутствующие дни недели и месяцы отбрасываются; если нет базового дня или
+    месяца, базовым становится первый из имеющихся — иначе поправки вместе дают
+    свободный член и система вырождена. Для отброшенных значений прогноз
+    совпадает с базовым.
+    """
+    features = design.any(axis=0)
+    for group in (slice(1, 7), slice(7, 18)):
+        has_base = not design[:, group].any(axis=1).all()
+        present = np.flatnonzero(features[group])
+        if not has_base and len(present):
+            features[group.start + present[0]] = False
+    return features
+
+
+def fit_and_project(history_start, history, horizon_start, horizon_days, first_observed=None):
+    """
+    Подбирает коэффициенты для столбцов history и строит прогноз; first_observed —
+    номер первой строки истории каждого столбца (по умолчанию вся история).
+    """
+    if first_observed is None:
+        first_observed = np.zeros(history.shape[1], dtype=np.int64)
+    design = seasonal_design(history_start, len(history))
+    horizon = seasonal_design(horizon_start, horizon_days)
+    projection = np.zeros((horizon_days, history.shape[1]))
+    for start in np.unique(first_observed):
+        columns = first_observed == start
+        features = observed_features(design[start:])
+        coefficients, *_ = np.linalg.lstsq(design[start:, features], history[start:, columns], rcond=None)
+        projection[:, columns] = horizon[:, features] @ coefficients
+    return np.clip(projection, 0, None)
+
+
+def build_forecast(today=None, history_days=HISTORY_DAYS, horizon_days=HORIZON_DAYS):
+    """Пересчитывает таблицу прогнозов; возвращает количество записанных строк"""
+    today = today or timezone.now().date()
+    history_start = today - timedelta(days=history_days)
+    history_end = today - timedelta(days=1)
+
+    keys, revenue, count, first_observed = load_daily_series(history_start, history_end)
+    forecasts = []
+    if keys:
+        series = len(keys)
+        # Выручка и количество аренд решаются одной системой
+        projection = fit_and_project(
+            history_start, np.hstack([revenue, count]), today, horizon_days, np.tile(first_observed, 2)
+        )
+        generated_at = timezone.now()
+        for day in range(horizon_days):
+            target_date = today + timedelta(days=day)
+            for index, (brand, car_park_id) in enumerate(keys):
+                forecasts.append(RevenueForecast(
+                    target_date=target_date,
+                    brand=brand,
+                    car_park_id=car_park_id,
+                    revenue=Decimal(f'{projection[day, index]:.2f}'),
+                    rental_count=round(float(projection[day, series + index]), 3),
+                    generated_at=generated_at,
+                ))
+
+    with transaction.atomic():
+        RevenueForecast.objects.all().delete()
+        RevenueForecast.objects.bulk_create(forecasts, batch_size=1000)
+    return len(forecasts)
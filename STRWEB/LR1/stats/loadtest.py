@@ -0,0 +1,326 @@
+"""
+Нагрузочное тестирование сайта по сценариям пользователей.
+
+Асинхронный HTTP/1.1-клиент на asyncio (без сторонних библиотек) с cookie и
+CSRF-токеном Django. Виртуальные клиенты повторяют сценарии «каталог с
+фильтрами → корзина → оплата», виртуальные сотрудники — «подтверждение и
+возврат аренды» и «дашборд статистики». Для каждого шага собираются времена
+ответа; отчет содержит пропускную способность и перцентили p50/p95/p99 и
+сравнивается с сохраненным эталоном (команда run_loadtest).
+"""
+import asyncio
+import math
+import random
+import re
+import time
+from datetime import date
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode, urljoin, urlsplit
+
+CSRF_INPUT_RE = re.compile(r'name="csrfmiddlewaretoken" value="([^"]+)"')
+VEHICLE_LINK_RE = re.compile(r'href="/vehicles/(\d+)/"')
+CONFIRM_LINK_RE = re.compile(r'action="/rentals/(\d+)/confirm/"')
+BRAND_SELECT_RE = re.compile(r'<select id="brand" name="brand">(.*?)</select>', re.S)
+OPTION_RE = re.compile(r'<option value="([^"]+)"')
+
+PERCENTILES = (50, 95, 99)
+
+
+class Response:
+    def __init__(self, status, headers, body):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    @property
+    def text(self):
+        return self.body.decode('utf-8', errors='replace')
+
+
+class HttpSession:
+    """Одно keep-alive соединение с сервером и cookie одного пользователя"""
+
+    def __init__(self, base_url, timeout=30):
+        parts = urlsplit(base_url)
+        self.base_url = base_url
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.timeout = timeout
+        self.cookies = {}
+        self.reader = self.writer = None
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.reader = self.writer = None
+
+    async def _connect(self):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+    async def request(self, method, path, data=None, referer=None):
+        body = urlencode(data, doseq=True).encode() if data is not None else b''
+        headers = {
+            'Host': f'{self.host}:{self.port}',
+            'Connection': 'keep-alive',
+            'User-Agent': 'stats-loadtest',
+            'Content-Length': str(len(body)),
+        }
+        if data is not None:
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        if referer:
+            headers['Referer'] = urljoin(self.base_url, referer)
+        if self.cookies:
+            headers['Cookie'] = '; '.join(f'{name}={value}' for name, value in self.cookies.items())
+        raw = f'{method} {path} HTTP/1.1\r\n' + ''.join(f'{key}: {value}\r\n' for key, value in headers.items())
+
+        # Сервер мог закрыть простаивающее соединение — одна повторная попытка с новым
+        for attempt in range(2):
+            await self._connect()
+            try:
+                self.writer.write(raw.encode('latin-1') + b'\r\n' + body)
+                await self.writer.drain()
+                return await asyncio.wait_for(self._read_response(), self.timeout)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                await self.close()
+                if attempt:
+                    raise
+
+    async def _read_response(self):
+        status_line = await self.reader.readuntil(b'\r\n')
+        status = int(status_line.split()[1])
+        headers, cookies = {}, []
+        while True:
+            line = (await self.reader.readuntil(b'\r\n')).decode('latin-1').rstrip('\r\n')
+            if not line:
+                break
+            name, _, value = line.partition(':')
+            name, value = name.strip().lower(), value.strip()
+            if name == 'set-cookie':
+                cookies.append(value)
+            headers[name] = value
+
+        if headers.get('transfer-encoding', '').lower() == 'chunked':
+            body = bytearray()
+            while True:
+                size = int((await self.reader.readuntil(b'\r\n')).split(b';')[0], 16)
+                if size == 0:
+                    await self.reader.readuntil(b'\r\n')
+                    break
+                body += await self.reader.readexactly(size)
+                await self.reader.readexactly(2)
+            body = bytes(body)
+        elif 'content-length' in headers:
+            body = await self.reader.readexactly(int(headers['content-length']))
+        else:
+            body = await self.reader.read()
+            headers['connection'] = 'close'
+
+        for cookie in cookies:
+            for name, morsel in SimpleCookie(cookie).items():
+                if morsel['max-age'] == '0':
+                    self.cookies.pop(name, None)
+                else:
+                    self.cookies[name] = morsel.value
+        if headers.get('connection', '').lower() == 'close':
+            await self.close()
+        return Response(status, headers, body)
+
+
+class Recorder:
+    """Времена ответов по шагам сценариев"""
+
+    def __init__(self):
+        self.samples = {}
+        self.errors = {}
+        self.started = self.finished = None
+
+    def add(self, step, seconds, ok):
+        self.samples.setdefault(step, []).append(seconds)
+        if not ok:
+            self.errors[step] = self.errors.get(step, 0) + 1
+
+    def report(self):
+        elapsed = (self.finished or time.monotonic()) - self.started
+        steps = {step: summarize(samples, self.errors.get(step, 0), elapsed) for step, samples in self.samples.items()}
+        everything = [value for samples in self.samples.values() for value in samples]
+        return {
+            'duration_seconds': round(elapsed, 2),
+            'total': summarize(everything, sum(self.errors.values()), elapsed),
+            'steps': dict(sorted(steps.items())),
+        }
+
+
+def percentile(sorted_values, percent):
+    """Перцентиль методом ближайшего ранга"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(percent / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(samples, errors, elapsed):
+    ordered = sorted(samples)
+    result = {
+        'requests': len(ordered),
+        'errors': errors,
+        'throughput_rps': round(len(ordered) / elapsed, 2) if elapsed else 0.0,
+    }
+    for percent in PERCENTILES:
+        result[f'p{percent}_ms'] = round(percentile(ordered, percent) * 1000, 1)
+    return result
+
+
+class VirtualUser:
+    def __init__(self, base_url, recorder, username, password, rng):
+        self.session = HttpSession(base_url)
+        self.recorder = recorder
+        self.username = username
+        self.password = password
+        self.random = rng
+
+    async def step(self, name, method, path, data=None, expect=(200, 302)):
+        started = time.monotonic()
+        try:
+            response = await self.session.request(method, path, data, referer=path)
+        except (OSError, asyncio.TimeoutError, ValueError):
+            self.recorder.add(name, time.monotonic() - started, ok=False)
+            await self.session.close()
+            return None
+        self.recorder.add(name, time.monotonic() - started, ok=response.status in expect)
+        return response
+
+    async def post_form(self, name, path, data, page=None):
+        """POST формы с CSRF-токеном; page — уже загруженная страница с формой"""
+        token = None
+        if page is not None:
+            match = CSRF_INPUT_RE.search(page.text)
+            token = match.group(1) if match else None
+        token = token or self.session.cookies.get('csrftoken')
+        return await self.step(name, 'POST', path, {'csrfmiddlewaretoken': token or '', **data})
+
+    async def login(self):
+        page = await self.step('auth: login form', 'GET', '/auth/login/')
+        if page is not None:
+            await self.post_form('auth: login', '/auth/login/', {
+                'username': self.username, 'password': self.password,
+            }, page)
+
+
+class Client(VirtualUser):
+    """Клиент: ищет автомобиль в каталоге, кладет в корзину и оплачивает"""
+
+    async def browse(self):
+        catalogue = await self.step('catalogue: list', 'GET', '/vehicles/?is_available=true')
+        if catalogue is None:
+            return []
+        select = BRAND_SELECT_RE.search(catalogue.text)
+        brands = OPTION_RE.findall(select.group(1)) if select else []
+        filters = {'is_available': 'true', 'ordering': self.random.choice(['daily_rental_price', '-year'])}
+        if brands:
+            filters['brand'] = self.random.choice(brands)
+        filtered = await self.step('catalogue: filtered', 'GET', '/vehicles/?' + urlencode(filters))
+        search = {'search': self.random.choice(['a', 'о', 'X'])}
+        await self.step('catalogue: search', 'GET', '/vehicles/?' + urlencode(search))
+        ids = VEHICLE_LINK_RE.findall((filtered or catalogue).text) or VEHICLE_LINK_RE.findall(catalogue.text)
+        if ids:
+            await self.step('catalogue: vehicle detail', 'GET', f'/vehicles/{self.random.choice(ids)}/')
+        return ids
+
+    async def rent(self, vehicle_ids):
+        if not vehicle_ids:
+            return
+        vehicle_id = self.random.choice(vehicle_ids)
+        form = await self.step('cart: rental form', 'GET', f'/rentals/create/{vehicle_id}/', expect=(200, 404))
+        if form is None or form.status != 200:
+            return
+        await self.post_form('cart: add', f'/rentals/create/{vehicle_id}/', {
+            'vehicle': vehicle_id, 'rental_days': self.random.randint(1, 7), 'promo_code': '',
+        }, form)
+        await self.step('cart: view', 'GET', '/rentals/cart/')
+        payment = await self.step('payment: form', 'GET', '/rentals/payment/')
+        if payment is not None and payment.status == 200:
+            await self.post_form('payment: pay', '/rentals/payment/', {
+                'card_number': '4111111111111111', 'card_holder': 'LOAD TEST', 'expiry_date': '12/30', 'cvv': '123',
+            }, payment)
+
+    async def journey(self):
+        await self.rent(await self.browse())
+
+
+class Staff(VirtualUser):
+    """Сотрудник: подтверждает и принимает обратно арендованные автомобили, смотрит дашборд"""
+
+    async def process_rentals(self):
+        listing = await self.step('staff: pending rentals', 'GET', '/rentals/staff/?status=pending')
+        if listing is None:
+            return
+        for rental_id in CONFIRM_LINK_RE.findall(listing.text)[:2]:
+            await self.post_form('staff: approve', f'/rentals/{rental_id}/confirm/', {'action': 'approve'}, listing)
+            form = await self.step('staff: return form', 'GET', f'/rentals/{rental_id}/return/')
+            if form is not None and form.status == 200:
+                await self.post_form('staff: return', f'/rentals/{rental_id}/return/', {
+                    'actual_return_date': date.today().isoformat(), 'condition_notes': 'Без замечаний',
+                }, form)
+
+    async def dashboard(self):
+        await self.step('dashboard: page', 'GET', '/statistics/dashboard/')
+        await self.step('dashboard: api', 'GET', '/statistics/api/monthly/')
+
+    async def journey(self):
+        await self.process_rentals()
+        if self.random.random() < 0.3:
+            await self.dashboard()
+
+
+async def _run_user(user, deadline, iterations):
+    await user.login()
+    done = 0
+    try:
+        while time.monotonic() < deadline and (iterations is None or done < iterations):
+            await user.journey()
+            done += 1
+    finally:
+        await user.session.close()
+
+
+async def run(base_url, clients, staff, duration, iterations=None, seed=0):
+    """
+    clients и staff — списки пар (логин, пароль) виртуальных пользователей.
+    Сценарии повторяются, пока не истечет duration секунд (или iterations повторов).
+    """
+    recorder = Recorder()
+    rng = random.Random(seed)
+    users = [Client(base_url, recorder, username, password, random.Random(rng.random()))
+             for username, password in clients]
+    users += [Staff(base_url, recorder, username, password, random.Random(rng.random()))
+              for username, password in staff]
+    recorder.started = time.monotonic()
+    deadline = recorder.started + duration
+    await asyncio.gather(*(_run_user(user, deadline, iterations) for user in users))
+    recorder.finished = time.monotonic()
+    return recorder.report()
+
+
+def compare(report, baseline, tolerance, min_requests=20):
+    """
+    Сравнивает отчет с эталоном: шаги, у которых p95 вырос или пропускная
+    способность упала больше чем на tolerance (доля), считаются регрессиями.
+    p95 шагов, у которых меньше min_requests замеров, не сравнивается — это шум.
+    """
+    regressions = []
+    for step, current in report['steps'].items():
+        previous = baseline.get('steps', {}).get(step)
+        if not previous:
+            continue
+        if current['errors'] > previous['errors']:
+            regressions.append(f"{step}: ошибок {previous['errors']} -> {current['errors']}")
+        if min(current['requests'], previous['requests']) < min_requests:
+            continue
+        if previous['p95_ms'] and current['p95_ms'] > previous['p95_ms'] * (1 + tolerance):
+            regressions.append(f"{step}: p95 {previous['p95_ms']} -> {current['p95_ms']} мс")
+    previous_total = baseline.get('total', {}).get('throughput_rps')
+    current_total = report['total']['throughput_rps']
+    if previous_total and current_total < previous_total * (1 - tolerance):
+        regressions.append(f'всего: {previous_total} -> {current_total} запросов/с')
+    return regressions
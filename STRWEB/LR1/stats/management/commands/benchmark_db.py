@@ -0,0 +1,159 @@
+import random
+import statistics
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connections, transaction
+from django.db.models import Count
+
+from content.models import Review
+from rentals.models import Rental
+from vehicles.models import Vehicle
+
+# Индексы, построенные под фильтры представлений (проверяются с ними и без них)
+WORKLOAD_INDEXES = (
+    'rental_user_created_idx',
+    'rental_status_created_idx',
+    'vehicle_available_price_idx',
+    'review_approved_created_idx',
+    'review_pending_created_idx',
+)
+PLAIN_ALIAS = 'benchmark_plain'
+
+
+def workload_queries():
+    """Запросы представлений: (название, функция, возвращающая queryset)"""
+    # Клиент с самой длинной историей прокатов
+    user_id = (
+        Rental.objects.values('user').annotate(count=Count('pk')).order_by('-count').values_list('user', flat=True)
+        .first()
+    )
+    return [
+        ('Прокаты клиента', lambda: Rental.objects.select_related('vehicle__car_model', 'promo_code')
+            .filter(user_id=user_id).order_by('-created_at')),
+        ('Прокаты в ожидании (сотрудник)', lambda: Rental.objects.select_related('user', 'vehicle__car_model')
+            .filter(status='pending').order_by('-created_at')),
+        ('Каталог: доступные по цене', lambda: Vehicle.objects.select_related('car_model__body_type', 'car_park')
+            .filter(is_available=True).order_by('daily_rental_price')),
+        ('Одобренные отзывы, страница', lambda: Review.objects.select_related('user')
+            .filter(approved=True).order_by('-created_at')[:10]),
+        ('Модерация отзывов, страница', lambda: Review.objects.select_related('user')
+            .filter(approved=False).order_by('-created_at', '-pk')[:50]),
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеры БД: запросы представлений с индексами и без них, конкурентные чтение и запись '
+        'с настройками SQLite из settings и без них'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20, help='Повторов каждого запроса')
+        parser.add_argument('--readers', type=int, default=4, help='Потоков чтения')
+        parser.add_argument('--writers', type=int, default=4, help='Потоков записи')
+        parser.add_argument('--seconds', type=float, default=10, help='Длительность конкурентного замера')
+        parser.add_argument('--skip-concurrency', action='store_true')
+
+    def handle(self, *args, **options):
+        if connections['default'].vendor != 'sqlite':
+            raise CommandError('Замер рассчитан на SQLite')
+        self.bench_queries(options['repeat'])
+        if not options['skip_concurrency']:
+            self.bench_concurrency(options['readers'], options['writers'], options['seconds'])
+
+    def bench_queries(self, repeat):
+        queries = workload_queries()
+        with transaction.atomic():
+            # DDL в SQLite транзакционный: индексы удаляются только на время замера
+            with connections['default'].cursor() as cursor:
+                for name in WORKLOAD_INDEXES:
+                    cursor.execute(f'DROP INDEX IF EXISTS "{name}"')
+            before = {title: self.time_query(make, repeat) for title, make in queries}
+            transaction.set_rollback(True)
+        after = {title: self.time_query(make, repeat) for title, make in queries}
+
+        self.stdout.write(f"{'Запрос':34} {'без индексов, мс':>17} {'с индексами, мс':>16}")
+        for title, make in queries:
+            self.stdout.write(f'{title:34} {before[title]:>17.2f} {after[title]:>16.2f}')
+            self.stdout.write(f'    план: {self.plan(make())}')
+
+    def time_query(self, make, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            list(make())
+            timings.append(time.perf_counter() - started)
+        return statistics.median(timings) * 1000
+
+    def plan(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        with connections['default'].cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            return '; '.join(row[-1] for row in cursor.fetchall())
+
+    def bench_concurrency(self, readers, writers, seconds):
+        # Соединение без OPTIONS — так БД работала до настройки прагм
+        default = connections.settings['default']
+        connections.settings[PLAIN_ALIAS] = {**default, 'OPTIONS': {}}
+        vehicle_ids = list(Vehicle.objects.values_list('pk', flat=True))
+        if not vehicle_ids:
+            raise CommandError('Нет автомобилей: заполните БД командой generate_load_data')
+        connections.close_all()
+
+        self.stdout.write(f"\n{'Соединение':34} {'чтений/с':>10} {'записей/с':>10} {'ошибок блокировки':>18}")
+        for title, alias, journal_mode in (
+            ('без настроек (rollback journal)', PLAIN_ALIAS, 'DELETE'),
+            ('настройки из settings (WAL)', 'default', 'WAL'),
+        ):
+            with connections[alias].cursor() as cursor:
+                cursor.execute(f'PRAGMA journal_mode={journal_mode}')
+            connections.close_all()
+            reads, writes, errors = self.mixed_load(alias, vehicle_ids, readers, writers, seconds)
+            self.stdout.write(f'{title:34} {reads / seconds:>10.1f} {writes / seconds:>10.1f} {errors:>18}')
+
+    def mixed_load(self, alias, vehicle_ids, readers, writers, seconds):
+        counts = {'reads': 0, 'writes': 0, 'errors': 0}
+        lock = threading.Lock()
+        deadline = time.monotonic() + seconds
+
+        def count(key):
+            with lock:
+                counts[key] += 1
+
+        def read():
+            while time.monotonic() < deadline:
+                try:
+                    list(Vehicle.objects.using(alias).filter(is_available=True).order_by('daily_rental_price')[:50])
+                    list(Rental.objects.using(alias).filter(status='pending').order_by('-created_at')[:50])
+                    count('reads')
+                except OperationalError:
+                    count('errors')
+
+        def write(rng):
+            # Как оформление заказа: чтение, затем запись в одной транзакции
+            while time.monotonic() < deadline:
+                try:
+                    with transaction.atomic(using=alias):
+                        vehicle = Vehicle.objects.using(alias).get(pk=rng.choice(vehicle_ids))
+                        Vehicle.objects.using(alias).filter(pk=vehicle.pk).update(
+                            daily_rental_price=vehicle.daily_rental_price,
+                        )
+                    count('writes')
+                except OperationalError:
+                    count('errors')
+
+        def run(target, *args):
+            try:
+                target(*args)
+            finally:
+                connections[alias].close()
+
+        threads = [threading.Thread(target=run, args=(read,)) for _ in range(readers)]
+        threads += [threading.Thread(target=run, args=(write, random.Random(number))) for number in range(writers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return counts['reads'], counts['writes'], counts['errors']
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from stats.forecasting import HISTORY_DAYS, HORIZON_DAYS, build_forecast
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает прогноз выручки по маркам и автопаркам (запускается по ночам)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--history-days', type=int, default=HISTORY_DAYS,
+            help='Глубина истории для подбора сезонной модели',
+        )
+        parser.add_argument(
+            '--horizon-days', type=int, default=HORIZON_DAYS,
+            help='На сколько дней вперед строить прогноз',
+        )
+
+    def handle(self, *args, **options):
+        rows = build_forecast(history_days=options['history_days'], horizon_days=options['horizon_days'])
+        self.stdout.write(self.style.SUCCESS(f'Прогноз пересчитан: {rows} строк'))
@@ -0,0 +1,342 @@
+import math
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from content import reviews, search
+from content.models import Article, Review
+from IGI_Lab5.caching import invalidate_tags, tag_for
+from rentals.models import ArchivedRental, PenaltyType, PromoCode, Rental, RentalPenalty
+from stats.rollups import rebuild_rollups
+from stats.sketches import rebuild_sketches
+from vehicles.models import BodyType, CarModel, CarPark, Vehicle
+
+User = get_user_model()
+
+# Марки по убыванию популярности: вес марки ~ 1 / место^BRAND_SKEW
+BRANDS = {
+    'Toyota': ['Camry', 'Corolla', 'RAV4', 'Land Cruiser'],
+    'Volkswagen': ['Polo', 'Passat', 'Tiguan', 'Golf'],
+    'Hyundai': ['Solaris', 'Tucson', 'Elantra'],
+    'Kia': ['Rio', 'Sportage', 'Ceed'],
+    'Skoda': ['Octavia', 'Rapid', 'Kodiaq'],
+    'Renault': ['Logan', 'Duster', 'Arkana'],
+    'BMW': ['3 Series', '5 Series', 'X5'],
+    'Mercedes-Benz': ['C-Class', 'E-Class', 'GLE'],
+    'Audi': ['A4', 'A6', 'Q5'],
+    'Geely': ['Coolray', 'Atlas', 'Monjaro'],
+    'Volvo': ['XC60', 'S90'],
+    'Porsche': ['Cayenne', 'Macan'],
+}
+BRAND_SKEW = 1.2
+BODY_TYPES = ['Седан', 'Хэтчбек', 'Универсал', 'Кроссовер', 'Внедорожник']
+PENALTY_TYPES = [('Опоздание с возвратом', Decimal('30.00')), ('Царапина', Decimal('80.00')),
+                 ('Грязный салон', Decimal('25.00')), ('Пустой бак', Decimal('40.00'))]
+FIRST_NAMES = ['Иван', 'Алексей', 'Мария', 'Анна', 'Дмитрий', 'Ольга', 'Сергей', 'Елена', 'Павел', 'Наталья']
+LAST_NAMES = ['Иванов', 'Петров', 'Сидоров', 'Ковалев', 'Новик', 'Мельник', 'Козлов', 'Лебедев', 'Морозов']
+REVIEW_PHRASES = [
+    'Машина была чистой и заправленной.', 'Оформление заняло десять минут.', 'Менеджер все подробно объяснил.',
+    'Цена соответствует качеству.', 'Пришлось подождать выдачи автомобиля.', 'Буду обращаться еще.',
+    'Автомобиль в отличном техническом состоянии.', 'Не хватало детского кресла.', 'Удобное расположение офиса.',
+]
+# Доли оценок отзывов 1..5 — большинство довольных клиентов
+RATING_WEIGHTS = [3, 4, 8, 30, 55]
+CENTS = Decimal(100)
+RENTAL_FIELDS = (
+    'id', 'vehicle', 'user', 'status', 'rental_date', 'rental_days', 'expected_return_date', 'actual_return_date',
+    'rental_amount', 'promo_code', 'discount_amount', 'total_amount', 'condition_notes', 'is_active',
+    'created_at', 'updated_at',
+)
+PENALTY_FIELDS = ('id', 'rental', 'penalty_type', 'date_applied', 'notes')
+
+
+def _cumulative(weights):
+    total, result = 0.0, []
+    for weight in weights:
+        total += weight
+        result.append(total)
+    return result
+
+
+def _next_id(model):
+    return (model.objects.aggregate(top=Max('pk'))['top'] or 0) + 1
+
+
+def _money(cents):
+    return Decimal(cents) / CENTS
+
+
+def insert_rows(model, fields, rows):
+    """
+    Вставляет готовые кортежи значений одним executemany.
+
+    Для аренд bulk_create слишком медленный: на SQLite пакет ограничен числом
+    параметров запроса (несколько десятков строк), а компиляция SQL и подготовка
+    каждого значения в ORM стоят дороже самой вставки.
+    """
+    if not rows:
+        return
+    quote = connection.ops.quote_name
+    columns = ', '.join(quote(model._meta.get_field(name).column) for name in fields)
+    placeholders = ', '.join(['%s'] * len(fields))
+    with connection.cursor() as cursor:
+        cursor.executemany(f'INSERT INTO {quote(model._meta.db_table)} ({columns}) VALUES ({placeholders})', rows)
+
+
+def season_weight(day):
+    """Спрос по дням: пик летом, выходные выше будних"""
+    season = 1 + 0.5 * math.sin(2 * math.pi * (day.timetuple().tm_yday - 105) / 365)
+    weekend = 1.3 if day.weekday() >= 4 else 1.0
+    return season * weekend
+
+
+class Command(BaseCommand):
+    help = 'Заполняет БД большим объемом правдоподобных данных для нагрузочных тестов и замеров'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--car-parks', type=int, default=20)
+        parser.add_argument('--vehicles', type=int, default=2000)
+        parser.add_argument('--promo-codes', type=int, default=200)
+        parser.add_argument('--rentals', type=int, default=100000)
+        parser.add_argument('--reviews', type=int, default=20000)
+        parser.add_argument('--articles', type=int, default=500)
+        parser.add_argument('--days', type=int, default=730, help='Глубина истории аренд в днях')
+        parser.add_argument('--penalty-rate', type=float, default=0.08, help='Доля завершенных аренд со штрафом')
+        parser.add_argument('--promo-rate', type=float, default=0.15, help='Доля аренд с промокодом')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--chunk-size', type=int, default=50000, help='Сколько аренд держать в памяти за раз')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument(
+            '--skip-derived', action='store_true',
+            help='Не пересчитывать сводки, скетчи, сводку отзывов и поисковый индекс',
+        )
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.today = timezone.now().date()
+
+        with transaction.atomic():
+            self.step('Справочники', self.create_reference_data, options)
+            self.step('Пользователи', self.create_users, options['users'])
+            self.step('Автомобили', self.create_vehicles, options['car_parks'], options['vehicles'])
+            self.step('Промокоды', self.create_promo_codes, options['promo_codes'])
+            self.step('Аренды и штрафы', self.create_rentals, options)
+            self.step('Отзывы', self.create_reviews, options['reviews'])
+            self.step('Новости', self.create_articles, options['articles'])
+
+        # bulk_create не отправляет сигналы, поэтому производные данные пересчитываются целиком
+        if not options['skip_derived']:
+            self.step('Дневные сводки', rebuild_rollups)
+            self.step('Квантильные скетчи', rebuild_sketches, Rental.objects.all(), ArchivedRental.objects.all())
+            self.step('Сводка отзывов', reviews.rebuild_summary)
+            self.step('Поисковый индекс', search.rebuild_index)
+        invalidate_tags(*(tag_for(model) for model in (Article, PromoCode, BodyType, CarModel, CarPark, Vehicle)))
+        self.stdout.write('Индекс похожих отзывов не строится: при необходимости выполните rebuild_review_duplicates')
+
+    def step(self, title, func, *args):
+        started = time.perf_counter()
+        result = func(*args)
+        elapsed = time.perf_counter() - started
+        suffix = f': {result}' if isinstance(result, int) else ''
+        self.stdout.write(self.style.SUCCESS(f'{title}{suffix} ({elapsed:.1f} с)'))
+        return result
+
+    def bulk(self, model, objects):
+        model.objects.bulk_create(objects, batch_size=self.batch_size)
+        return len(objects)
+
+    def create_reference_data(self, options):
+        for name in BODY_TYPES:
+            BodyType.objects.get_or_create(name=name)
+        self.body_types = list(BodyType.objects.all())
+        for name, amount in PENALTY_TYPES:
+            PenaltyType.objects.get_or_create(name=name, defaults={'amount': amount})
+        self.penalty_types = list(PenaltyType.objects.values_list('id', 'amount'))
+
+        models = []
+        for brand, names in BRANDS.items():
+            for name in names:
+                car_model = CarModel.objects.filter(brand=brand, model=name).first()
+                if car_model is None:
+                    car_model = CarModel.objects.create(
+                        brand=brand, model=name, body_type=self.random.choice(self.body_types)
+                    )
+                models.append(car_model)
+        self.car_models = models
+        ranks = {brand: rank for rank, brand in enumerate(BRANDS, 1)}
+        self.car_model_weights = _cumulative(
+            1 / ranks[car_model.brand] ** BRAND_SKEW / len(BRANDS[car_model.brand]) for car_model in models
+        )
+
+    def create_users(self, count):
+        # Хеширование пароля намеренно медленное — считаем его один раз для всех пользователей
+        password = make_password('loadtest')
+        first_id = _next_id(User)
+        rng = self.random
+        users = [
+            User(
+                id=first_id + number,
+                username=f'load_user_{first_id + number}',
+                email=f'load_user_{first_id + number}@example.com',
+                password=password,
+                role='client',
+                first_name=rng.choice(FIRST_NAMES),
+                last_name=rng.choice(LAST_NAMES),
+                middle_name='',
+                phone=f'+37529{rng.randrange(10 ** 7):07d}',
+                address=f'г. Минск, ул. Нагрузочная, {rng.randrange(1, 200)}',
+            )
+            for number in range(count)
+        ]
+        self.bulk(User, users)
+        self.user_ids = list(User.objects.values_list('id', flat=True))
+        # Небольшая часть клиентов арендует намного чаще остальных
+        self.user_weights = _cumulative(1 / (rank + 1) ** 0.8 for rank in range(len(self.user_ids)))
+        return count
+
+    def create_vehicles(self, park_count, count):
+        rng = self.random
+        first_park = _next_id(CarPark)
+        self.bulk(CarPark, [
+            CarPark(id=first_park + number, name=f'Автопарк {first_park + number}',
+                    address=f'г. Минск, ул. Складская, {number + 1}')
+            for number in range(park_count)
+        ])
+        park_ids = list(CarPark.objects.values_list('id', flat=True))
+
+        first_id = _next_id(Vehicle)
+        car_models = rng.choices(self.car_models, cum_weights=self.car_model_weights, k=count)
+        vehicles = []
+        for number, car_model in enumerate(car_models):
+            premium = car_model.brand in ('BMW', 'Mercedes-Benz', 'Audi', 'Porsche', 'Volvo')
+            daily_price = rng.randrange(90, 250) if premium else rng.randrange(30, 90)
+            vehicles.append(Vehicle(
+                id=first_id + number,
+                license_plate=f'LD-{first_id + number:07d}',
+                car_model=car_model,
+                year=rng.randrange(2012, self.today.year + 1),
+                car_price=Decimal(daily_price * rng.randrange(250, 400)),
+                daily_rental_price=Decimal(daily_price),
+                car_park_id=rng.choice(park_ids),
+            ))
+        self.bulk(Vehicle, vehicles)
+        self.vehicles = list(Vehicle.objects.values_list('id', 'daily_rental_price'))
+        return count
+
+    def create_promo_codes(self, count):
+        rng = self.random
+        first_id = _next_id(PromoCode)
+        promo_codes = []
+        for number in range(count):
+            valid_from = self.today - timedelta(days=rng.randrange(0, 730))
+            promo_codes.append(PromoCode(
+                id=first_id + number,
+                code=f'LOAD{first_id + number}',
+                discount_percentage=Decimal(rng.choice([5, 10, 15, 20, 25, 30])),
+                valid_from=valid_from,
+                valid_to=valid_from + timedelta(days=rng.randrange(14, 120)),
+                max_uses=rng.randrange(50, 5000),
+            ))
+        self.bulk(PromoCode, promo_codes)
+        self.promo_codes = list(PromoCode.objects.values_list('id', 'discount_percentage'))
+        return count
+
+    def rental_status(self, expected_return_date):
+        roll = self.random.random()
+        if expected_return_date < self.today:
+            return 'returned' if roll < 0.88 else 'cancelled' if roll < 0.95 else 'overdue'
+        return 'active' if roll < 0.8 else 'pending'
+
+    def create_rentals(self, options):
+        rng = self.random
+        total = options['rentals']
+        days = [self.today - timedelta(days=offset) for offset in range(options['days'], 0, -1)]
+        # Спрос растет к настоящему времени и зависит от сезона
+        day_weights = _cumulative(
+            season_weight(day) * (1 + 0.5 * index / len(days)) for index, day in enumerate(days)
+        )
+        next_rental = _next_id(Rental)
+        next_penalty = _next_id(RentalPenalty)
+        now = timezone.now()
+
+        created = 0
+        while created < total:
+            size = min(options['chunk_size'], total - created)
+            rental_dates = rng.choices(days, cum_weights=day_weights, k=size)
+            user_ids = rng.choices(self.user_ids, cum_weights=self.user_weights, k=size)
+            rentals, penalties = [], []
+            for rental_date, user_id in zip(rental_dates, user_ids):
+                vehicle_id, daily_price = self.vehicles[rng.randrange(len(self.vehicles))]
+                rental_days = min(1 + int(rng.expovariate(1 / 3)), 30)
+                expected_return_date = rental_date + timedelta(days=rental_days)
+                status = self.rental_status(expected_return_date)
+
+                rental_cents = int(daily_price * CENTS) * rental_days
+                discount_cents, promo_code_id = 0, None
+                if self.promo_codes and rng.random() < options['promo_rate']:
+                    promo_code_id, percentage = self.promo_codes[rng.randrange(len(self.promo_codes))]
+                    discount_cents = rental_cents * int(percentage) // 100
+                total_cents = rental_cents - discount_cents
+
+                actual_return_date = None
+                if status == 'returned':
+                    actual_return_date = expected_return_date + timedelta(days=int(rng.expovariate(2)))
+                    if rng.random() < options['penalty_rate']:
+                        penalty_type_id, amount = self.penalty_types[rng.randrange(len(self.penalty_types))]
+                        total_cents += int(amount * CENTS)
+                        penalties.append((next_penalty, next_rental, penalty_type_id, actual_return_date, ''))
+                        next_penalty += 1
+
+                rentals.append((
+                    next_rental, vehicle_id, user_id, status, rental_date, rental_days, expected_return_date,
+                    actual_return_date, _money(rental_cents), promo_code_id, _money(discount_cents),
+                    _money(total_cents), '', status in ('active', 'pending'), now, now,
+                ))
+                next_rental += 1
+
+            insert_rows(Rental, RENTAL_FIELDS, rentals)
+            insert_rows(RentalPenalty, PENALTY_FIELDS, penalties)
+            created += size
+            self.stdout.write(f'  аренд: {created} из {total}')
+        return created
+
+    def create_reviews(self, count):
+        rng = self.random
+        ratings = rng.choices(range(1, 6), weights=RATING_WEIGHTS, k=count)
+        reviews_list = [
+            Review(
+                user_id=self.user_ids[rng.randrange(len(self.user_ids))],
+                text=' '.join(rng.sample(REVIEW_PHRASES, rng.randrange(2, 5))),
+                rating=rating,
+                approved=rng.random() < 0.85,
+            )
+            for rating in ratings
+        ]
+        return self.bulk(Review, reviews_list)
+
+    def create_articles(self, count):
+        rng = self.random
+        author = User.objects.filter(role__in=('staff', 'admin')).first() or User.objects.get(pk=self.user_ids[0])
+        now = timezone.now()
+        articles = []
+        for number in range(count):
+            published = rng.random() < 0.9
+            articles.append(Article(
+                title=f'Новости проката №{number + 1}',
+                summary='Новые автомобили, акции и изменения в работе офисов.',
+                content='<p>' + ' '.join(rng.sample(REVIEW_PHRASES, 3)) + '</p>',
+                author=author,
+                published=published,
+                published_at=now - timedelta(hours=rng.randrange(24 * 730)) if published else None,
+            ))
+        return self.bulk(Article, articles)
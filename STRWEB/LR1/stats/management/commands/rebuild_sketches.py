@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from rentals.models import ArchivedRental, Rental
+from stats.sketches import rebuild_sketches
+
+
+class Command(BaseCommand):
+    help = 'Строит квантильные скетчи сумм и длительностей заново по всей истории аренд'
+
+    def handle(self, *args, **options):
+        count = rebuild_sketches(Rental.objects.all(), ArchivedRental.objects.all())
+        self.stdout.write(self.style.SUCCESS(f'Скетчи пересчитаны: {count}'))
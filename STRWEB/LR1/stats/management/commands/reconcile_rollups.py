@@ -0,0 +1,24 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from stats.rollups import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает дневные сводки аренд по таблице Rental и архиву (запускается по ночам)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=None,
+            help='Пересчитать только последние N дней (по умолчанию — вся история)',
+        )
+
+    def handle(self, *args, **options):
+        date_from = None
+        if options['days'] is not None:
+            date_from = timezone.now().date() - timedelta(days=options['days'])
+
+        rows = rebuild_rollups(date_from=date_from)
+        self.stdout.write(self.style.SUCCESS(f'Сводки пересчитаны: {rows} строк'))
@@ -0,0 +1,46 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from IGI_Lab5.replica import REPLICA_ALIAS
+
+
+class Command(BaseCommand):
+    help = (
+        'Копирует основную БД SQLite в файл реплики через backup API '
+        '(реплика включается переменной окружения DATABASE_REPLICA)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target', help='Файл реплики (по умолчанию — из DATABASES["replica"])')
+        parser.add_argument(
+            '--interval', type=float, default=0,
+            help='Обновлять каждые N секунд, пока команду не остановят (0 — один раз)',
+        )
+
+    def handle(self, *args, **options):
+        target = options['target'] or settings.DATABASES.get(REPLICA_ALIAS, {}).get('NAME')
+        if not target:
+            raise CommandError('Реплика не настроена: задайте DATABASE_REPLICA или --target')
+        if connections['default'].vendor != 'sqlite':
+            raise CommandError('Копирование через backup API возможно только для SQLite')
+
+        while True:
+            started = time.perf_counter()
+            self.refresh(str(target))
+            self.stdout.write(f'Реплика {target} обновлена за {time.perf_counter() - started:.2f} с')
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
+
+    def refresh(self, target):
+        source = connections['default']
+        source.ensure_connection()
+        # Копия согласована на момент начала: в режиме WAL запись в основную БД при этом не блокируется.
+        # Читатели реплики ждут окончания копирования (busy_timeout), а не получают половину страниц
+        with sqlite3.connect(target, timeout=30) as replica:
+            source.connection.backup(replica)
+        replica.close()
@@ -0,0 +1,97 @@
+import asyncio
+import json
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+
+from stats import loadtest
+
+User = get_user_model()
+
+# Эталон снят на БД после generate_load_data с параметрами по умолчанию, сервер — runserver
+BASELINE = Path(__file__).resolve().parents[2] / 'baselines' / 'loadtest.json'
+PASSWORD = 'loadtest-pass'
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный тест по сценариям пользователей против запущенного сервера '
+        '(runserver или ASGI); сравнивает результат с эталоном'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000')
+        parser.add_argument('--clients', type=int, default=8, help='Число виртуальных клиентов')
+        parser.add_argument('--staff', type=int, default=2, help='Число виртуальных сотрудников')
+        parser.add_argument('--duration', type=float, default=60, help='Длительность теста в секундах')
+        parser.add_argument(
+            '--iterations', type=int, default=None,
+            help='Сколько раз каждый пользователь проходит сценарий (по умолчанию — до конца --duration)',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--baseline', default=str(BASELINE), help='Файл эталона')
+        parser.add_argument('--save-baseline', action='store_true', help='Сохранить результат как эталон')
+        parser.add_argument('--compare', action='store_true', help='Сравнить результат с эталоном')
+        parser.add_argument(
+            '--tolerance', type=float, default=0.2,
+            help='Допустимое ухудшение p95 и пропускной способности (доля)',
+        )
+        parser.add_argument('--output', help='Сохранить отчет в файл')
+
+    def handle(self, *args, **options):
+        clients = self.prepare_users('loadtest_client', options['clients'], role='client')
+        staff = self.prepare_users('loadtest_staff', options['staff'], role='staff')
+
+        report = asyncio.run(loadtest.run(
+            options['base_url'], clients, staff, options['duration'],
+            iterations=options['iterations'], seed=options['seed'],
+        ))
+        report['config'] = {key: options[key] for key in ('clients', 'staff', 'duration', 'iterations', 'seed')}
+        self.print_report(report)
+
+        if options['output']:
+            self.write(options['output'], report)
+        if options['save_baseline']:
+            self.write(options['baseline'], report)
+            self.stdout.write(self.style.SUCCESS(f"Эталон сохранен: {options['baseline']}"))
+        if options['compare']:
+            try:
+                with open(options['baseline'], encoding='utf-8') as file:
+                    baseline = json.load(file)
+            except FileNotFoundError:
+                raise CommandError(f"Нет файла эталона {options['baseline']}")
+            regressions = loadtest.compare(report, baseline, options['tolerance'])
+            if regressions:
+                raise CommandError('Ухудшение относительно эталона:\n' + '\n'.join(regressions))
+            self.stdout.write(self.style.SUCCESS('Результат не хуже эталона'))
+
+    def prepare_users(self, prefix, count, role):
+        """Учетные записи виртуальных пользователей с известным паролем"""
+        password = make_password(PASSWORD)
+        users = []
+        for number in range(count):
+            username = f'{prefix}{number}'
+            User.objects.update_or_create(
+                username=username,
+                defaults={'password': password, 'role': role, 'email': f'{username}@example.com'},
+            )
+            users.append((username, PASSWORD))
+        return users
+
+    def write(self, path, report):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+            file.write('\n')
+
+    def print_report(self, report):
+        header = f"{'Шаг':32} {'запросов':>9} {'ошибок':>7} {'RPS':>8} {'p50, мс':>9} {'p95, мс':>9} {'p99, мс':>9}"
+        self.stdout.write(header)
+        rows = list(report['steps'].items()) + [('ВСЕГО', report['total'])]
+        for step, values in rows:
+            self.stdout.write(
+                f"{step:32} {values['requests']:>9} {values['errors']:>7} {values['throughput_rps']:>8} "
+                f"{values['p50_ms']:>9} {values['p95_ms']:>9} {values['p99_ms']:>9}"
+            )
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.4 on 2026-10-19 02:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from stats.rollups import build_rollups, penalty_groups, rental_groups
+
+
+def fill_rollups(apps, schema_editor):
+    Rental = apps.get_model('rentals', 'Rental')
+    RentalPenalty = apps.get_model('rentals', 'RentalPenalty')
+    DailyRentalRollup = apps.get_model('stats', 'DailyRentalRollup')
+    rows = build_rollups(
+        rental_groups(Rental.objects.all()), penalty_groups(RentalPenalty.objects.all()), DailyRentalRollup
+    )
+    DailyRentalRollup.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('rentals', '0001_initial'),
+        ('vehicles', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyRentalRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Дата выдачи')),
+                ('brand', models.CharField(max_length=100, verbose_name='Марка')),
+                ('status', models.CharField(max_length=20, verbose_name='Статус')),
+                ('rental_count', models.IntegerField(default=0, verbose_name='Количество аренд')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Выручка')),
+                ('discount_sum', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Сумма скидок')),
+                ('penalty_sum', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Сумма штрафов')),
+                ('car_park', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rental_rollups', to='vehicles.carpark', verbose_name='Автопарк')),
+            ],
+            options={
+                'verbose_name': 'Дневная сводка аренд',
+                'verbose_name_plural': 'Дневные сводки аренд',
+                'ordering': ['date'],
+                'constraints': [models.UniqueConstraint(fields=('date', 'brand', 'car_park', 'status'), name='unique_daily_rental_rollup')],
+            },
+        ),
+        migrations.RunPython(fill_rollups, migrations.RunPython.noop),
+    ]
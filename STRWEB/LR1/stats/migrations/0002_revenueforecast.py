@@ -0,0 +1,33 @@
+# Generated by Django 5.2.4 on 2026-10-19 02:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stats', '0001_initial'),
+        ('vehicles', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RevenueForecast',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('target_date', models.DateField(verbose_name='Дата прогноза')),
+                ('brand', models.CharField(max_length=100, verbose_name='Марка')),
+                ('revenue', models.DecimalField(decimal_places=2, max_digits=14, verbose_name='Ожидаемая выручка')),
+                ('rental_count', models.FloatField(verbose_name='Ожидаемое количество аренд')),
+                ('generated_at', models.DateTimeField(verbose_name='Дата расчета')),
+                ('car_park', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='revenue_forecasts', to='vehicles.carpark', verbose_name='Автопарк')),
+            ],
+            options={
+                'verbose_name': 'Прогноз выручки',
+                'verbose_name_plural': 'Прогнозы выручки',
+                'ordering': ['target_date'],
+                'constraints': [models.UniqueConstraint(fields=('target_date', 'brand', 'car_park'), name='unique_revenue_forecast')],
+            },
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.4 on 2026-10-19 02:16
+
+from django.db import migrations, models
+
+from stats.sketches import rebuild_sketches
+
+
+def fill_sketches(apps, schema_editor):
+    rebuild_sketches(
+        apps.get_model('rentals', 'Rental').objects.all(), model=apps.get_model('stats', 'QuantileSketch'),
+        pending_model=None,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rentals', '0001_initial'),
+        ('stats', '0002_revenueforecast'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuantileSketch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('metric', models.CharField(choices=[('total_amount', 'Итоговая сумма'), ('rental_days', 'Количество дней'), ('duration', 'Фактическая длительность')], max_length=20, verbose_name='Метрика')),
+                ('dimension', models.CharField(choices=[('all', 'Все аренды'), ('brand', 'Марка'), ('car_park', 'Автопарк')], max_length=20, verbose_name='Разрез')),
+                ('key', models.CharField(blank=True, max_length=100, verbose_name='Значение разреза')),
+                ('data', models.JSONField(default=dict, verbose_name='Данные скетча')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='Количество значений')),
+                ('p50', models.FloatField(blank=True, null=True, verbose_name='Медиана')),
+                ('p90', models.FloatField(blank=True, null=True, verbose_name='90-й перцентиль')),
+                ('p99', models.FloatField(blank=True, null=True, verbose_name='99-й перцентиль')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата обновления')),
+            ],
+            options={
+                'verbose_name': 'Квантильный скетч',
+                'verbose_name_plural': 'Квантильные скетчи',
+                'ordering': ['metric', 'dimension', 'key'],
+                'constraints': [models.UniqueConstraint(fields=('metric', 'dimension', 'key'), name='unique_quantile_sketch')],
+            },
+        ),
+        migrations.RunPython(fill_sketches, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.4 on 2026-10-19 04:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stats', '0003_quantilesketch'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PendingSketchValue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('metric', models.CharField(choices=[('total_amount', 'Итоговая сумма'), ('rental_days', 'Количество дней'), ('duration', 'Фактическая длительность')], max_length=20, verbose_name='Метрика')),
+                ('dimension', models.CharField(choices=[('all', 'Все аренды'), ('brand', 'Марка'), ('car_park', 'Автопарк')], max_length=20, verbose_name='Разрез')),
+                ('key', models.CharField(blank=True, max_length=100, verbose_name='Значение разреза')),
+                ('value', models.FloatField(verbose_name='Значение')),
+            ],
+            options={
+                'verbose_name': 'Значение для скетча',
+                'verbose_name_plural': 'Значения для скетчей',
+            },
+        ),
+    ]
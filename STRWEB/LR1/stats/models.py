@@ -1,3 +1,94 @@
 from django.db import models
 
-# Create your models here.
+from vehicles.models import CarPark
+
+
+class DailyRentalRollup(models.Model):
+    """Pre-aggregated rental figures per day, brand, car park and status"""
+    date = models.DateField(verbose_name='Дата выдачи')
+    brand = models.CharField(max_length=100, verbose_name='Марка')
+    car_park = models.ForeignKey(CarPark, on_delete=models.CASCADE, related_name='rental_rollups', verbose_name='Автопарк')
+    status = models.CharField(max_length=20, verbose_name='Статус')
+    rental_count = models.IntegerField(default=0, verbose_name='Количество аренд')
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name='Выручка')
+    discount_sum = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name='Сумма скидок')
+    penalty_sum = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name='Сумма штрафов')
+
+    class Meta:
+        verbose_name = 'Дневная сводка аренд'
+        verbose_name_plural = 'Дневные сводки аренд'
+        ordering = ['date']
+        constraints = [
+            models.UniqueConstraint(fields=['date', 'brand', 'car_park', 'status'], name='unique_daily_rental_rollup'),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.brand} / {self.car_park_id} / {self.status}: {self.rental_count}"
+
+
+class RevenueForecast(models.Model):
+    """Прогноз выручки и количества аренд на день по марке и автопарку"""
+    target_date = models.DateField(verbose_name='Дата прогноза')
+    brand = models.CharField(max_length=100, verbose_name='Марка')
+    car_park = models.ForeignKey(CarPark, on_delete=models.CASCADE, related_name='revenue_forecasts', verbose_name='Автопарк')
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, verbose_name='Ожидаемая выручка')
+    rental_count = models.FloatField(verbose_name='Ожидаемое количество аренд')
+    generated_at = models.DateTimeField(verbose_name='Дата расчета')
+
+    class Meta:
+        verbose_name = 'Прогноз выручки'
+        verbose_name_plural = 'Прогнозы выручки'
+        ordering = ['target_date']
+        constraints = [
+            models.UniqueConstraint(fields=['target_date', 'brand', 'car_park'], name='unique_revenue_forecast'),
+        ]
+
+    def __str__(self):
+        return f"{self.target_date} {self.brand} / {self.car_park_id}: {self.revenue}"
+
+
+class QuantileSketch(models.Model):
+    """Сохраненный KLL-скетч распределения метрики аренд (см. stats.sketches)"""
+    METRIC_CHOICES = (
+        ('total_amount', 'Итоговая сумма'),
+        ('rental_days', 'Количество дней'),
+        ('duration', 'Фактическая длительность'),
+    )
+    DIMENSION_CHOICES = (
+        ('all', 'Все аренды'),
+        ('brand', 'Марка'),
+        ('car_park', 'Автопарк'),
+    )
+
+    metric = models.CharField(max_length=20, choices=METRIC_CHOICES, verbose_name='Метрика')
+    dimension = models.CharField(max_length=20, choices=DIMENSION_CHOICES, verbose_name='Разрез')
+    key = models.CharField(max_length=100, blank=True, verbose_name='Значение разреза')
+    data = models.JSONField(default=dict, verbose_name='Данные скетча')
+    count = models.PositiveIntegerField(default=0, verbose_name='Количество значений')
+    p50 = models.FloatField(null=True, blank=True, verbose_name='Медиана')
+    p90 = models.FloatField(null=True, blank=True, verbose_name='90-й перцентиль')
+    p99 = models.FloatField(null=True, blank=True, verbose_name='99-й перцентиль')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Дата обновления')
+
+    class Meta:
+        verbose_name = 'Квантильный скетч'
+        verbose_name_plural = 'Квантильные скетчи'
+        ordering = ['metric', 'dimension', 'key']
+        constraints = [
+            models.UniqueConstraint(fields=['metric', 'dimension', 'key'], name='unique_quantile_sketch'),
+        ]
+
+    def __str__(self):
+        return f"{self.metric} / {self.dimension} {self.key}: n={self.count}"
+
+
+class PendingSketchValue(models.Model):
+    """Значение метрики, еще не добавленное в скетч (скетчи пополняются пачками, см. stats.sketches)"""
+    metric = models.CharField(max_length=20, choices=QuantileSketch.METRIC_CHOICES, verbose_name='Метрика')
+    dimension = models.CharField(max_length=20, choices=QuantileSketch.DIMENSION_CHOICES, verbose_name='Разрез')
+    key = models.CharField(max_length=100, blank=True, verbose_name='Значение разреза')
+    value = models.FloatField(verbose_name='Значение')
+
+    class Meta:
+        verbose_name = 'Значение для скетча'
+        verbose_name_plural = 'Значения для скетчей'
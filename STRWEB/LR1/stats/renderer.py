@@ -0,0 +1,73 @@
+"""
+Пул процессов для отрисовки графиков дашборда.
+
+Matplotlib загружается только в процессах пула, поэтому веб-воркеры не тратят
+на него время запуска и память. Пул создается при первом открытии дашборда.
+При STATS_RENDERER_WORKERS = 0 графики рисуются в текущем процессе.
+"""
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _worker_count():
+    return getattr(settings, 'STATS_RENDERER_WORKERS', 2)
+
+
+def get_pool():
+    """Возвращает пул рендеринга, создавая и прогревая его при первом обращении"""
+    global _pool
+    workers = _worker_count()
+    if workers <= 0:
+        return None
+
+    with _pool_lock:
+        if _pool is None:
+            from stats import charts
+
+            # spawn: дочерние процессы не наследуют потоки и соединения с БД веб-воркера
+            _pool = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context('spawn')
+            )
+            for _ in range(workers):
+                _pool.submit(charts.warm_up)
+            logger.info("Chart renderer pool started with %s workers", workers)
+        return _pool
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True)
+            _pool = None
+
+
+def render_charts(specs):
+    """
+    Отрисовывает набор графиков параллельно.
+
+    specs — словарь {имя: (вид графика, аргументы)}, результат — {имя: PNG в base64}.
+    """
+    from stats import charts
+
+    pool = get_pool()
+    if pool is None:
+        return {name: charts.render(kind, args) for name, (kind, args) in specs.items()}
+
+    try:
+        futures = {name: pool.submit(charts.render, kind, args) for name, (kind, args) in specs.items()}
+        return {name: future.result() for name, future in futures.items()}
+    except BrokenProcessPool:
+        logger.exception("Chart renderer pool is broken, rendering in-process")
+        shutdown_pool()
+        return {name: charts.render(kind, args) for name, (kind, args) in specs.items()}
@@ -0,0 +1,152 @@
+from collections import namedtuple
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+
+from rentals.archive import union_archive
+from rentals.models import Rental, RentalPenalty
+from stats.models import DailyRentalRollup
+
+ZERO = Decimal('0.00')
+
+# Вклад одной аренды в строку сводки: ключ + значения, которые она добавляет
+Contribution = namedtuple('Contribution', 'date brand car_park_id status rental_count revenue discount_sum penalty_sum')
+
+
+def rental_contribution(rental, with_penalties=True):
+    """
+    Вычисляет вклад аренды в дневную сводку по текущему состоянию в БД;
+    with_penalties=False — у только что созданной аренды штрафов еще нет.
+    """
+    penalty_sum = ZERO
+    if rental.pk and with_penalties:
+        penalty_sum = RentalPenalty.objects.filter(rental_id=rental.pk).aggregate(
+            total=Sum('penalty_type__amount')
+        )['total'] or ZERO
+
+    return Contribution(
+        date=rental.rental_date,
+        brand=rental.vehicle.car_model.brand,
+        car_park_id=rental.vehicle.car_park_id,
+        status=rental.status,
+        rental_count=1,
+        revenue=rental.total_amount or ZERO,
+        discount_sum=rental.discount_amount or ZERO,
+        penalty_sum=penalty_sum,
+    )
+
+
+def apply_delta(date, brand, car_park_id, status, rental_count=0, revenue=ZERO, discount_sum=ZERO, penalty_sum=ZERO):
+    """Атомарно прибавляет приращение к строке сводки, создавая её при необходимости"""
+    if not (rental_count or revenue or discount_sum or penalty_sum):
+        return
+
+    key = {'date': date, 'brand': brand, 'car_park_id': car_park_id, 'status': status}
+    # Обычно строка уже есть, и хватает одного UPDATE; вставка — только для нового ключа
+    if _increment(key, rental_count, revenue, discount_sum, penalty_sum):
+        return
+    try:
+        with transaction.atomic():
+            DailyRentalRollup.objects.create(
+                **key, rental_count=rental_count, revenue=revenue, discount_sum=discount_sum, penalty_sum=penalty_sum,
+            )
+    except IntegrityError:
+        # Строку успел создать параллельный запрос
+        _increment(key, rental_count, revenue, discount_sum, penalty_sum)
+
+
+def _increment(key, rental_count, revenue, discount_sum, penalty_sum):
+    return DailyRentalRollup.objects.filter(**key).update(
+        rental_count=F('rental_count') + rental_count,
+        revenue=F('revenue') + revenue,
+        discount_sum=F('discount_sum') + discount_sum,
+        penalty_sum=F('penalty_sum') + penalty_sum,
+    )
+
+
+def add_contribution(contribution, sign=1):
+    apply_delta(
+        contribution.date,
+        contribution.brand,
+        contribution.car_park_id,
+        contribution.status,
+        rental_count=sign * contribution.rental_count,
+        revenue=sign * contribution.revenue,
+        discount_sum=sign * contribution.discount_sum,
+        penalty_sum=sign * contribution.penalty_sum,
+    )
+
+
+def move_contribution(old, new):
+    """Переносит вклад аренды из старой строки сводки в новую"""
+    if old == new:
+        return
+    if old is not None:
+        add_contribution(old, sign=-1)
+    if new is not None:
+        add_contribution(new)
+
+
+def rental_groups(queryset):
+    """Аренды, сгруппированные по ключу сводки (работает и с историческими моделями миграций)"""
+    return queryset.values_list(
+        'rental_date', 'vehicle__car_model__brand', 'vehicle__car_park', 'status'
+    ).annotate(count=Count('id'), revenue=Sum('total_amount'), discount=Sum('discount_amount')).order_by()
+
+
+def penalty_groups(queryset):
+    return queryset.values_list(
+        'rental__rental_date', 'rental__vehicle__car_model__brand', 'rental__vehicle__car_park', 'rental__status'
+    ).annotate(total=Sum('penalty_type__amount')).order_by()
+
+
+def build_rollups(rentals, penalties, model=DailyRentalRollup):
+    """Строки сводки (несохраненные объекты model) по группам аренд и штрафов"""
+    # Группы рабочей таблицы и архива могут совпасть — их значения складываются
+    rows = {}
+    for *key, count, revenue, discount in rentals:
+        key = tuple(key)
+        row = rows.setdefault(key, model(
+            date=key[0], brand=key[1], car_park_id=key[2], status=key[3],
+            rental_count=0, revenue=ZERO, discount_sum=ZERO, penalty_sum=ZERO,
+        ))
+        row.rental_count += count
+        row.revenue += revenue or ZERO
+        row.discount_sum += discount or ZERO
+
+    for *key, total in penalties:
+        key = tuple(key)
+        if key in rows:
+            rows[key].penalty_sum += total or ZERO
+    return list(rows.values())
+
+
+def rebuild_rollups(date_from=None, date_to=None):
+    """Пересчитывает сводки по прокатам (рабочая таблица и архив) за указанный период"""
+    def rentals(queryset):
+        if date_from:
+            queryset = queryset.filter(rental_date__gte=date_from)
+        if date_to:
+            queryset = queryset.filter(rental_date__lte=date_to)
+        return rental_groups(queryset)
+
+    def penalties(queryset):
+        if date_from:
+            queryset = queryset.filter(rental__rental_date__gte=date_from)
+        if date_to:
+            queryset = queryset.filter(rental__rental_date__lte=date_to)
+        return penalty_groups(queryset)
+
+    rows = build_rollups(union_archive(Rental, rentals), union_archive(RentalPenalty, penalties))
+
+    with transaction.atomic():
+        stale = DailyRentalRollup.objects.all()
+        if date_from:
+            stale = stale.filter(date__gte=date_from)
+        if date_to:
+            stale = stale.filter(date__lte=date_to)
+        stale.delete()
+        DailyRentalRollup.objects.bulk_create(rows, batch_size=1000)
+
+    return len(rows)
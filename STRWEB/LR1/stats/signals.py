@@ -0,0 +1,88 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from rentals import archive
+from rentals.models import Rental, RentalPenalty
+from stats import sketches
+from stats.rollups import ZERO, apply_delta, add_contribution, move_contribution, rental_contribution
+
+
+def _current_rental(rental_id):
+    return Rental.objects.select_related('vehicle__car_model').filter(pk=rental_id).first()
+
+
+@receiver(pre_save, sender=Rental)
+def remember_rental_contribution(sender, instance, raw=False, **kwargs):
+    """Запоминает вклад аренды до изменения, чтобы потом записать только разницу"""
+    instance._rollup_previous = None
+    if raw or not instance.pk:
+        return
+    previous = _current_rental(instance.pk)
+    if previous is not None:
+        instance._rollup_previous = rental_contribution(previous)
+
+
+@receiver(post_save, sender=Rental)
+def update_rollup_on_rental_save(sender, instance, created=False, raw=False, **kwargs):
+    if raw:
+        return
+    move_contribution(
+        getattr(instance, '_rollup_previous', None), rental_contribution(instance, with_penalties=not created)
+    )
+
+
+@receiver(post_save, sender=Rental)
+def update_sketches_on_rental_save(sender, instance, created=False, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        sketches.record_created(instance)
+
+    previous = getattr(instance, '_rollup_previous', None)
+    was_returned = previous is not None and previous.status == 'returned'
+    if instance.status == 'returned' and not was_returned:
+        sketches.record_returned(instance, previous.revenue if previous is not None else instance.total_amount)
+
+
+@receiver(post_delete, sender=Rental)
+def update_rollup_on_rental_delete(sender, instance, **kwargs):
+    # При переносе в архив прокат остается в истории и в сводках
+    if archive.is_archiving():
+        return
+    # Штрафы к этому моменту уже удалены каскадом и вычтены своими обработчиками
+    add_contribution(rental_contribution(instance), sign=-1)
+
+
+@receiver(pre_save, sender=RentalPenalty)
+def remember_penalty_amount(sender, instance, raw=False, **kwargs):
+    instance._rollup_previous_amount = ZERO
+    if raw or not instance.pk:
+        return
+    previous = RentalPenalty.objects.select_related('penalty_type').filter(pk=instance.pk).first()
+    if previous is not None:
+        instance._rollup_previous_amount = previous.penalty_type.amount
+
+
+def _apply_penalty_delta(rental_id, amount):
+    rental = _current_rental(rental_id)
+    if rental is None:
+        return
+    apply_delta(
+        rental.rental_date, rental.vehicle.car_model.brand, rental.vehicle.car_park_id, rental.status,
+        penalty_sum=amount,
+    )
+
+
+@receiver(post_save, sender=RentalPenalty)
+def update_rollup_on_penalty_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    delta = instance.penalty_type.amount - getattr(instance, '_rollup_previous_amount', ZERO)
+    _apply_penalty_delta(instance.rental_id, delta)
+
+
+@receiver(post_delete, sender=RentalPenalty)
+def update_rollup_on_penalty_delete(sender, instance, **kwargs):
+    if archive.is_archiving():
+        return
+    _apply_penalty_delta(instance.rental_id, -instance.penalty_type.amount)
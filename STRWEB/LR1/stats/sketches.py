@@ -0,0 +1,236 @@
+"""
+Приближенные квантили сумм и длительностей аренд.
+
+KllSketch — сливаемый KLL-скетч (Karnin, Lang, Liberty): хранит O(k log n)
+значений и дает ранговую ошибку порядка 1/k. Скетчи по всем арендам, маркам и
+автопаркам хранятся в таблице QuantileSketch, поэтому панель перцентилей не
+сортирует историю. При создании и возврате аренды значения только вставляются
+в PendingSketchValue, а в скетчи добавляются пачками после коммита — транзакция
+оформления заказа не читает и не переписывает скетчи.
+"""
+import math
+import random
+from itertools import chain
+
+from django.db import transaction
+
+from IGI_Lab5.replica import primary_reads
+from stats.models import PendingSketchValue, QuantileSketch
+
+DEFAULT_K = 200
+PANEL_QUANTILES = {'p50': 0.5, 'p90': 0.9, 'p99': 0.99}
+REBUILD_BATCH_SIZE = 10000
+# Сколько отложенных значений процесс накапливает до слияния со скетчами
+MERGE_BATCH_SIZE = 200
+
+_recorded = 0
+
+
+class KllSketch:
+    def __init__(self, k=DEFAULT_K, compactors=None, n=0):
+        self.k = k
+        self.compactors = compactors or [[]]
+        self.n = n
+        self._random = random.Random()
+
+    def _capacity(self, level):
+        height = len(self.compactors)
+        return max(2, int(math.ceil(self.k * (2 / 3) ** (height - level - 1))))
+
+    def _compress(self):
+        while sum(map(len, self.compactors)) > sum(self._capacity(h) for h in range(len(self.compactors))):
+            for level, items in enumerate(self.compactors):
+                if len(items) >= self._capacity(level):
+                    break
+            if level + 1 == len(self.compactors):
+                self.compactors.append([])
+            items.sort()
+            # При нечетном количестве одно значение остается на текущем уровне
+            leftover = [items.pop()] if len(items) % 2 else []
+            offset = self._random.getrandbits(1)
+            self.compactors[level + 1].extend(items[offset::2])
+            self.compactors[level] = leftover
+
+    def update(self, value):
+        self.compactors[0].append(float(value))
+        self.n += 1
+        self._compress()
+
+    def extend(self, values):
+        """Добавляет пачку значений и сжимает скетч один раз (быстрее, чем update для каждого)"""
+        values = [float(value) for value in values]
+        self.compactors[0].extend(values)
+        self.n += len(values)
+        self._compress()
+
+    def merge(self, other):
+        """Сливает другой скетч в текущий (результат — скетч объединения потоков)"""
+        while len(self.compactors) < len(other.compactors):
+            self.compactors.append([])
+        for level, items in enumerate(other.compactors):
+            self.compactors[level].extend(items)
+        self.n += other.n
+        self._compress()
+        return self
+
+    def quantile(self, q):
+        weighted = sorted(
+            (value, 2 ** level) for level, items in enumerate(self.compactors) for value in items
+        )
+        if not weighted:
+            return None
+        total = sum(weight for _, weight in weighted)
+        target = q * total
+        cumulative = 0
+        for value, weight in weighted:
+            cumulative += weight
+            if cumulative >= target:
+                return value
+        return weighted[-1][0]
+
+    def to_dict(self):
+        return {'k': self.k, 'n': self.n, 'compactors': self.compactors}
+
+    @classmethod
+    def from_dict(cls, data):
+        if not data:
+            return cls()
+        return cls(k=data['k'], compactors=[list(items) for items in data['compactors']], n=data['n'])
+
+
+def _keys(brand, car_park_id):
+    return [('all', ''), ('brand', brand), ('car_park', str(car_park_id))]
+
+
+def sketch_keys(rental):
+    """Разрезы, в которые попадает аренда"""
+    return _keys(rental.vehicle.car_model.brand, rental.vehicle.car_park_id)
+
+
+def _store(row, sketch):
+    row.data = sketch.to_dict()
+    row.count = sketch.n
+    for field, q in PANEL_QUANTILES.items():
+        setattr(row, field, sketch.quantile(q))
+    row.save()
+
+
+def record_values(values):
+    """
+    Откладывает значения [(метрика, разрезы, значение)] одной вставкой; в скетчи они
+    добавляются пачкой (merge_pending) после MERGE_BATCH_SIZE значений в процессе.
+    """
+    rows = [
+        PendingSketchValue(metric=metric, dimension=dimension, key=key, value=float(value))
+        for metric, keys, value in values
+        for dimension, key in keys
+    ]
+    PendingSketchValue.objects.bulk_create(rows)
+    transaction.on_commit(lambda: _count_recorded(len(rows)))
+
+
+def _count_recorded(count):
+    global _recorded
+    _recorded += count
+    if _recorded >= MERGE_BATCH_SIZE:
+        _recorded = 0
+        merge_pending()
+
+
+def merge_pending():
+    """Добавляет отложенные значения в скетчи: одно обновление на скетч, а не на значение"""
+    with primary_reads(), transaction.atomic():
+        pending = list(
+            PendingSketchValue.objects.select_for_update().values_list('pk', 'metric', 'dimension', 'key', 'value')
+        )
+        if not pending:
+            return 0
+        grouped = {}
+        for _, metric, dimension, key, value in pending:
+            grouped.setdefault((metric, dimension, key), []).append(value)
+        rows = {(row.metric, row.dimension, row.key): row for row in QuantileSketch.objects.select_for_update()}
+        for (metric, dimension, key), values in grouped.items():
+            row = rows.get((metric, dimension, key)) or QuantileSketch(metric=metric, dimension=dimension, key=key)
+            sketch = KllSketch.from_dict(row.data)
+            sketch.extend(values)
+            _store(row, sketch)
+        ids = [pk for pk, *_ in pending]
+        for start in range(0, len(ids), 500):
+            PendingSketchValue.objects.filter(pk__in=ids[start:start + 500]).delete()
+    return len(pending)
+
+
+def _duration(rental_date, actual_return_date):
+    if rental_date and actual_return_date:
+        return (actual_return_date - rental_date).days
+    return None
+
+
+def rental_duration(rental):
+    return _duration(rental.rental_date, rental.actual_return_date)
+
+
+def record_created(rental):
+    keys = sketch_keys(rental)
+    record_values([('total_amount', keys, rental.total_amount), ('rental_days', keys, rental.rental_days)])
+
+
+def record_returned(rental, previous_amount):
+    """
+    Длительность возвращенной аренды; сумма записывается еще раз, если возврат ее изменил
+    (штрафы). Прежняя сумма остается в скетче до rebuild_sketches: KLL не умеет удалять значения.
+    """
+    keys = sketch_keys(rental)
+    values = []
+    duration = rental_duration(rental)
+    if duration is not None:
+        values.append(('duration', keys, duration))
+    if rental.total_amount != previous_amount:
+        values.append(('total_amount', keys, rental.total_amount))
+    if values:
+        record_values(values)
+
+
+def rebuild_sketches(*querysets, model=QuantileSketch, pending_model=PendingSketchValue):
+    """
+    Строит все скетчи заново по переданным арендам (например, по рабочей таблице и архиву);
+    model и pending_model — модели скетчей и отложенных значений (в миграции — исторические).
+    """
+    sketches = {}
+    # Значения копятся по ключам и добавляются в скетч пачками по REBUILD_BATCH_SIZE
+    pending = {}
+
+    def add(metric, keys, value):
+        for dimension, key in keys:
+            values = pending.setdefault((metric, dimension, key), [])
+            values.append(value)
+            if len(values) >= REBUILD_BATCH_SIZE:
+                flush((metric, dimension, key))
+
+    def flush(sketch_key):
+        sketches.setdefault(sketch_key, KllSketch()).extend(pending.pop(sketch_key))
+
+    # Кортежи вместо объектов: создание трех моделей на аренду заняло бы большую часть времени
+    fields = (
+        'vehicle__car_model__brand', 'vehicle__car_park_id', 'total_amount', 'rental_days',
+        'rental_date', 'actual_return_date',
+    )
+    rows = chain.from_iterable(queryset.values_list(*fields).iterator() for queryset in querysets)
+    for brand, car_park_id, total_amount, rental_days, rental_date, actual_return_date in rows:
+        keys = _keys(brand, car_park_id)
+        add('total_amount', keys, total_amount)
+        add('rental_days', keys, rental_days)
+        duration = _duration(rental_date, actual_return_date)
+        if duration is not None:
+            add('duration', keys, duration)
+    for sketch_key in list(pending):
+        flush(sketch_key)
+
+    with transaction.atomic():
+        # Отложенные значения уже учтены: скетчи строятся по самим арендам
+        if pending_model is not None:
+            pending_model.objects.all().delete()
+        model.objects.all().delete()
+        for (metric, dimension, key), sketch in sketches.items():
+            _store(model(metric=metric, dimension=dimension, key=key), sketch)
+    return len(sketches)
@@ -1,3 +1,592 @@
-from django.test import TestCase
+import base64
+import os
+import random
+import sqlite3
+from datetime import date, timedelta
+from decimal import Decimal
+import tempfile
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from stats.management.commands import benchmark_db
+from IGI_Lab5.testing import QueryBudgetMixin
+from rentals.models import ArchivedRental, ArchivedRentalPenalty, PenaltyType, Rental, RentalPenalty
+from stats import analytics, renderer, sketches
+from stats.forecasting import build_forecast
+from content.models import Review
+from stats.models import DailyRentalRollup, PendingSketchValue, QuantileSketch, RevenueForecast
+from stats.rollups import rebuild_rollups
+from stats.sketches import KllSketch
+from vehicles.models import BodyType, CarModel, CarPark, Vehicle
+
+User = get_user_model()
+
+
+class StatsTestDataMixin:
+    """Общие тестовые данные для статистики"""
+
+    def create_test_data(self):
+        self.staff_user = User.objects.create_user(
+            username='staffuser',
+            password='staffpass',
+            email='staff@example.com',
+            role='staff',
+            last_name='Сотрудник',
+            first_name='Сотрудник',
+            middle_name='Сотрудникович',
+            phone='+375297584934',
+            address='ул. Тестовая, 123'
+        )
+        self.client_user = User.objects.create_user(
+            username='clientuser',
+            password='clientpass',
+            email='client@example.com',
+            role='client',
+            last_name='Клиентов',
+            first_name='Клиент',
+            middle_name='Клиентович',
+            phone='+375297582942',
+            address='ул. Пользовательская, 456'
+        )
+        body_type = BodyType.objects.create(name='Седан')
+        self.car_park = CarPark.objects.create(name='Центральный автопарк', address='ул. Примерная, 123')
+        self.toyota = Vehicle.objects.create(
+            license_plate='А123БВ456',
+            car_model=CarModel.objects.create(brand='Toyota', model='Camry', body_type=body_type),
+            year=2021,
+            car_price=Decimal('1500000.00'),
+            daily_rental_price=Decimal('100.00'),
+            car_park=self.car_park,
+        )
+        self.honda = Vehicle.objects.create(
+            license_plate='В789ГД012',
+            car_model=CarModel.objects.create(brand='Honda', model='Civic', body_type=body_type),
+            year=2020,
+            car_price=Decimal('1200000.00'),
+            daily_rental_price=Decimal('50.00'),
+            car_park=self.car_park,
+        )
+        self.penalty_type = PenaltyType.objects.create(name='Царапина', amount=Decimal('30.00'))
+
+    def create_rental(self, vehicle, rental_days=2, rental_date=date(2025, 3, 3), discount=Decimal('0.00')):
+        return Rental.objects.create(
+            vehicle=vehicle,
+            user=self.client_user,
+            rental_days=rental_days,
+            rental_date=rental_date,
+            expected_return_date=rental_date,
+            discount_amount=discount,
+            total_amount=0,
+            rental_amount=0,
+        )
+
+
+class DailyRentalRollupTestCase(StatsTestDataMixin, TestCase):
+    def setUp(self):
+        self.create_test_data()
+
+    def rollup(self, **filters):
+        return DailyRentalRollup.objects.get(**filters)
+
+    def test_rollup_created_on_rental_save(self):
+        """Создание аренды добавляет ее в дневную сводку"""
+        self.create_rental(self.toyota, discount=Decimal('20.00'))
+        self.create_rental(self.toyota)
+
+        rollup = self.rollup(brand='Toyota', status='pending')
+        self.assertEqual(rollup.date, date(2025, 3, 3))
+        self.assertEqual(rollup.rental_count, 2)
+        self.assertEqual(rollup.revenue, Decimal('380.00'))
+        self.assertEqual(rollup.discount_sum, Decimal('20.00'))
+
+    def test_rollup_moves_on_status_change_with_penalties(self):
+        """Смена статуса переносит аренду и ее штрафы в другую строку сводки"""
+        rental = self.create_rental(self.honda)
+        RentalPenalty.objects.create(rental=rental, penalty_type=self.penalty_type)
+        self.assertEqual(self.rollup(brand='Honda', status='pending').penalty_sum, Decimal('30.00'))
+
+        rental.status = 'returned'
+        rental.save()
+
+        pending = self.rollup(brand='Honda', status='pending')
+        returned = self.rollup(brand='Honda', status='returned')
+        self.assertEqual(pending.rental_count, 0)
+        self.assertEqual(pending.penalty_sum, Decimal('0.00'))
+        self.assertEqual(returned.rental_count, 1)
+        self.assertEqual(returned.penalty_sum, Decimal('30.00'))
+        self.assertEqual(returned.revenue, Decimal('130.00'))
+
+    def test_rollup_updated_on_rental_delete(self):
+        """Удаление аренды вычитает ее вклад вместе со штрафами"""
+        rental = self.create_rental(self.honda)
+        RentalPenalty.objects.create(rental=rental, penalty_type=self.penalty_type)
+
+        rental.delete()
+
+        rollup = self.rollup(brand='Honda', status='pending')
+        self.assertEqual(rollup.rental_count, 0)
+        self.assertEqual(rollup.revenue, Decimal('0.00'))
+        self.assertEqual(rollup.penalty_sum, Decimal('0.00'))
+
+    def test_reconcile_command_rebuilds_from_rentals(self):
+        """Ночная сверка восстанавливает сводки, изменённые в обход сигналов"""
+        rental = self.create_rental(self.toyota)
+        RentalPenalty.objects.create(rental=rental, penalty_type=self.penalty_type)
+        Rental.objects.filter(pk=rental.pk).update(status='cancelled')
+        DailyRentalRollup.objects.create(
+            date=date(2020, 1, 1), brand='Ghost', car_park=self.car_park, status='active', rental_count=5
+        )
+
+        call_command('reconcile_rollups', stdout=StringIO())
+
+        self.assertFalse(DailyRentalRollup.objects.filter(brand='Ghost').exists())
+        self.assertFalse(DailyRentalRollup.objects.filter(status='pending').exists())
+        rollup = self.rollup(brand='Toyota', status='cancelled')
+        self.assertEqual(rollup.rental_count, 1)
+        self.assertEqual(rollup.penalty_sum, Decimal('30.00'))
+
+
+class StatisticsDashboardTestCase(StatsTestDataMixin, TestCase):
+    def setUp(self):
+        self.create_test_data()
+        self.create_rental(self.toyota, rental_date=date(2025, 3, 3))
+        self.create_rental(self.toyota, rental_date=date(2025, 3, 4))
+        self.create_rental(self.honda, rental_date=date(2025, 4, 2))
+        self.client = Client()
+        self.client.login(username='staffuser', password='staffpass')
+
+    def test_dashboard_totals_from_rollups(self):
+        response = self.client.get(reverse('statistics_dashboard'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['total_rentals'], 3)
+        self.assertEqual(response.context['total_revenue'], Decimal('500.00'))
+        self.assertEqual(response.context['brand_data']['labels'], ['Toyota', 'Honda'])
+        # 3 марта 2025 — понедельник, 4 марта — вторник, 2 апреля — среда
+        self.assertEqual(response.context['weekday_stats']['counts'][:3], [1, 1, 1])
+
+    def test_dashboard_date_range_drill_down(self):
+        url = reverse('statistics_dashboard') + '?date_from=2025-03-01&date_to=2025-03-31'
+        response = self.client.get(url)
+        self.assertEqual(response.context['total_rentals'], 2)
+        self.assertEqual(response.context['brand_data']['labels'], ['Toyota'])
+        self.assertEqual(response.context['monthly_stats']['counts'], [2])
+
+    def test_impossible_date_is_ignored(self):
+        response = self.client.get(reverse('statistics_dashboard') + '?date_from=2025-02-30')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['total_rentals'], 3)
+
+    def test_dashboard_requires_staff(self):
+        self.client.login(username='clientuser', password='clientpass')
+        response = self.client.get(reverse('statistics_dashboard'))
+        self.assertEqual(response.status_code, 302)
+
+
+class StatisticsApiTestCase(StatsTestDataMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.create_test_data()
+        returned = self.create_rental(self.toyota, rental_date=date(2025, 3, 3))
+        Rental.objects.filter(pk=returned.pk).update(actual_return_date=date(2025, 3, 8))
+        self.create_rental(self.toyota, rental_date=date(2025, 3, 4))
+        self.create_rental(self.honda, rental_date=date(2025, 4, 2))
+        self.client = Client()
+        self.client.login(username='staffuser', password='staffpass')
+
+    def get_data(self, name, query=''):
+        response = self.client.get(reverse(name) + query)
+        self.assertEqual(response.status_code, 200)
+        return response.json()['data']
+
+    def test_brands_and_monthly(self):
+        self.assertEqual(self.get_data('statistics_api_brands'), [
+            {'brand': 'Toyota', 'count': 2, 'revenue': 400.0},
+            {'brand': 'Honda', 'count': 1, 'revenue': 100.0},
+        ])
+        self.assertEqual(self.get_data('statistics_api_monthly'), [
+            {'month': '2025-03', 'count': 2, 'revenue': 400.0},
+            {'month': '2025-04', 'count': 1, 'revenue': 100.0},
+        ])
+
+    def test_durations_weekdays_and_percentiles(self):
+        durations = self.get_data('statistics_api_durations')
+        self.assertEqual([item['count'] for item in durations], [0, 0, 1, 0, 0, 0])
+        self.assertEqual(durations[2]['percentage'], 100.0)
+
+        weekdays = self.get_data('statistics_api_weekdays')
+        self.assertEqual([item['count'] for item in weekdays], [1, 1, 1, 0, 0, 0, 0])
+
+        percentiles = self.get_data('statistics_api_revenue_percentiles')
+        self.assertEqual(percentiles['p50'], 200.0)
+        self.assertEqual(percentiles['p99'], 200.0)
+
+    def test_invalid_date_is_bad_request(self):
+        for query in ('?date_from=2025-02-30', '?date_to=март'):
+            with self.subTest(query=query):
+                response = self.client.get(reverse('statistics_api_brands') + query)
+                self.assertEqual(response.status_code, 400)
+
+    def test_results_cached_per_date_range(self):
+        self.get_data('statistics_api_brands', '?date_from=2025-04-01')
+        with self.assertNumQueries(2):  # только сессия и пользователь
+            data = self.get_data('statistics_api_weekdays', '?date_from=2025-04-01')
+        self.assertEqual(sum(item['count'] for item in data), 1)
+
+        # Другой период считается отдельно
+        data = self.get_data('statistics_api_weekdays', '?date_to=2025-03-31')
+        self.assertEqual(sum(item['count'] for item in data), 2)
+
+
+class ChartRendererTestCase(SimpleTestCase):
+    specs = {
+        'pie': ('pie', (['Toyota', 'Honda'], [2, 1], 'Марки')),
+        'line': ('line', (['Mar 2025', 'Apr 2025'], [2, 1], [400, 100], 'Месяцы')),
+        'bar': ('bar', (['Пн', 'Вт'], [1, 0], 'Дни недели')),
+    }
+
+    def assertPngCharts(self, charts):
+        self.assertEqual(set(charts), set(self.specs))
+        for png in charts.values():
+            self.assertTrue(base64.b64decode(png).startswith(b'\x89PNG'))
+
+    @override_settings(STATS_RENDERER_WORKERS=0)
+    def test_render_in_process(self):
+        self.assertIsNone(renderer.get_pool())
+        self.assertPngCharts(renderer.render_charts(self.specs))
+
+    @override_settings(STATS_RENDERER_WORKERS=1)
+    def test_render_in_pool(self):
+        renderer.shutdown_pool()
+        self.addCleanup(renderer.shutdown_pool)
+        self.assertIsNotNone(renderer.get_pool())
+        self.assertPngCharts(renderer.render_charts(self.specs))
+
+
+class RevenueForecastTestCase(StatsTestDataMixin, TestCase):
+    def setUp(self):
+        self.create_test_data()
+        # Восемь недель истории: по понедельникам выручка 100, в остальные дни 10
+        self.today = date(2025, 3, 3)  # понедельник
+        for offset in range(1, 57):
+            day = self.today - timedelta(days=offset)
+            DailyRentalRollup.objects.create(
+                date=day, brand='Toyota', car_park=self.car_park, status='returned',
+                rental_count=2 if day.weekday() == 0 else 1,
+                revenue=Decimal('100.00') if day.weekday() == 0 else Decimal('10.00'),
+            )
+        DailyRentalRollup.objects.create(
+            date=self.today - timedelta(days=3), brand='Toyota', car_park=self.car_park, status='cancelled',
+            rental_count=50, revenue=Decimal('5000.00'),
+        )
+
+    def test_weekday_seasonality_projected(self):
+        rows = build_forecast(today=self.today, history_days=56, horizon_days=30)
+        self.assertEqual(rows, 30)
+
+        monday = RevenueForecast.objects.get(target_date=self.today)
+        tuesday = RevenueForecast.objects.get(target_date=self.today + timedelta(days=1))
+        self.assertAlmostEqual(float(monday.revenue), 100.0, places=1)
+        self.assertAlmostEqual(monday.rental_count, 2.0, places=2)
+        self.assertAlmostEqual(float(tuesday.revenue), 10.0, places=1)
+
+    def test_days_before_first_observation_not_fitted(self):
+        # История по умолчанию — два года, из них у ряда только восемь недель
+        build_forecast(today=self.today, horizon_days=30)
+
+        self.assertAlmostEqual(float(RevenueForecast.objects.get(target_date=self.today).revenue), 100.0, places=1)
+        tuesday = RevenueForecast.objects.get(target_date=self.today + timedelta(days=1))
+        self.assertAlmostEqual(float(tuesday.revenue), 10.0, places=1)
+
+    def test_history_without_base_month(self):
+        # Апрель и май без января: поправки на месяцы не должны совпасть со свободным членом
+        today = date(2025, 6, 2)  # понедельник
+        for offset in range(1, 57):
+            day = today - timedelta(days=offset)
+            DailyRentalRollup.objects.create(
+                date=day, brand='Honda', car_park=self.car_park, status='returned', rental_count=1,
+                revenue=Decimal('100.00') if day.weekday() == 0 else Decimal('10.00'),
+            )
+        build_forecast(today=today, history_days=56, horizon_days=30)
+
+        monday = RevenueForecast.objects.get(target_date=today, brand='Honda')
+        tuesday = RevenueForecast.objects.get(target_date=today + timedelta(days=1), brand='Honda')
+        self.assertAlmostEqual(float(monday.revenue), 100.0, places=1)
+        self.assertAlmostEqual(float(tuesday.revenue), 10.0, places=1)
+
+    def test_rebuild_replaces_previous_forecast(self):
+        build_forecast(today=self.today, history_days=56, horizon_days=90)
+        build_forecast(today=self.today, history_days=56, horizon_days=30)
+        self.assertEqual(RevenueForecast.objects.count(), 30)
+
+    def test_dashboard_reads_forecast_table(self):
+        RevenueForecast.objects.create(
+            target_date=date.today(), brand='Toyota', car_park=self.car_park,
+            revenue=Decimal('40.00'), rental_count=1.5, generated_at=timezone.now(),
+        )
+        RevenueForecast.objects.create(
+            target_date=date.today() + timedelta(days=45), brand='Toyota', car_park=self.car_park,
+            revenue=Decimal('60.00'), rental_count=2, generated_at=timezone.now(),
+        )
+        self.client.login(username='staffuser', password='staffpass')
+        response = self.client.get(reverse('statistics_dashboard'))
+        totals = response.context['forecast']['totals']
+        self.assertEqual(totals['revenue_30'], Decimal('40.00'))
+        self.assertEqual(totals['revenue_90'], Decimal('100.00'))
+        self.assertEqual(totals['count_90'], 3.5)
+
+
+class KllSketchTestCase(SimpleTestCase):
+    def test_quantiles_within_rank_error(self):
+        sketch = KllSketch()
+        values = list(range(20000))
+        random.Random(42).shuffle(values)
+        for value in values:
+            sketch.update(value)
+
+        self.assertEqual(sketch.n, 20000)
+        self.assertLess(sum(map(len, sketch.compactors)), 1000)
+        for q in (0.5, 0.9, 0.99):
+            self.assertAlmostEqual(sketch.quantile(q) / 20000, q, delta=0.02)
+
+    def test_extend_in_batches(self):
+        sketch = KllSketch()
+        values = list(range(20000))
+        random.Random(42).shuffle(values)
+        for start in range(0, len(values), 3000):
+            sketch.extend(values[start:start + 3000])
+
+        self.assertEqual(sketch.n, 20000)
+        self.assertLess(sum(map(len, sketch.compactors)), 1000)
+        for q in (0.5, 0.9, 0.99):
+            self.assertAlmostEqual(sketch.quantile(q) / 20000, q, delta=0.02)
+
+    def test_merge_and_serialization(self):
+        low, high = KllSketch(), KllSketch()
+        for value in range(5000):
+            low.update(value)
+            high.update(value + 5000)
+
+        merged = KllSketch.from_dict(low.to_dict()).merge(KllSketch.from_dict(high.to_dict()))
+        self.assertEqual(merged.n, 10000)
+        self.assertAlmostEqual(merged.quantile(0.5), 5000, delta=300)
+        self.assertIsNone(KllSketch().quantile(0.5))
+
+
+class QuantileSketchSignalsTestCase(StatsTestDataMixin, TestCase):
+    def setUp(self):
+        self.create_test_data()
+
+    def sketch(self, metric, dimension='all', key=''):
+        sketches.merge_pending()
+        return QuantileSketch.objects.get(metric=metric, dimension=dimension, key=key)
+
+    def test_sketches_updated_on_create_and_return(self):
+        self.create_rental(self.toyota, rental_days=1)
+        self.create_rental(self.toyota, rental_days=3)
+        rental = self.create_rental(self.honda, rental_days=5)
+        # Создание аренды только откладывает значения (2 метрики x 3 разреза) и не трогает скетчи
+        self.assertFalse(QuantileSketch.objects.exists())
+        self.assertEqual(PendingSketchValue.objects.count(), 18)
+
+        amounts = self.sketch('total_amount')
+        self.assertEqual(amounts.count, 3)
+        self.assertEqual(amounts.p50, 250.0)
+        self.assertEqual(self.sketch('rental_days', 'brand', 'Toyota').count, 2)
+        self.assertEqual(self.sketch('rental_days', 'car_park', str(self.car_park.pk)).p99, 5.0)
+        self.assertFalse(QuantileSketch.objects.filter(metric='duration').exists())
+
+        rental.status = 'returned'
+        rental.actual_return_date = rental.rental_date + timedelta(days=6)
+        rental.save()
+        rental.save()  # повторное сохранение не учитывается дважды
+
+        durations = self.sketch('duration', 'brand', 'Honda')
+        self.assertEqual(durations.count, 1)
+        self.assertEqual(durations.p50, 6.0)
+
+    def test_return_with_penalty_records_new_amount(self):
+        rental = self.create_rental(self.honda, rental_days=2)
+        RentalPenalty.objects.create(rental=rental, penalty_type=self.penalty_type)
+        rental.status = 'returned'
+        rental.actual_return_date = rental.rental_date
+        rental.save()  # штраф входит в итоговую сумму
+
+        amounts = self.sketch('total_amount', 'brand', 'Honda')
+        self.assertEqual(amounts.count, 2)
+        self.assertEqual(KllSketch.from_dict(amounts.data).quantile(1.0), 130.0)
+        self.assertFalse(PendingSketchValue.objects.exists())
+
+    def test_pending_values_merged_after_commit_in_batches(self):
+        with mock.patch.object(sketches, 'MERGE_BATCH_SIZE', 12), self.captureOnCommitCallbacks(execute=True):
+            self.create_rental(self.toyota)
+        self.assertFalse(QuantileSketch.objects.exists())
+        with mock.patch.object(sketches, 'MERGE_BATCH_SIZE', 12), self.captureOnCommitCallbacks(execute=True):
+            self.create_rental(self.toyota)
+        self.assertFalse(PendingSketchValue.objects.exists())
+        self.assertEqual(QuantileSketch.objects.get(metric='total_amount', dimension='all').count, 2)
+
+    def test_rebuild_command(self):
+        self.create_rental(self.toyota)
+        QuantileSketch.objects.all().delete()
+
+        call_command('rebuild_sketches', stdout=StringIO())
+
+        self.assertEqual(self.sketch('total_amount').count, 1)
+        self.assertEqual(self.sketch('total_amount', 'brand', 'Toyota').p90, 200.0)
+
+
+class StatisticsQueryBudgetTestCase(QueryBudgetMixin, TestCase):
+    """Число запросов статистики не зависит от количества прокатов"""
+
+    def setUp(self):
+        self.create_users()
+        self.seed(3)
+        self.client.force_login(self.staff_user)
+
+    def test_dashboard_and_api(self):
+        for name, budget in (
+            ('statistics_dashboard', 12),
+            ('statistics_api_brands', 3),
+            ('statistics_api_monthly', 3),
+            ('statistics_api_durations', 3),
+            ('statistics_api_weekdays', 3),
+            ('statistics_api_revenue_percentiles', 3),
+        ):
+            with self.subTest(url=name):
+                self.assertQueryBudget(budget, lambda: self.client.get(reverse(name)))
+
+
+class GenerateLoadDataTestCase(TestCase):
+    """Генератор данных для нагрузочных тестов"""
+
+    def test_generates_requested_volumes(self):
+        call_command(
+            'generate_load_data', users=20, vehicles=10, promo_codes=5, rentals=300, reviews=15, articles=4,
+            chunk_size=120, stdout=StringIO(),
+        )
+
+        self.assertEqual(User.objects.filter(username__startswith='load_user_').count(), 20)
+        self.assertEqual(Vehicle.objects.count(), 10)
+        self.assertEqual(Rental.objects.count(), 300)
+        self.assertEqual(Review.objects.count(), 15)
+        # Пароль хешируется один раз, и с ним можно войти
+        user = User.objects.filter(username__startswith='load_user_').first()
+        self.assertTrue(self.client.login(username=user.username, password='loadtest'))
+
+        rental = Rental.objects.filter(penalties__isnull=False).first()
+        penalty = rental.penalties.get()
+        self.assertEqual(rental.total_amount, rental.rental_amount - rental.discount_amount + penalty.penalty_type.amount)
+        # Производные данные пересчитаны, хотя сигналы не отправлялись
+        self.assertEqual(sum(DailyRentalRollup.objects.values_list('rental_count', flat=True)), 300)
+        self.assertTrue(QuantileSketch.objects.exists())
+
+
+class DatabaseBenchmarkTestCase(QueryBudgetMixin, TestCase):
+    """Настройки соединения SQLite и индексы под запросы представлений"""
+
+    def test_connection_pragmas(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 5000)
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+
+    def test_view_queries_use_workload_indexes(self):
+        self.create_users()
+        self.seed(3)
+        output = StringIO()
+        call_command('benchmark_db', repeat=1, skip_concurrency=True, stdout=output)
+
+        plans = output.getvalue()
+        for name in benchmark_db.WORKLOAD_INDEXES:
+            with self.subTest(index=name):
+                self.assertIn(f'USING INDEX {name}', plans)
+        # Индексы, удаленные на время замера, восстановлены
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(cursor, Review._meta.db_table)
+        self.assertIn('review_approved_created_idx', constraints)
+
+
+class RefreshReplicaTestCase(StatsTestDataMixin, TransactionTestCase):
+    """Копирование БД в реплику (вне транзакции теста: копия делается из закрепленных данных)"""
+
+    def test_refresh_copies_database(self):
+        self.create_test_data()
+        with tempfile.TemporaryDirectory() as directory:
+            target = os.path.join(directory, 'replica.sqlite3')
+            call_command('refresh_replica', target=target, stdout=StringIO())
+            with sqlite3.connect(target) as copy:
+                count = copy.execute('SELECT COUNT(*) FROM rentals_rental').fetchone()[0]
+            copy.close()
+        self.assertEqual(count, Rental.objects.count())
+
+
+class RentalArchiveTestCase(StatsTestDataMixin, TestCase):
+    """Перенос завершенных прокатов в архив и чтение истории из обеих таблиц"""
+
+    def setUp(self):
+        self.create_test_data()
+        self.returned = self.create_rental(self.toyota, rental_date=date(2024, 1, 10))
+        self.returned.status = 'returned'
+        self.returned.actual_return_date = date(2024, 1, 14)
+        self.returned.save()
+        RentalPenalty.objects.create(rental=self.returned, penalty_type=self.penalty_type)
+        self.cancelled = self.create_rental(self.honda, rental_date=date(2024, 2, 1))
+        self.cancelled.status = 'cancelled'
+        self.cancelled.save()
+        self.active = self.create_rental(self.honda, rental_date=date(2024, 3, 1))
+        self.recent = self.create_rental(self.toyota, rental_date=timezone.now().date() - timedelta(days=30))
+        self.recent.status = 'returned'
+        self.recent.save()
+
+    def rollups(self):
+        # Сигналы оставляют опустевшие строки (например, pending после подтверждения), пересчет их не создает
+        return list(DailyRentalRollup.objects.filter(rental_count__gt=0).order_by('date', 'brand', 'status').values_list(
+            'date', 'brand', 'status', 'rental_count', 'revenue', 'discount_sum', 'penalty_sum',
+        ))
+
+    def test_moves_finished_rentals_with_penalties(self):
+        rollups = self.rollups()
+        output = StringIO()
+        call_command('archive_rentals', months=12, dry_run=True, stdout=output)
+        self.assertIn('К переносу: 2 прокатов', output.getvalue())
+
+        call_command('archive_rentals', months=12, batch_size=1, stdout=StringIO())
+
+        self.assertCountEqual(Rental.objects.values_list('pk', flat=True), [self.active.pk, self.recent.pk])
+        self.assertCountEqual(
+            ArchivedRental.objects.values_list('pk', flat=True), [self.returned.pk, self.cancelled.pk]
+        )
+        self.assertFalse(RentalPenalty.objects.exists())
+        self.assertEqual(ArchivedRentalPenalty.objects.get().rental_id, self.returned.pk)
+        self.assertEqual(ArchivedRental.objects.get(pk=self.returned.pk).total_amount, self.returned.total_amount)
+        # Перенос не меняет сводки, а пересчет учитывает архив
+        self.assertEqual(self.rollups(), rollups)
+        rebuild_rollups()
+        self.assertEqual(self.rollups(), rollups)
+
+    def test_history_and_reports_include_archive(self):
+        call_command('archive_rentals', months=12, stdout=StringIO())
+        self.client.force_login(self.client_user)
+
+        response = self.client.get(reverse('rental_list'))
+        self.assertEqual(
+            [rental.pk for rental in response.context['rentals']],
+            [self.recent.pk, self.active.pk, self.cancelled.pk, self.returned.pk],
+        )
+        response = self.client.get(reverse('rental_list') + '?status=returned')
+        self.assertEqual([rental.pk for rental in response.context['rentals']], [self.recent.pk, self.returned.pk])
+
+        response = self.client.get(reverse('rental_detail', args=[self.returned.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([penalty.penalty_type for penalty in response.context['penalties']], [self.penalty_type])
+
+        self.assertEqual(len(analytics.load_rental_arrays()['amount']), 4)
@@ -4,4 +4,10 @@ from stats import views
 
 urlpatterns = [
     path('dashboard/', views.StatisticsDashboardView.as_view(), name='statistics_dashboard'),
-]
\ No newline at end of file
+    path('api/brands/', views.StatisticsApiView.as_view(metric='brands'), name='statistics_api_brands'),
+    path('api/monthly/', views.StatisticsApiView.as_view(metric='monthly'), name='statistics_api_monthly'),
+    path('api/durations/', views.StatisticsApiView.as_view(metric='durations'), name='statistics_api_durations'),
+    path('api/weekdays/', views.StatisticsApiView.as_view(metric='weekdays'), name='statistics_api_weekdays'),
+    path('api/revenue-percentiles/', views.StatisticsApiView.as_view(metric='revenue_percentiles'),
+         name='statistics_api_revenue_percentiles'),
+]
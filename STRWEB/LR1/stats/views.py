@@ -1,71 +1,98 @@
 # statistics/views.py
-import base64
-import io
 from datetime import datetime, timedelta
 
-import matplotlib.pyplot as plt
-import numpy as np
-from django.db.models import Count, Sum, Avg
-from django.db.models.functions import TruncMonth
+from django.db.models import Max, Q, Sum
+from django.db.models.functions import ExtractWeekDay, TruncMonth
+from django.http import JsonResponse
+from django.utils.dateparse import parse_date
 from django.utils.decorators import method_decorator
+from django.views import View
 from django.views.generic import TemplateView
 
 from authentication.decorators import staff_required
+from IGI_Lab5.replica import replica_reads
+from rentals.archive import union_archive
 from rentals.models import Rental
+from stats.models import DailyRentalRollup, QuantileSketch, RevenueForecast
+from stats.renderer import render_charts
+from vehicles.models import CarPark
+
+
+def date_param(request, name):
+    """Дата из GET-параметра; None, если параметра нет или дата неверна (например, 2025-02-30)"""
+    try:
+        return parse_date(request.GET.get(name) or '')
+    except ValueError:
+        return None
 
 
 @method_decorator(staff_required, name='dispatch')
+@method_decorator(replica_reads, name='dispatch')
 class StatisticsDashboardView(TemplateView):
     template_name = 'statistics/dashboard.html'
 
+    def get_date_range(self):
+        """Возвращает период детализации из GET-параметров date_from/date_to"""
+        return date_param(self.request, 'date_from'), date_param(self.request, 'date_to')
+
+    def get_rollups(self):
+        """Сводки аренд за выбранный период — дашборд не обращается к таблице Rental"""
+        rollups = DailyRentalRollup.objects.all()
+        date_from, date_to = self.get_date_range()
+        if date_from:
+            rollups = rollups.filter(date__gte=date_from)
+        if date_to:
+            rollups = rollups.filter(date__lte=date_to)
+        return rollups
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
 
-        # Создаем графики с помощью Matplotlib
-        charts = {}
+        # Описания графиков; отрисовка выполняется в пуле процессов (stats.renderer)
+        chart_specs = {}
 
         # 1. Базовая статистика по аренде и выручке
-        rentals = Rental.objects.all()
-        total_rentals = rentals.count()
-        total_revenue = rentals.aggregate(Sum('total_amount'))['total_amount__sum'] or 0
-        avg_rental_price = rentals.aggregate(Avg('total_amount'))['total_amount__avg'] or 0
+        totals = self.get_rollups().aggregate(count=Sum('rental_count'), revenue=Sum('revenue'))
+        total_rentals = totals['count'] or 0
+        total_revenue = totals['revenue'] or 0
+        avg_rental_price = total_revenue / total_rentals if total_rentals else 0
 
         # 2. Популярность марок автомобилей (пирог)
         brand_data = self.get_brand_popularity()
-        charts['brand_pie'] = self.create_pie_chart(
+        chart_specs['brand_pie'] = ('pie', (
             brand_data['labels'],
             brand_data['values'],
             'Популярность марок автомобилей'
-        )
+        ))
 
         # 3. Статистика по месяцам (линейный график)
         monthly_stats = self.get_monthly_stats()
-        charts['monthly_chart'] = self.create_line_chart(
+        chart_specs['monthly_chart'] = ('line', (
             monthly_stats['months'],
             monthly_stats['counts'],
             monthly_stats['revenues'],
             'Динамика аренд по месяцам'
-        )
+        ))
 
         # 4. Распределение по длительности аренды (столбчатый график)
         duration_stats = self.get_rental_duration_stats()
-        charts['duration_chart'] = self.create_bar_chart(
+        chart_specs['duration_chart'] = ('bar', (
             duration_stats['categories'],
             duration_stats['counts'],
             'Распределение аренд по длительности'
-        )
+        ))
 
         # 5. Распределение по дням недели (столбчатый график)
         weekday_stats = self.get_weekday_stats()
-        charts['weekday_chart'] = self.create_bar_chart(
+        chart_specs['weekday_chart'] = ('bar', (
             weekday_stats['days'],
             weekday_stats['counts'],
             'Аренды по дням недели'
-        )
+        ))
 
         # Добавляем графики и базовую статистику в контекст
         context.update({
-            'charts': charts,
+            'charts': render_charts(chart_specs),
             'total_rentals': total_rentals,
             'total_revenue': round(total_revenue, 2),
             'avg_rental_price': round(avg_rental_price, 2),
@@ -73,35 +100,78 @@ class StatisticsDashboardView(TemplateView):
             'monthly_stats': monthly_stats,
             'duration_stats': duration_stats['detailed_data'],
             'weekday_stats': weekday_stats,
+            'forecast': self.get_forecast_stats(),
+            'percentiles': self.get_percentile_stats(),
+            'date_from': self.request.GET.get('date_from', ''),
+            'date_to': self.request.GET.get('date_to', ''),
         })
 
         return context
 
+    def get_forecast_stats(self):
+        """Читает прогноз на 30 и 90 дней, рассчитанный командой forecast_revenue"""
+        today = datetime.now().date()
+        in_30_days = Q(target_date__lt=today + timedelta(days=30))
+        in_90_days = Q(target_date__lt=today + timedelta(days=90))
+        aggregates = {
+            'revenue_30': Sum('revenue', filter=in_30_days),
+            'revenue_90': Sum('revenue', filter=in_90_days),
+            'count_30': Sum('rental_count', filter=in_30_days),
+            'count_90': Sum('rental_count', filter=in_90_days),
+        }
+
+        forecasts = RevenueForecast.objects.filter(target_date__gte=today)
+        totals = forecasts.aggregate(generated_at=Max('generated_at'), **aggregates)
+        by_series = forecasts.values('brand', 'car_park__name').annotate(**aggregates).order_by('-revenue_90')
+
+        return {'totals': totals, 'by_series': by_series}
+
+    def get_percentile_stats(self):
+        """Читает p50/p90/p99, заранее вычисленные по квантильным скетчам"""
+        metric_names = dict(QuantileSketch.METRIC_CHOICES)
+        rows = QuantileSketch.objects.values('metric', 'dimension', 'key', 'count', 'p50', 'p90', 'p99')
+        car_park_names = dict(CarPark.objects.values_list('id', 'name'))
+
+        overall, by_brand, by_car_park = [], [], []
+        for row in rows:
+            row['metric_name'] = metric_names.get(row['metric'], row['metric'])
+            if row['dimension'] == 'all':
+                overall.append(row)
+            elif row['metric'] == 'total_amount' and row['dimension'] == 'brand':
+                by_brand.append(row)
+            elif row['metric'] == 'total_amount' and row['dimension'] == 'car_park':
+                row['key'] = car_park_names.get(int(row['key']), row['key'])
+                by_car_park.append(row)
+
+        return {'overall': overall, 'by_brand': by_brand, 'by_car_park': by_car_park}
+
     def get_brand_popularity(self):
         """Получает статистику популярности марок автомобилей"""
         # Получаем топ-5 популярных марок
-        brand_counts = Rental.objects.values(
-            'vehicle__car_model__brand'
+        brand_counts = self.get_rollups().values(
+            'brand'
         ).annotate(
-            count=Count('id')
+            count=Sum('rental_count')
         ).order_by('-count')[:5]
 
-        labels = [item['vehicle__car_model__brand'] for item in brand_counts]
+        labels = [item['brand'] for item in brand_counts]
         values = [item['count'] for item in brand_counts]
 
         return {'labels': labels, 'values': values}
 
     def get_monthly_stats(self):
         """Получает статистику по месяцам"""
-        # Получаем данные за последние 6 месяцев
-        six_months_ago = datetime.now().date() - timedelta(days=180)
-        monthly_data = Rental.objects.filter(
-            rental_date__gte=six_months_ago
-        ).annotate(
-            month=TruncMonth('rental_date')
+        # По умолчанию берем данные за последние 6 месяцев
+        rollups = self.get_rollups()
+        date_from, _ = self.get_date_range()
+        if not date_from:
+            six_months_ago = datetime.now().date() - timedelta(days=180)
+            rollups = rollups.filter(date__gte=six_months_ago)
+        monthly_data = rollups.annotate(
+            month=TruncMonth('date')
         ).values('month').annotate(
-            count=Count('id'),
-            revenue=Sum('total_amount')
+            count=Sum('rental_count'),
+            revenue=Sum('revenue')
         ).order_by('month')
 
         months = [item['month'].strftime('%b %Y') for item in monthly_data]
@@ -122,11 +192,21 @@ class StatisticsDashboardView(TemplateView):
             'Более месяца': 0
         }
 
-        # Получаем все аренды и группируем по длительности
-        for rental in Rental.objects.all():
-            if rental.rental_date and rental.actual_return_date:
+        # Длительность не входит в ключ сводок, поэтому читаем только даты возвращенных аренд
+        date_from, date_to = self.get_date_range()
+
+        def returned(rentals):
+            rentals = rentals.filter(actual_return_date__isnull=False)
+            if date_from:
+                rentals = rentals.filter(rental_date__gte=date_from)
+            if date_to:
+                rentals = rentals.filter(rental_date__lte=date_to)
+            return rentals.values_list('rental_date', 'actual_return_date')
+
+        for rental_date, actual_return_date in union_archive(Rental, returned):
+            if rental_date and actual_return_date:
                 # Вычисляем длительность аренды в днях
-                duration = (rental.actual_return_date - rental.rental_date).days
+                duration = (actual_return_date - rental_date).days
 
                 if duration <= 1:
                     duration_categories['1 день'] += 1
@@ -173,71 +253,39 @@ class StatisticsDashboardView(TemplateView):
         # Создаем словарь для хранения количества аренд по дням недели
         weekday_counts = {i: 0 for i in range(7)}
 
-        # Получаем все аренды и вручную группируем по дням недели
-        for rental in Rental.objects.all():
-            if rental.rental_date:
-                weekday = rental.rental_date.weekday()  # 0 = Понедельник, 6 = Воскресенье
-                weekday_counts[weekday] += 1
+        # ExtractWeekDay возвращает 1 = Воскресенье ... 7 = Суббота
+        weekday_data = self.get_rollups().annotate(
+            weekday=ExtractWeekDay('date')
+        ).values('weekday').annotate(count=Sum('rental_count')).order_by()
+        for item in weekday_data:
+            weekday = (item['weekday'] + 5) % 7  # 0 = Понедельник, 6 = Воскресенье
+            weekday_counts[weekday] += item['count']
 
         days = ['Пн', 'Вт', 'Ср', 'Чт', 'Пт', 'Сб', 'Вс']
         counts = [weekday_counts[i] for i in range(7)]
 
         return {'days': days, 'counts': counts}
 
-    def create_pie_chart(self, labels, values, title):
-        """Создает круговую диаграмму"""
-        fig, ax = plt.subplots(figsize=(8, 6))
-        ax.pie(values, labels=labels, autopct='%1.1f%%', startangle=90)
-        ax.set_title(title)
-        ax.axis('equal')  # Equal aspect ratio ensures the pie chart is circular
-
-        return self.get_graph_png(fig)
-
-    def create_line_chart(self, x_labels, y1_values, y2_values, title):
-        """Создает линейный график с двумя осями Y"""
-        fig, ax1 = plt.subplots(figsize=(10, 6))
-
-        color = 'tab:blue'
-        ax1.set_xlabel('Месяц')
-        ax1.set_ylabel('Количество аренд', color=color)
-        ax1.plot(x_labels, y1_values, color=color, marker='o')
-        ax1.tick_params(axis='y', labelcolor=color)
-        plt.xticks(rotation=45)
-
-        ax2 = ax1.twinx()  # instantiate a second axes that shares the same x-axis
-        color = 'tab:red'
-        ax2.set_ylabel('Выручка ($)', color=color)
-        ax2.plot(x_labels, y2_values, color=color, marker='s')
-        ax2.tick_params(axis='y', labelcolor=color)
-
-        fig.tight_layout()
-        fig.suptitle(title, fontsize=16)
-        plt.subplots_adjust(top=0.9)
-
-        return self.get_graph_png(fig)
-
-    def create_bar_chart(self, labels, values, title):
-        """Создает столбчатую диаграмму"""
-        fig, ax = plt.subplots(figsize=(10, 6))
-        y_pos = np.arange(len(labels))
-
-        ax.barh(y_pos, values, align='center')
-        ax.set_yticks(y_pos)
-        ax.set_yticklabels(labels)
-        ax.invert_yaxis()  # labels read top-to-bottom
-        ax.set_title(title)
-
-        # Добавляем значения на концах столбцов
-        for i, v in enumerate(values):
-            ax.text(v, i, str(v), va='center')
-
-        return self.get_graph_png(fig)
-
-    def get_graph_png(self, figure):
-        """Преобразует график matplotlib в base64-строку для HTML"""
-        buf = io.BytesIO()
-        figure.savefig(buf, format='png', bbox_inches='tight')
-        buf.seek(0)
-        string = base64.b64encode(buf.read())
-        plt.close(figure)  # Очищаем фигуру из памяти
-        return string.decode('utf-8')
\ No newline at end of file
+
+@method_decorator(staff_required, name='dispatch')
+@method_decorator(replica_reads, name='dispatch')
+class StatisticsApiView(View):
+    """JSON-представление одной метрики статистики за выбранный период"""
+    metric = None
+
+    def get(self, request):
+        # NumPy загружается только при первом обращении к API, а не при импорте URLconf
+        from stats.analytics import get_statistics
+
+        date_from = date_param(request, 'date_from')
+        date_to = date_param(request, 'date_to')
+        for name, value in (('date_from', date_from), ('date_to', date_to)):
+            if request.GET.get(name) and value is None:
+                return JsonResponse({'error': f'Неверная дата в параметре {name}'}, status=400)
+        statistics = get_statistics(date_from, date_to)
+        return JsonResponse({
+            'date_from': date_from.isoformat() if date_from else None,
+            'date_to': date_to.isoformat() if date_to else None,
+            'metric': self.metric,
+            'data': statistics[self.metric],
+        })
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.4 on 2026-10-19 03:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('vehicles', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='vehicle',
+            index=models.Index(condition=models.Q(('is_available', True)), fields=['daily_rental_price'], name='vehicle_available_price_idx'),
+        ),
+    ]
@@ -51,6 +51,15 @@ class Vehicle(models.Model):
     class Meta:
         verbose_name = 'Автомобиль'
         verbose_name_plural = 'Автомобили'
+        indexes = [
+            # Каталог: доступные автомобили по цене (сортировка по умолчанию). Частичный индекс, а не
+            # (is_available, daily_rental_price): фильтр по булеву полю Django выводит как WHERE "is_available",
+            # и SQLite не использует такое условие как префикс составного индекса
+            models.Index(
+                fields=['daily_rental_price'], condition=models.Q(is_available=True),
+                name='vehicle_available_price_idx',
+            ),
+        ]
 
     def __str__(self):
         return f"{self.car_model} ({self.license_plate})"
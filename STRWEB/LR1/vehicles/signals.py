@@ -0,0 +1,22 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from IGI_Lab5.caching import invalidate_tags, tag_for
+from vehicles.models import BodyType, CarModel, CarPark, Vehicle
+
+
+@receiver(post_save, sender=Vehicle)
+@receiver(post_delete, sender=Vehicle)
+@receiver(post_save, sender=CarModel)
+@receiver(post_delete, sender=CarModel)
+@receiver(post_save, sender=BodyType)
+@receiver(post_delete, sender=BodyType)
+@receiver(post_save, sender=CarPark)
+@receiver(post_delete, sender=CarPark)
+def invalidate_catalog_cache(sender, **kwargs):
+    """Страницы каталога и значения фильтров (vehicles.views.filter_options) устаревают"""
+    tag = tag_for(sender)
+    invalidate_tags(tag)
+    # Повторно после коммита: другой процесс мог успеть закэшировать старые данные
+    transaction.on_commit(lambda: invalidate_tags(tag))
@@ -1,9 +1,14 @@
 from decimal import Decimal
+from unittest import mock
 
 from django.contrib.auth import get_user_model
-from django.test import TestCase, Client
+from django.core.cache import cache
+from django.test import TestCase, TransactionTestCase, Client
 from django.urls import reverse
 
+from IGI_Lab5 import replica
+from IGI_Lab5.testing import QueryBudgetMixin
+from vehicles import views
 from vehicles.forms import VehicleForm
 from vehicles.models import BodyType, CarModel, CarPark, Vehicle
 
@@ -560,4 +565,65 @@ class VehicleListFiltersTestCase(TestCase):
         # По умолчанию должна быть сортировка по цене аренды (возрастание)
         vehicles_list = list(response.context['vehicles'])
         self.assertEqual(vehicles_list[0], self.vehicle2)  # Самый дешевый первым
-        self.assertEqual(vehicles_list[2], self.vehicle3)  # Самый дорогой последним
\ No newline at end of file
+        self.assertEqual(vehicles_list[2], self.vehicle3)  # Самый дорогой последним
+
+
+# Псевдоним реплики указывает на основную БД: маршрут чтения виден, а запросы выполняются
+@mock.patch.object(replica, 'REPLICA_ALIAS', 'default')
+@mock.patch.object(replica, 'replica_enabled', return_value=True)
+class CatalogReplicaCacheTestCase(TransactionTestCase):
+    """Каталог при включенной реплике: в общий кэш не попадает прочитанное из реплики"""
+
+    def setUp(self):
+        cache.clear()
+        body_type = BodyType.objects.create(name='Седан')
+        car_model = CarModel.objects.create(brand='Toyota', model='Camry', body_type=body_type)
+        car_park = CarPark.objects.create(name='Центральный', address='ул. Центральная, 1')
+        Vehicle.objects.create(
+            license_plate='А123БВ777', car_model=car_model, year=2021, car_price=Decimal('1800000.00'),
+            daily_rental_price=Decimal('3500.00'), car_park=car_park,
+        )
+
+    def test_filter_options_are_read_from_primary(self, enabled):
+        routes = []
+        original = views.load_filter_options
+
+        def load():
+            routes.append(replica.ReplicaRouter().db_for_read(Vehicle))
+            return original()
+
+        with mock.patch.object(views, 'load_filter_options', load):
+            response = self.client.get(reverse('vehicle_list'))
+        self.assertEqual(routes, [None])
+        self.assertEqual(response.context['brands'], ['Toyota'])
+
+    def test_page_rendered_from_replica_is_not_cached(self, enabled):
+        self.client.get(reverse('vehicle_list'))
+        self.assertNotIn('X-Page-Cache', self.client.get(reverse('vehicle_list')))
+
+
+class VehicleQueryBudgetTestCase(QueryBudgetMixin, TestCase):
+    """Число запросов страниц автомобилей не зависит от количества записей"""
+
+    def setUp(self):
+        self.create_users()
+        self.seed(3)
+        self.vehicle = Vehicle.objects.first()
+
+    def test_vehicle_list(self):
+        self.assertQueryBudget(6, lambda: self.client.get(reverse('vehicle_list')))
+        self.client.force_login(self.staff_user)
+        self.assertQueryBudget(8, lambda: self.client.get(reverse('vehicle_list') + '?search=Марка'))
+
+    def test_vehicle_detail(self):
+        self.assertQueryBudget(5, lambda: self.client.get(reverse('vehicle_detail', args=[self.vehicle.pk])))
+
+    def test_staff_forms(self):
+        self.client.force_login(self.staff_user)
+        for url, budget in (
+            (reverse('vehicle_create'), 5),
+            (reverse('vehicle_update', args=[self.vehicle.pk]), 7),
+            (reverse('vehicle_delete', args=[self.vehicle.pk]), 5),
+        ):
+            with self.subTest(url=url):
+                self.assertQueryBudget(budget, lambda: self.client.get(url))
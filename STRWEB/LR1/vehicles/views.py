@@ -9,17 +9,50 @@ from vehicles.forms import VehicleForm
 from vehicles.models import Vehicle, CarModel, BodyType, CarPark
 
 from authentication.decorators import staff_required
+from content.page_cache import cache_page_for_anonymous
+from IGI_Lab5.caching import get_or_set, tag_for
+from IGI_Lab5.replica import primary_reads, replica_reads
 
 from django.contrib import messages
 
 logger = logging.getLogger("vehicles")
 
+CATALOG_MODELS = (Vehicle, CarModel, BodyType, CarPark)
+
+
+def load_filter_options():
+    return {
+        "brands": list(CarModel.objects.values_list("brand", flat=True).distinct()),
+        "body_types": list(BodyType.objects.all()),
+        "car_parks": list(CarPark.objects.all()),
+        "years": list(
+            Vehicle.objects.values_list("year", flat=True).distinct().order_by("-year")
+        ),
+    }
+
+
+def filter_options():
+    """
+    Значения фильтров каталога; кэшируются до изменения автомобилей или справочников.
+    Читаются из основной БД: значение из отстающей реплики осталось бы в кэше бессрочно.
+    """
+    with primary_reads():
+        return get_or_set(
+            "vehicles:filter_options",
+            load_filter_options,
+            timeout=None,
+            tags=[tag_for(model) for model in CATALOG_MODELS],
+            store_in_transaction=False,
+        )
+
 
 class VehicleView(View):
     template_name = "carrental/vehicle_list.html"
 
+    @method_decorator(cache_page_for_anonymous(*CATALOG_MODELS))
+    @method_decorator(replica_reads)
     def get(self, request):
-        vehicles = Vehicle.objects.all()
+        vehicles = Vehicle.objects.select_related("car_model__body_type", "car_park")
 
         brand = request.GET.get("brand")
         if brand:
@@ -63,21 +96,11 @@ class VehicleView(View):
         else:
             vehicles = vehicles.order_by("daily_rental_price")
 
-        brands = CarModel.objects.values_list("brand", flat=True).distinct()
-        body_types = BodyType.objects.all()
-        car_parks = CarPark.objects.all()
-        years = (
-            Vehicle.objects.values_list("year", flat=True).distinct().order_by("-year")
-        )
-
         form = VehicleForm()
 
         context = {
             "vehicles": vehicles,
-            "brands": brands,
-            "body_types": body_types,
-            "car_parks": car_parks,
-            "years": years,
+            **filter_options(),
             "form": form,
             "selected_brand": brand,
             "selected_body_type": body_type,
@@ -102,20 +125,12 @@ class VehicleView(View):
             )
             return redirect("vehicle_list")
 
-        vehicles = Vehicle.objects.all().order_by("daily_rental_price")
-        brands = CarModel.objects.values_list("brand", flat=True).distinct()
-        body_types = BodyType.objects.all()
-        car_parks = CarPark.objects.all()
-        years = (
-            Vehicle.objects.values_list("year", flat=True).distinct().order_by("-year")
-        )
-
+        vehicles = Vehicle.objects.select_related(
+            "car_model__body_type", "car_park"
+        ).order_by("daily_rental_price")
         context = {
             "vehicles": vehicles,
-            "brands": brands,
-            "body_types": body_types,
-            "car_parks": car_parks,
-            "years": years,
+            **filter_options(),
             "form": form,
             "form_errors": form.errors,
         }